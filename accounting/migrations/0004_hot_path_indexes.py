@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['type', 'created_at'], name='transaction_type_created_idx'),
+        ),
+    ]
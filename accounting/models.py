@@ -31,6 +31,12 @@ class Transaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Sales and refund reports over a date range
+            models.Index(fields=['type', 'created_at'], name='transaction_type_created_idx'),
+            # Keyset pages of ?pagination=cursor, read backwards for newest first
+            models.Index(fields=['created_at', 'id'], name='transaction_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_display()} - ${self.amount} ({self.created_at.strftime('%Y-%m-%d')})"
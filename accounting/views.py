@@ -7,14 +7,20 @@ from .models import Transaction
 from .serializers import TransactionSerializer, TransactionCreateSerializer
 from users.permissions import IsAdminOrManagerOrCashier
 from orders.models import Order
+from orders.consumers import OrderConsumer
+from restaurant_pos.pagination import KeysetPaginationMixin
+from restaurant_pos.prefetch import plan_queryset
 from datetime import datetime, timedelta
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all().order_by('-created_at')
     permission_classes = [IsAdminOrManagerOrCashier]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['type', 'method', 'category', 'staff']
     
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), TransactionSerializer)
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return TransactionCreateSerializer
@@ -31,6 +37,9 @@ class TransactionViewSet(viewsets.ModelViewSet):
             order.payment_status = 'paid'
             order.payment_method = transaction.method
             order.save()
+            
+            # Notify via websocket
+            OrderConsumer.notify_order_update(order)
         
         return Response(TransactionSerializer(transaction).data, status=status.HTTP_201_CREATED)
     
@@ -52,13 +61,12 @@ class TransactionViewSet(viewsets.ModelViewSet):
             return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, 
                             status=status.HTTP_400_BAD_REQUEST)
         
-        transactions = Transaction.objects.filter(
+        transactions = self.get_queryset().filter(
             created_at__gte=start_date,
             created_at__lt=end_date
         ).order_by('-created_at')
         
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        return self.keyset_response(transactions, TransactionSerializer)
     
     @action(detail=False, methods=['get'])
     def sales_report(self, request):
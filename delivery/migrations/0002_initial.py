@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('delivery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='current_order',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_driver', to='orders.order'),
+        ),
+    ]
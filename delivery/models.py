@@ -21,6 +21,12 @@ class Driver(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Available driver lookups
+            models.Index(fields=['status', 'is_active'], name='driver_status_active_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} ({self.get_status_display()})"
 
@@ -8,14 +8,22 @@ from .serializers import (
     DriverSerializer, DriverStatusUpdateSerializer, DriverAssignmentSerializer
 )
 from users.permissions import IsAdminOrManagerOrStaff
+from restaurant_pos.conditional import ConditionalGetMixin
 from orders.models import Order, DeliveryInfo
+from orders.consumers import OrderConsumer
 
-class DriverViewSet(viewsets.ModelViewSet):
+class DriverViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
     permission_classes = [IsAdminOrManagerOrStaff]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'is_active']
+    conditional_actions = ('list', 'retrieve', 'available')
+    
+    def get_conditional_queryset(self):
+        if self.action == 'available':
+            return Driver.objects.filter(status='available', is_active=True)
+        return super().get_conditional_queryset()
     
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -69,6 +77,9 @@ class DriverViewSet(viewsets.ModelViewSet):
                 contact_phone=request.data.get('contact_phone', '')
             )
         
+        # Notify via websocket
+        OrderConsumer.notify_order_update(order)
+        
         return Response(DriverSerializer(driver).data)
     
     @action(detail=True, methods=['post'])
@@ -89,6 +100,9 @@ class DriverViewSet(viewsets.ModelViewSet):
         driver.current_order = None
         driver.save()
         
+        # Notify via websocket
+        OrderConsumer.notify_order_update(order)
+        
         return Response(DriverSerializer(driver).data)
     
     @action(detail=False, methods=['get'])
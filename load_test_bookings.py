@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Load test for concurrent reservation bookings.
+
+Fires a burst of concurrent bookings for one date at a running server,
+then checks that no two active reservations on a table overlap and that
+the p99 booking latency stays under a bound. Run it against a test
+database: the bookings it makes are left in place.
+"""
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import requests
+
+# Configuration
+API_BASE_URL = os.environ.get('API_BASE_URL', 'http://localhost:8000/api')
+EMAIL = os.environ.get('API_TEST_EMAIL', 'admin@example.com')
+PASSWORD = os.environ.get('API_TEST_PASSWORD', 'admin')
+BOOKINGS = int(os.environ.get('LOAD_TEST_BOOKINGS', 300))
+CONCURRENCY = int(os.environ.get('LOAD_TEST_CONCURRENCY', 50))
+P99_LIMIT_MS = float(os.environ.get('LOAD_TEST_P99_MS', 1000))
+BOOKING_DATE = os.environ.get('LOAD_TEST_DATE', (date.today() + timedelta(days=60)).isoformat())
+DURATION = 90
+
+def get_token():
+    """Get JWT token for authentication."""
+    url = f"{API_BASE_URL}/auth/token/"
+    data = {
+        "email": EMAIL,
+        "password": PASSWORD
+    }
+
+    try:
+        response = requests.post(url, json=data)
+        response.raise_for_status()
+        return response.json()['access']
+    except requests.exceptions.RequestException as e:
+        print(f"Error getting token: {e}")
+        sys.exit(1)
+
+def get_tables(headers):
+    """Get the ids of the bookable tables from the availability grid."""
+    url = f"{API_BASE_URL}/reservations/reservations/availability_grid/"
+    response = requests.get(url, headers=headers, params={"date": BOOKING_DATE, "party_size": 1})
+    response.raise_for_status()
+    return [table['id'] for table in response.json()['tables']]
+
+def book(headers, table_id, index):
+    """Make one booking and return (status code, latency in ms)."""
+    start = datetime(2000, 1, 1, 17) + timedelta(minutes=15 * random.randrange(21))
+    data = {
+        "table": table_id,
+        "customer_name": f"Load test {index}",
+        "contact_phone": "0000000000",
+        "date": BOOKING_DATE,
+        "time": start.strftime('%H:%M'),
+        "duration": DURATION,
+        "party_size": 1,
+        "allow_alternative": index % 2 == 0,
+    }
+
+    began = time.perf_counter()
+    try:
+        response = requests.post(f"{API_BASE_URL}/reservations/reservations/", headers=headers, json=data)
+        status = response.status_code
+    except requests.exceptions.RequestException:
+        status = 'Error'
+    return status, (time.perf_counter() - began) * 1000
+
+def get_reservations(headers):
+    """Get every active reservation on the booking date."""
+    reservations = []
+    url = f"{API_BASE_URL}/reservations/reservations/"
+    params = {"date": BOOKING_DATE, "pagination": "cursor"}
+    while url:
+        response = requests.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        page = response.json()
+        reservations.extend(page['results'])
+        url, params = page.get('next'), None
+    return [r for r in reservations if r['status'] in ('confirmed', 'pending')]
+
+def find_overlaps(reservations):
+    """Return the pairs of reservations on the same table whose times overlap."""
+    by_table = {}
+    for reservation in reservations:
+        hours, minutes = map(int, reservation['time'].split(':')[:2])
+        start = hours * 60 + minutes
+        by_table.setdefault(reservation['table'], []).append((start, start + reservation['duration'], reservation['id']))
+
+    overlaps = []
+    for intervals in by_table.values():
+        intervals.sort()
+        for previous, current in zip(intervals, intervals[1:]):
+            if current[0] < previous[1]:
+                overlaps.append((previous[2], current[2]))
+    return overlaps
+
+def main():
+    print("=== Reservation Booking Load Test ===")
+    print(f"API Base URL: {API_BASE_URL}")
+    print(f"Booking date: {BOOKING_DATE}")
+    print(f"Bookings: {BOOKINGS}, concurrency: {CONCURRENCY}")
+
+    token = get_token()
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    tables = get_tables(headers)
+    if not tables:
+        print("No bookable tables found.")
+        sys.exit(1)
+
+    # Aim most of the burst at a few tables to force contention
+    hot_tables = tables[:3]
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        results = list(pool.map(
+            lambda index: book(headers, random.choice(hot_tables if index % 4 else tables), index),
+            range(BOOKINGS)
+        ))
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+    overlaps = find_overlaps(get_reservations(headers))
+
+    print("\n=== Results ===")
+    print(f"Responses: {statuses}")
+    print(f"Latency p50: {p50:.1f} ms, p99: {p99:.1f} ms")
+    print(f"Overlapping reservations: {len(overlaps)}")
+
+    failed = False
+    if overlaps:
+        print(f"❌ Double bookings found: {overlaps[:10]}")
+        failed = True
+    if p99 > P99_LIMIT_MS:
+        print(f"❌ p99 latency {p99:.1f} ms exceeds {P99_LIMIT_MS:.0f} ms")
+        failed = True
+    unexpected = {status: count for status, count in statuses.items() if status not in (201, 409)}
+    if unexpected:
+        print(f"❌ Unexpected responses: {unexpected}")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("\n🎉 No double bookings and latency within bounds.")
+
+if __name__ == "__main__":
+    main()
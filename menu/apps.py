@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+class MenuConfig(AppConfig):
+    name = 'menu'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,73 @@
+"""
+Menu availability ("86") changes and their broadcast.
+
+set_availability() marks menu items or modifier options available or sold
+out with a single UPDATE. Once the transaction commits it moves the menu
+version and pushes the delta to every terminal connected to ws/menu/
+(see menu/consumers.py):
+
+    {'type': 'availability', 'version': 1700000123,
+     'items': {'unavailable': [12, 13]}}
+
+Terminals that missed events resync from the version they last saw;
+availability_state() holds the full sets of unavailable ids for the current
+menu version and is cached until the menu changes again.
+"""
+import logging
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import MenuItem, ModifierOption
+from . import snapshot
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_GROUP = 'menu_availability'
+STATE_KEY = 'menu:availability:{}'
+STATE_TIMEOUT = 24 * 60 * 60
+KINDS = {'items': MenuItem, 'options': ModifierOption}
+
+def availability_state(version=None):
+    """Return the current version with the ids of every unavailable item and option."""
+    version = version if version is not None else snapshot.current_version()
+    key = STATE_KEY.format(version)
+    state = cache.get(key)
+    if state is None:
+        state = {'version': version}
+        for kind, model in KINDS.items():
+            state[kind] = sorted(model.objects.filter(is_available=False).values_list('id', flat=True))
+        cache.set(key, state, timeout=STATE_TIMEOUT)
+    return state
+
+def _broadcast(kind, is_available, ids):
+    def publish(version):
+        from .consumers import MenuConsumer
+        try:
+            MenuConsumer.broadcast({
+                'type': 'availability_delta',
+                'version': version,
+                'changes': {kind: {'available' if is_available else 'unavailable': ids}},
+            })
+        except Exception:
+            # The change is committed; terminals pick it up on their next sync
+            logger.exception("Could not broadcast availability of %s %s", kind, ids)
+    return publish
+
+@transaction.atomic
+def set_availability(queryset, is_available):
+    """
+    Set is_available on the menu items or modifier options in queryset.
+
+    Only rows whose availability changes are written, in one UPDATE, and
+    their ids are returned and broadcast once the transaction commits.
+    """
+    model = queryset.model
+    kind = next(kind for kind, kind_model in KINDS.items() if kind_model is model)
+    changed = sorted(
+        queryset.order_by().exclude(is_available=is_available).select_for_update().values_list('id', flat=True)
+    )
+    if changed:
+        # update() sends no signals and does not touch auto_now fields
+        model.objects.filter(pk__in=changed).update(is_available=is_available, updated_at=timezone.now())
+        snapshot.invalidate(then=_broadcast(kind, is_available, changed))
+    return changed
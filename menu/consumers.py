@@ -0,0 +1,58 @@
+import json
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from asgiref.sync import async_to_sync
+from .availability import AVAILABILITY_GROUP, availability_state
+
+class MenuConsumer(AsyncWebsocketConsumer):
+    """
+    Menu availability over WebSocket.
+
+    Clients receive an 'availability' message with the menu version and the
+    ids that became available or unavailable whenever items or options are
+    86'd. On connect (ws/menu/?version=<last seen version>) and on
+    {'type': 'sync', 'version': <last seen version>} the socket answers with
+    'availability_current' when the client is up to date, or otherwise with
+    'availability_state' listing every unavailable item and option.
+    """
+
+    async def connect(self):
+        await self.channel_layer.group_add(AVAILABILITY_GROUP, self.channel_name)
+        await self.accept()
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        await self.sync(query.get('version', [None])[0])
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(AVAILABILITY_GROUP, self.channel_name)
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    async def sync(self, version):
+        state = await self.get_state()
+        if str(version) == str(state['version']):
+            await self.send_json({'type': 'availability_current', 'version': state['version']})
+        else:
+            await self.send_json({'type': 'availability_state', **state})
+
+    async def receive(self, text_data):
+        text_data_json = json.loads(text_data)
+
+        if text_data_json.get('type') == 'sync':
+            await self.sync(text_data_json.get('version'))
+
+    async def availability_delta(self, event):
+        await self.send_json({'type': 'availability', 'version': event['version'], **event['changes']})
+
+    @database_sync_to_async
+    def get_state(self):
+        return availability_state()
+
+    @classmethod
+    def broadcast(cls, event):
+        """Send event to every connected terminal."""
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(AVAILABILITY_GROUP, event)
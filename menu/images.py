@@ -0,0 +1,91 @@
+"""
+Resized derivatives of menu item images.
+
+Uploads are kept as they are. generate_derivatives() renders WebP and JPEG
+copies at each of DERIVATIVE_WIDTHS that is not wider than the original and
+stores them next to it under derivatives/. The storage names are recorded
+on MenuItem.image_derivatives:
+
+    {'source': 'menu_items/pizza.jpg', 'width': 2400, 'height': 1600,
+     'variants': {'webp': [{'width': 160, 'height': 107, 'name': '...'}, ...],
+                  'jpeg': [...]}}
+
+derivative_sources() turns that into srcset-ready URLs for clients.
+"""
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+# (format, Pillow format name, extension, content type, save options)
+DERIVATIVE_FORMATS = (
+    ('webp', 'WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+CONTENT_TYPES = {name: content_type for name, _, _, content_type, _ in DERIVATIVE_FORMATS}
+
+def derivative_name(source, width, extension):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'derivatives', f'{stem}-{width}w.{extension}')
+
+def delete_derivatives(metadata, storage=default_storage):
+    """Delete the files recorded in image_derivatives metadata."""
+    for variants in (metadata or {}).get('variants', {}).values():
+        for variant in variants:
+            storage.delete(variant['name'])
+
+def generate_derivatives(source, storage=default_storage):
+    """Render and store the derivatives of the image stored as source, returning their metadata."""
+    with storage.open(source, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    widths = [width for width in DERIVATIVE_WIDTHS if width <= image.width] or [image.width]
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+
+    metadata = {'source': source, 'width': image.width, 'height': image.height, 'variants': {}}
+    for name, pil_format, extension, _, options in DERIVATIVE_FORMATS:
+        # JPEG has no alpha channel; WebP keeps transparency
+        mode = 'RGBA' if has_alpha and pil_format != 'JPEG' else 'RGB'
+        converted = image.convert(mode) if image.mode != mode else image
+
+        variants = []
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = converted.resize((width, height), Image.LANCZOS) if width != image.width else converted
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+
+            target = derivative_name(source, width, extension)
+            storage.delete(target)
+            variants.append({'width': width, 'height': height, 'name': storage.save(target, ContentFile(buffer.getvalue()))})
+        metadata['variants'][name] = variants
+    return metadata
+
+def derivative_sources(metadata, build_url=None, storage=default_storage):
+    """
+    Return srcset metadata for image_derivatives, or None without derivatives.
+
+    build_url turns storage URLs into absolute ones, e.g.
+    request.build_absolute_uri.
+    """
+    if not metadata or not metadata.get('variants'):
+        return None
+    build_url = build_url or (lambda url: url)
+
+    sources = []
+    for name, variants in metadata['variants'].items():
+        urls = [(build_url(storage.url(variant['name'])), variant) for variant in variants]
+        sources.append({
+            'type': CONTENT_TYPES.get(name),
+            'srcset': ', '.join(f"{url} {variant['width']}w" for url, variant in urls),
+            'variants': [
+                {'width': variant['width'], 'height': variant['height'], 'url': url}
+                for url, variant in urls
+            ],
+        })
+    return {'width': metadata.get('width'), 'height': metadata.get('height'), 'sources': sources}
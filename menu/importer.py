@@ -0,0 +1,398 @@
+"""
+Bulk menu import and export.
+
+A menu file is a stream of records, one per category, menu item, modifier
+group or modifier option, each with a "type". CSV files put every record on
+one row with the union of the columns below (empty cells are ignored); JSON
+Lines files hold one object per line, and a JSON array is accepted too.
+
+    category  slug, name, icon, description, station, is_active
+    item      slug, name, category (slug), description, price,
+              discount_percentage, food_type, ingredients, allergens,
+              preparation_time, is_available, is_featured,
+              modifiers (names, '|'-separated in CSV)
+    modifier  name, description, is_required, min_selections, max_selections
+    option    modifier (name), name, price, is_default, is_available
+
+Categories and items are matched on slug (derived from the name when
+missing), modifier groups on name and options on their group and name.
+Records are validated in chunks while the file is read, then everything is
+upserted in one transaction with bulk inserts and updates. An item's
+modifiers, when given, replace its modifier links. A dry run performs the
+whole import and rolls it back, so its report is exactly what a real run
+would change.
+"""
+import csv
+import json
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+from .models import Category, MenuItem, Modifier, ModifierOption
+from . import pricing, snapshot
+
+CHUNK_SIZE = 500
+BATCH_SIZE = 500
+MODIFIER_SEPARATOR = '|'
+FORMATS = ('csv', 'jsonl', 'json')
+
+CSV_COLUMNS = [
+    'type', 'slug', 'name', 'category', 'modifier', 'description', 'icon', 'station',
+    'price', 'discount_percentage', 'food_type', 'ingredients', 'allergens',
+    'preparation_time', 'is_required', 'min_selections', 'max_selections',
+    'is_default', 'is_available', 'is_active', 'is_featured', 'modifiers',
+]
+
+class CategoryRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=120, required=False)
+    name = serializers.CharField(max_length=100, required=False)
+    icon = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    station = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('slug') and not attrs.get('name'):
+            raise serializers.ValidationError("A slug or a name is required.")
+        return attrs
+
+class ItemRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=220, required=False)
+    name = serializers.CharField(max_length=200, required=False)
+    category = serializers.SlugField(max_length=120, required=False)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    discount_percentage = serializers.IntegerField(min_value=0, max_value=100, required=False)
+    food_type = serializers.ChoiceField(choices=MenuItem.FOOD_TYPE_CHOICES, required=False)
+    ingredients = serializers.CharField(required=False, allow_blank=True)
+    allergens = serializers.CharField(required=False, allow_blank=True)
+    preparation_time = serializers.IntegerField(min_value=0, required=False)
+    is_available = serializers.BooleanField(required=False)
+    is_featured = serializers.BooleanField(required=False)
+    modifiers = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('slug') and not attrs.get('name'):
+            raise serializers.ValidationError("A slug or a name is required.")
+        return attrs
+
+class ModifierRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True)
+    is_required = serializers.BooleanField(required=False)
+    min_selections = serializers.IntegerField(min_value=0, required=False)
+    max_selections = serializers.IntegerField(min_value=0, required=False)
+
+class OptionRowSerializer(serializers.Serializer):
+    modifier = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    is_default = serializers.BooleanField(required=False)
+    is_available = serializers.BooleanField(required=False)
+
+ROW_SERIALIZERS = {
+    'category': CategoryRowSerializer,
+    'item': ItemRowSerializer,
+    'modifier': ModifierRowSerializer,
+    'option': OptionRowSerializer,
+}
+
+class ImportFailed(Exception):
+    """Raised inside the import transaction to roll it back."""
+
+def guess_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in FORMATS else default
+
+def read_records(stream, format):
+    """Yield (line, record) pairs from a text stream without loading it whole."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            record = {key: value for key, value in row.items() if key and value not in ('', None)}
+            if isinstance(record.get('modifiers'), str):
+                record['modifiers'] = [
+                    name.strip() for name in record['modifiers'].split(MODIFIER_SEPARATOR) if name.strip()
+                ]
+            yield reader.line_num, record
+    elif format == 'jsonl':
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError as exc:
+                yield line, {'type': None, 'error': str(exc)}
+    elif format == 'json':
+        for line, record in enumerate(json.load(stream), 1):
+            yield line, record
+    else:
+        raise ValueError(f"Unsupported menu format: {format}")
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class MenuImport:
+    """Stage, validate and apply a menu file."""
+
+    def __init__(self):
+        self.staged = {record_type: {} for record_type in ROW_SERIALIZERS}
+        self.errors = []
+
+    def read(self, stream, format):
+        for chunk in _chunks(read_records(stream, format), CHUNK_SIZE):
+            self.stage(chunk)
+        return self
+
+    def stage(self, records):
+        """Validate a chunk of (line, record) pairs and stage the valid ones by key."""
+        for line, record in records:
+            if not isinstance(record, dict):
+                self.errors.append({'line': line, 'errors': ["Expected an object."]})
+                continue
+            record_type = record.get('type')
+            serializer_class = ROW_SERIALIZERS.get(record_type)
+            if serializer_class is None:
+                self.errors.append({'line': line, 'errors': [record.get('error') or f"Unknown type {record_type!r}."]})
+                continue
+            serializer = serializer_class(data=record)
+            if not serializer.is_valid():
+                self.errors.append({'line': line, 'type': record_type, 'errors': serializer.errors})
+                continue
+
+            data = dict(serializer.validated_data)
+            if record_type in ('category', 'item'):
+                data['slug'] = data.get('slug') or slugify(data['name'])
+                key = data['slug']
+            elif record_type == 'modifier':
+                key = data['name']
+            else:
+                key = (data['modifier'], data['name'])
+            # A later record for the same key refines the earlier one
+            self.staged[record_type].setdefault(key, {}).update(data)
+
+    def apply(self, dry_run=False):
+        """Upsert everything staged in one transaction and return the report."""
+        report = {'dry_run': dry_run, 'applied': False, 'errors': list(self.errors)}
+        if self.errors:
+            return report
+        try:
+            with transaction.atomic():
+                report.update(self._apply())
+                if report['errors']:
+                    raise ImportFailed()
+                if dry_run:
+                    transaction.set_rollback(True)
+                else:
+                    # Bulk writes send no signals
+                    pricing.resolve()
+                    snapshot.invalidate()
+        except ImportFailed:
+            return report
+        report['applied'] = not dry_run
+        return report
+
+    def _apply(self):
+        errors = []
+        now = timezone.now()
+
+        categories = self.staged['category']
+        existing = Category.objects.in_bulk(list(categories), field_name='slug')
+        category_report = _upsert(Category, categories, existing, now, ('name',), errors, 'category')
+
+        items = self.staged['item']
+        category_slugs = {data['category'] for data in items.values() if 'category' in data}
+        category_ids = {
+            slug: category.pk
+            for slug, category in Category.objects.in_bulk(list(category_slugs), field_name='slug').items()
+        }
+        item_values = {}
+        for slug, data in items.items():
+            values = {field: value for field, value in data.items() if field not in ('category', 'modifiers')}
+            if 'category' in data:
+                if data['category'] not in category_ids:
+                    errors.append({'type': 'item', 'key': slug, 'errors': [f"Unknown category {data['category']!r}."]})
+                    continue
+                values['category_id'] = category_ids[data['category']]
+            item_values[slug] = values
+        existing = MenuItem.objects.in_bulk(list(item_values), field_name='slug')
+        item_report = _upsert(
+            MenuItem, item_values, existing, now, ('name', 'category_id', 'price'), errors, 'item'
+        )
+
+        modifiers = self.staged['modifier']
+        option_groups = {modifier for modifier, _ in self.staged['option']}
+        linked = {name for data in items.values() for name in data.get('modifiers', [])}
+        existing = _modifiers_by_name(set(modifiers) | option_groups | linked)
+        modifier_report = _upsert(Modifier, modifiers, existing, now, ('name',), errors, 'modifier')
+        modifier_ids = {name: modifier.pk for name, modifier in _modifiers_by_name(option_groups | linked).items()}
+
+        option_values = {}
+        for (modifier, name), data in self.staged['option'].items():
+            if modifier not in modifier_ids:
+                errors.append({'type': 'option', 'key': f'{modifier}/{name}', 'errors': [f"Unknown modifier {modifier!r}."]})
+                continue
+            values = {field: value for field, value in data.items() if field != 'modifier'}
+            option_values[(modifier_ids[modifier], name)] = dict(values, modifier_id=modifier_ids[modifier])
+        existing = {
+            (option.modifier_id, option.name): option
+            for option in ModifierOption.objects.filter(modifier_id__in=set(modifier_ids.values()))
+        }
+        option_report = _upsert(ModifierOption, option_values, existing, now, ('name',), errors, 'option')
+        modifier_names = {pk: name for name, pk in modifier_ids.items()}
+        for change in ('created', 'updated'):
+            option_report[change] = [f'{modifier_names[pk]}/{name}' for pk, name in option_report[change]]
+
+        links = {slug: data['modifiers'] for slug, data in items.items() if 'modifiers' in data}
+        link_report = _replace_links(links, modifier_ids, errors)
+
+        return {
+            'errors': errors,
+            'categories': category_report,
+            'items': item_report,
+            'modifiers': modifier_report,
+            'options': option_report,
+            'links': link_report,
+        }
+
+def _modifiers_by_name(names):
+    # Modifier names are not unique; the oldest group of a name is the one matched
+    modifiers = {}
+    for modifier in Modifier.objects.filter(name__in=names).order_by('id'):
+        modifiers.setdefault(modifier.name, modifier)
+    return modifiers
+
+def _upsert(model, staged, existing, now, required, errors, record_type):
+    """Bulk create and update model rows from {key: values}, reporting what changed."""
+    created, updated, unchanged = [], [], 0
+    to_create, to_update, fields = [], [], set()
+    for key, values in staged.items():
+        instance = existing.get(key)
+        if instance is None:
+            missing = [field for field in required if values.get(field) in (None, '')]
+            if missing:
+                errors.append({'type': record_type, 'key': str(key), 'errors': [
+                    f"{field.replace('_id', '')} is required to create a {record_type}." for field in missing
+                ]})
+                continue
+            to_create.append(model(**values))
+            created.append(key)
+            continue
+
+        changed = [field for field, value in values.items() if getattr(instance, field) != value]
+        if not changed:
+            unchanged += 1
+            continue
+        for field in changed:
+            setattr(instance, field, values[field])
+        # bulk_update() does not touch auto_now fields itself
+        instance.updated_at = now
+        fields.update(changed)
+        to_update.append(instance)
+        updated.append(key)
+
+    model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(fields | {'updated_at'}), batch_size=BATCH_SIZE)
+    return {'created': created, 'updated': updated, 'unchanged': unchanged}
+
+def _replace_links(links, modifier_ids, errors):
+    """Make each item's modifier links exactly the named modifiers."""
+    Link = Modifier.menu_items.through
+    item_ids = {
+        slug: item.pk for slug, item in MenuItem.objects.in_bulk(list(links), field_name='slug').items()
+    }
+    wanted = set()
+    for slug, names in links.items():
+        unknown = [name for name in names if name not in modifier_ids]
+        if unknown:
+            errors.append({'type': 'item', 'key': slug, 'errors': [f"Unknown modifier {name!r}." for name in unknown]})
+            continue
+        if slug not in item_ids:
+            # The item itself failed and is already reported
+            continue
+        wanted.update((item_ids[slug], modifier_ids[name]) for name in names)
+
+    current = {
+        (menu_item_id, modifier_id): pk
+        for pk, menu_item_id, modifier_id in Link.objects.filter(
+            menuitem_id__in=item_ids.values()
+        ).values_list('id', 'menuitem_id', 'modifier_id')
+    }
+    removed = [pk for link, pk in current.items() if link not in wanted]
+    added = [
+        Link(menuitem_id=menu_item_id, modifier_id=modifier_id)
+        for menu_item_id, modifier_id in wanted if (menu_item_id, modifier_id) not in current
+    ]
+    if removed:
+        Link.objects.filter(pk__in=removed).delete()
+    Link.objects.bulk_create(added, batch_size=BATCH_SIZE)
+    return {'added': len(added), 'removed': len(removed)}
+
+def import_menu(stream, format, dry_run=False):
+    """Import a menu file from a text stream and return the report."""
+    return MenuImport().read(stream, format).apply(dry_run=dry_run)
+
+def export_records():
+    """Yield the whole menu as import records."""
+    for category in Category.objects.order_by('id').iterator():
+        yield {
+            'type': 'category', 'slug': category.slug, 'name': category.name, 'icon': category.icon,
+            'description': category.description, 'station': category.station, 'is_active': category.is_active,
+        }
+
+    modifier_names = dict(Modifier.objects.values_list('id', 'name'))
+    for modifier in Modifier.objects.order_by('id').iterator():
+        yield {
+            'type': 'modifier', 'name': modifier.name, 'description': modifier.description,
+            'is_required': modifier.is_required, 'min_selections': modifier.min_selections,
+            'max_selections': modifier.max_selections,
+        }
+    for option in ModifierOption.objects.order_by('modifier_id', 'id').iterator():
+        yield {
+            'type': 'option', 'modifier': modifier_names[option.modifier_id], 'name': option.name,
+            'price': str(option.price), 'is_default': option.is_default, 'is_available': option.is_available,
+        }
+
+    links = {}
+    for menu_item_id, modifier_id in Modifier.menu_items.through.objects.values_list('menuitem_id', 'modifier_id'):
+        links.setdefault(menu_item_id, []).append(modifier_names[modifier_id])
+    category_slugs = dict(Category.objects.values_list('id', 'slug'))
+    for item in MenuItem.objects.order_by('id').iterator():
+        yield {
+            'type': 'item', 'slug': item.slug, 'name': item.name, 'category': category_slugs[item.category_id],
+            'description': item.description, 'price': str(item.price),
+            'discount_percentage': item.discount_percentage, 'food_type': item.food_type,
+            'ingredients': item.ingredients, 'allergens': item.allergens,
+            'preparation_time': item.preparation_time, 'is_available': item.is_available,
+            'is_featured': item.is_featured, 'modifiers': links.get(item.id, []),
+        }
+
+class _Line:
+    """File-like object whose write() returns the line for csv.writer."""
+    def write(self, value):
+        return value
+
+def export_lines(format):
+    """Yield the menu export as lines of text, for streaming responses."""
+    if format == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(CSV_COLUMNS)
+        for record in export_records():
+            if 'modifiers' in record:
+                record['modifiers'] = MODIFIER_SEPARATOR.join(record['modifiers'])
+            yield writer.writerow([
+                str(record[column]).lower() if isinstance(record.get(column), bool) else record.get(column, '')
+                for column in CSV_COLUMNS
+            ])
+    elif format == 'jsonl':
+        for record in export_records():
+            yield json.dumps(record) + '\n'
+    else:
+        raise ValueError(f"Unsupported export format: {format}")
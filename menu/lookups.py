@@ -0,0 +1,145 @@
+"""
+Menu price and availability lookups for order entry.
+
+Order entry only needs a handful of fields per menu item and modifier
+option, so those are kept as compact records in two cache tiers: a
+per-process LRU with a short TTL in front of the shared cache. Both tiers
+are keyed by the menu version, so any menu change (see menu/signals.py)
+retires every cached record at once. In steady state resolving the prices
+of an order costs one cache round trip for the version and no queries.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+from .models import EffectivePrice, MenuItem, ModifierOption
+from . import snapshot
+
+# Entries held per process and how long they are trusted
+LOCAL_SIZE = 4096
+LOCAL_TTL = 300
+SHARED_KEY = 'menu:lookup:{}:{}:{}'
+SHARED_TIMEOUT = 24 * 60 * 60
+
+class MenuItemRecord:
+    __slots__ = ('id', 'category_id', 'price', 'discounted_price', 'is_available', 'effective_prices')
+
+    def __init__(self, id, category_id, price, discounted_price, is_available, effective_prices):
+        self.id = id
+        self.category_id = category_id
+        self.price = price
+        self.discounted_price = discounted_price
+        self.is_available = is_available
+        self.effective_prices = effective_prices
+
+    def price_for(self, dining_mode):
+        """The price to charge in dining_mode, as resolved by menu/pricing.py."""
+        return self.effective_prices.get(dining_mode, self.discounted_price)
+
+    @classmethod
+    def load(cls, ids):
+        menu_items = MenuItem.objects.only(
+            'id', 'category_id', 'price', 'discount_percentage', 'is_available'
+        ).in_bulk(ids)
+        effective_prices = {}
+        for menu_item_id, dining_mode, price in EffectivePrice.objects.filter(
+            menu_item_id__in=menu_items
+        ).values_list('menu_item_id', 'dining_mode', 'price'):
+            effective_prices.setdefault(menu_item_id, {})[dining_mode] = price
+        return {
+            pk: cls(pk, item.category_id, item.price, item.discounted_price, item.is_available,
+                    effective_prices.get(pk, {}))
+            for pk, item in menu_items.items()
+        }
+
+class ModifierOptionRecord:
+    __slots__ = ('id', 'modifier_id', 'price', 'is_available')
+
+    def __init__(self, id, modifier_id, price, is_available):
+        self.id = id
+        self.modifier_id = modifier_id
+        self.price = price
+        self.is_available = is_available
+
+    @classmethod
+    def load(cls, ids):
+        options = ModifierOption.objects.only('id', 'modifier_id', 'price', 'is_available').in_bulk(ids)
+        return {
+            pk: cls(pk, option.modifier_id, option.price, option.is_available)
+            for pk, option in options.items()
+        }
+
+class LocalCache:
+    """A small thread-safe LRU whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def set_many(self, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+local_cache = LocalCache(LOCAL_SIZE, LOCAL_TTL)
+
+def _lookup(record_class, ids, version=None):
+    ids = set(ids)
+    if not ids:
+        return {}
+    version = version if version is not None else snapshot.current_version()
+    kind = record_class.__name__
+    keys = {SHARED_KEY.format(version, kind, pk): pk for pk in ids}
+
+    # Process memory first, then the shared cache, then the database
+    records = {keys[key]: record for key, record in local_cache.get_many(keys).items()}
+    missing = {key: pk for key, pk in keys.items() if pk not in records}
+    if missing:
+        shared = cache.get_many(list(missing))
+        fetched = {
+            missing[key]: record_class(*values) for key, values in shared.items()
+        }
+        unknown = set(missing.values()) - set(fetched)
+        if unknown:
+            loaded = record_class.load(unknown)
+            cache.set_many({
+                SHARED_KEY.format(version, kind, pk): tuple(getattr(record, slot) for slot in record_class.__slots__)
+                for pk, record in loaded.items()
+            }, timeout=SHARED_TIMEOUT)
+            fetched.update(loaded)
+        local_cache.set_many({SHARED_KEY.format(version, kind, pk): record for pk, record in fetched.items()})
+        records.update(fetched)
+    return records
+
+def menu_items(ids, version=None):
+    """Return {id: MenuItemRecord} for the existing menu items among ids."""
+    return _lookup(MenuItemRecord, ids, version)
+
+def modifier_options(ids, version=None):
+    """Return {id: ModifierOptionRecord} for the existing modifier options among ids."""
+    return _lookup(ModifierOptionRecord, ids, version)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from menu.importer import export_lines
+
+class Command(BaseCommand):
+    help = 'Export the whole menu in the format read by import_menu.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', help='File to write; standard output by default.')
+    
+    def handle(self, *args, **options):
+        if not options['output']:
+            for line in export_lines(options['format']):
+                self.stdout.write(line, ending='')
+            return
+        
+        with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(export_lines(options['format']))
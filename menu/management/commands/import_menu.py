@@ -0,0 +1,32 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from menu.importer import FORMATS, guess_format, import_menu
+
+class Command(BaseCommand):
+    help = 'Import categories, menu items, modifiers and options from a CSV or JSON Lines menu file.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Menu file to import.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format; guessed from the extension by default.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change and roll everything back.')
+    
+    def handle(self, *args, **options):
+        format = options['format'] or guess_format(options['path'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_menu(stream, format, dry_run=options['dry_run'])
+        
+        if report['errors']:
+            self.stderr.write(json.dumps(report['errors'], indent=2, default=str))
+            raise CommandError(f"{len(report['errors'])} error(s); nothing was imported.")
+        
+        for section in ('categories', 'items', 'modifiers', 'options'):
+            counts = report[section]
+            self.stdout.write(f"{section}: {len(counts['created'])} created, "
+                              f"{len(counts['updated'])} updated, {counts['unchanged']} unchanged")
+        self.stdout.write(f"links: {report['links']['added']} added, {report['links']['removed']} removed")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run; no changes were saved.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Menu imported.'))
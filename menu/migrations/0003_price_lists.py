@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:31
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0002_menuitem_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('dining_mode', models.CharField(blank=True, choices=[('dine_in', 'Dine In'), ('take_away', 'Take Away'), ('delivery', 'Delivery')], help_text='Leave blank to apply to every dining mode', max_length=10)),
+                ('starts_at', models.DateTimeField(blank=True, null=True)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('start_time', models.TimeField(blank=True, help_text='Daily window start, local time', null=True)),
+                ('end_time', models.TimeField(blank=True, help_text='Daily window end, local time; before start_time for windows past midnight', null=True)),
+                ('weekdays', models.CharField(blank=True, help_text='Days the window opens on, 0 for Monday to 6 for Sunday, e.g. 01234', max_length=7)),
+                ('priority', models.PositiveIntegerField(default=0, help_text='The highest priority open list wins')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-priority', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceListEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_list_entries', to='menu.menuitem')),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='menu.pricelist')),
+            ],
+            options={
+                'unique_together': {('price_list', 'menu_item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='EffectivePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dining_mode', models.CharField(choices=[('dine_in', 'Dine In'), ('take_away', 'Take Away'), ('delivery', 'Delivery')], max_length=10)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_prices', to='menu.menuitem')),
+                ('price_list', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='effective_prices', to='menu.pricelist')),
+            ],
+            options={
+                'unique_together': {('menu_item', 'dining_mode')},
+            },
+        ),
+    ]
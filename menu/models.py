@@ -1,6 +1,26 @@
+from decimal import Decimal, ROUND_HALF_UP
 from django.db import models
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+CENT = Decimal('0.01')
+
+def apply_discount(price, percentage):
+    """Return price less percentage percent, rounded half up to the cent in Decimal arithmetic."""
+    if not percentage:
+        return price
+    discounted = Decimal(price) * (Decimal(100) - Decimal(percentage)) / Decimal(100)
+    return discounted.quantize(CENT, rounding=ROUND_HALF_UP)
+
+class CategoryQuerySet(models.QuerySet):
+    def with_item_counts(self):
+        """Annotate available_item_count, which item_count then reads instead of querying per row."""
+        queryset = self.annotate(
+            available_item_count=models.Count('menu_items', filter=models.Q(menu_items__is_available=True))
+        )
+        # Meta.ordering does not apply to aggregating queries
+        return queryset if self.query.order_by else queryset.order_by(*self.model._meta.ordering)
 
 class Category(models.Model):
     """Menu category model."""
@@ -8,10 +28,14 @@ class Category(models.Model):
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     icon = models.CharField(max_length=50, blank=True)
     description = models.TextField(blank=True)
+    station = models.CharField(max_length=50, blank=True, 
+                               help_text="Kitchen station that prepares items in this category, e.g. grill or bar")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CategoryQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Category"
         verbose_name_plural = "Categories"
@@ -27,6 +51,8 @@ class Category(models.Model):
     
     @property
     def item_count(self):
+        if hasattr(self, 'available_item_count'):
+            return self.available_item_count
         return self.menu_items.filter(is_available=True).count()
 
 class MenuItem(models.Model):
@@ -45,6 +71,8 @@ class MenuItem(models.Model):
     discount_percentage = models.PositiveIntegerField(default=0, validators=[MaxValueValidator(100)])
     food_type = models.CharField(max_length=10, choices=FOOD_TYPE_CHOICES, default='non_veg')
     image = models.ImageField(upload_to='menu_items/', blank=True, null=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False,
+                                         help_text="Resized copies of image, see menu/images.py")
     ingredients = models.TextField(blank=True)
     allergens = models.TextField(blank=True)
     preparation_time = models.PositiveIntegerField(help_text="Preparation time in minutes", default=15)
@@ -66,9 +94,7 @@ class MenuItem(models.Model):
     
     @property
     def discounted_price(self):
-        if self.discount_percentage > 0:
-            return self.price * (1 - self.discount_percentage / 100)
-        return self.price
+        return apply_discount(self.price, self.discount_percentage)
 
 class Modifier(models.Model):
     """Modifier group model for menu items (e.g., toppings, sizes)."""
@@ -97,3 +123,83 @@ class ModifierOption(models.Model):
     def __str__(self):
         return f"{self.modifier.name} - {self.name} (+${self.price})"
 
+
+class PriceList(models.Model):
+    """Prices that replace menu prices while the list's window is open, e.g. a happy hour."""
+    
+    # Same values as Order.DINING_MODE_CHOICES
+    DINING_MODE_CHOICES = (
+        ('dine_in', 'Dine In'),
+        ('take_away', 'Take Away'),
+        ('delivery', 'Delivery'),
+    )
+    
+    name = models.CharField(max_length=100)
+    dining_mode = models.CharField(max_length=10, choices=DINING_MODE_CHOICES, blank=True,
+                                   help_text="Leave blank to apply to every dining mode")
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True, help_text="Daily window start, local time")
+    end_time = models.TimeField(null=True, blank=True,
+                                help_text="Daily window end, local time; before start_time for windows past midnight")
+    weekdays = models.CharField(max_length=7, blank=True,
+                                help_text="Days the window opens on, 0 for Monday to 6 for Sunday, e.g. 01234")
+    priority = models.PositiveIntegerField(default=0, help_text="The highest priority open list wins")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-priority', 'name']
+    
+    def __str__(self):
+        return self.name
+    
+    def is_open_at(self, moment):
+        """Whether the list applies at moment."""
+        if not self.is_active:
+            return False
+        if self.starts_at is not None and moment < self.starts_at:
+            return False
+        if self.ends_at is not None and moment >= self.ends_at:
+            return False
+        
+        local = timezone.localtime(moment)
+        if self.weekdays and str(local.weekday()) not in self.weekdays:
+            return False
+        if self.start_time is None and self.end_time is None:
+            return True
+        now = local.time()
+        start, end = self.start_time, self.end_time
+        if start is None or end is None or start <= end:
+            return (start is None or start <= now) and (end is None or now < end)
+        return now >= start or now < end
+
+class PriceListEntry(models.Model):
+    """A menu item's price on a price list."""
+    price_list = models.ForeignKey(PriceList, related_name='entries', on_delete=models.CASCADE)
+    menu_item = models.ForeignKey(MenuItem, related_name='price_list_entries', on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('price_list', 'menu_item')
+    
+    def __str__(self):
+        return f"{self.price_list.name} - {self.menu_item.name} (${self.price})"
+
+class EffectivePrice(models.Model):
+    """The price a menu item sells for right now in a dining mode, maintained by menu/pricing.py."""
+    menu_item = models.ForeignKey(MenuItem, related_name='effective_prices', on_delete=models.CASCADE)
+    dining_mode = models.CharField(max_length=10, choices=PriceList.DINING_MODE_CHOICES)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    price_list = models.ForeignKey(PriceList, related_name='effective_prices', null=True, blank=True,
+                                   on_delete=models.SET_NULL)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('menu_item', 'dining_mode')
+    
+    def __str__(self):
+        return f"{self.menu_item.name} ({self.dining_mode}): ${self.price}"
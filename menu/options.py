@@ -0,0 +1,105 @@
+"""
+Diff-based updates of the options of a modifier group.
+
+Incoming options are matched to the group's existing options by id, or else
+by name, so editing a group keeps option ids stable: terminals keep their
+cached options and past OrderItemModifier rows keep pointing at the option
+they were rung up with. Options left out are retired (is_available=False)
+rather than deleted, since deleting one would cascade into order history.
+
+A sync costs one query to read the group's options, one bulk update and one
+bulk insert, however many options change.
+"""
+from django.utils import timezone
+from rest_framework import serializers
+from .models import ModifierOption
+
+BATCH_SIZE = 500
+
+def sync_options(modifier, options_data, existing=None, retire_missing=True):
+    """
+    Make modifier's options match options_data and return what changed.
+
+    Each entry holds option fields and optionally the id of one of
+    modifier's options. Listed options are available unless they set
+    is_available to False. existing can pass the group's options when they
+    are already known, e.g. [] for a new group. Raises ValidationError for
+    ids of other groups and options listed twice; run it in a transaction.
+    """
+    if existing is None:
+        existing = list(modifier.options.all())
+    by_id = {option.pk: option for option in existing}
+    # Prefer the available option, then the oldest, when names repeat
+    by_name = {}
+    for option in sorted(existing, key=lambda option: (not option.is_available, option.pk)):
+        by_name.setdefault(option.name, option)
+
+    now = timezone.now()
+    report = {'created': [], 'updated': [], 'retired': [], 'unchanged': 0}
+    errors = {}
+    matched, named = set(), set()
+    to_create, to_update, fields = [], [], set()
+    for index, data in enumerate(options_data):
+        values = dict(data)
+        pk = values.pop('id', None)
+        values.setdefault('is_available', True)
+        if pk is not None:
+            option = by_id.get(pk)
+            if option is None:
+                errors[index] = [f"Option {pk} does not belong to this modifier."]
+                continue
+        else:
+            name = values.get('name')
+            if name in named:
+                errors[index] = [f"Option {name!r} is listed more than once."]
+                continue
+            named.add(name)
+            option = by_name.get(name)
+            if option is not None and option.pk in matched:
+                # Claimed by id under another entry, so this is a new option
+                option = None
+
+        if option is None:
+            to_create.append(ModifierOption(modifier=modifier, **values))
+            report['created'].append(values.get('name'))
+            continue
+        if option.pk in matched:
+            errors[index] = [f"Option {option.pk} is listed more than once."]
+            continue
+        matched.add(option.pk)
+
+        changed = [field for field, value in values.items() if getattr(option, field) != value]
+        if not changed:
+            report['unchanged'] += 1
+            continue
+        for field in changed:
+            setattr(option, field, values[field])
+        # bulk_update() does not touch auto_now fields itself
+        option.updated_at = now
+        fields.update(changed)
+        to_update.append(option)
+        report['updated'].append(option.name)
+
+    if errors:
+        raise serializers.ValidationError({'options': errors})
+
+    if retire_missing:
+        for option in existing:
+            if option.pk in matched or not option.is_available:
+                continue
+            option.is_available = False
+            option.is_default = False
+            option.updated_at = now
+            fields.update(('is_available', 'is_default'))
+            to_update.append(option)
+            report['retired'].append(option.name)
+
+    if to_update:
+        ModifierOption.objects.bulk_update(to_update, sorted(fields | {'updated_at'}), batch_size=BATCH_SIZE)
+    if to_create:
+        ModifierOption.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update or to_create:
+        # Bulk writes send no signals; snapshot imports the serializers that use this module
+        from . import snapshot
+        snapshot.invalidate()
+    return report
@@ -0,0 +1,144 @@
+"""
+Price lists and effective prices.
+
+A menu item sells for its price less its discount unless a price list that
+is open covers it: the open list with the highest priority that has an
+entry for the item and applies to the dining mode wins. resolve() works
+this out in Decimal arithmetic for every item and dining mode and stores
+the result in EffectivePrice, so order entry reads one precomputed price
+per line (see menu/lookups.py) instead of evaluating windows and discounts.
+
+resolve() runs from Celery beat every RESOLVE_INTERVAL to open and close
+price list windows, and right after anything it depends on is edited (see
+menu/signals.py). Only rows whose price changes are written, and the menu
+version only moves when one does.
+
+reprice() changes many prices at once with set-based writes, either the
+menu prices themselves or a price list's entries.
+"""
+from decimal import Decimal
+from django.db.models import F, Value, DecimalField
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+from .models import CENT, EffectivePrice, MenuItem, PriceList, PriceListEntry, apply_discount
+from . import snapshot
+
+RESOLVE_INTERVAL = 60
+BATCH_SIZE = 500
+DINING_MODES = [mode for mode, _ in PriceList.DINING_MODE_CHOICES]
+
+def open_price_lists(moment=None):
+    """Return the price lists open at moment, highest priority first."""
+    moment = moment or timezone.now()
+    return [price_list for price_list in PriceList.objects.filter(is_active=True) if price_list.is_open_at(moment)]
+
+def resolve(menu_item_ids=None, moment=None):
+    """
+    Bring EffectivePrice up to date for menu_item_ids, or every menu item.
+
+    Returns the number of rows created, updated or deleted.
+    """
+    price_lists = open_price_lists(moment)
+    items = MenuItem.objects.all()
+    effective = EffectivePrice.objects.all()
+    entries = PriceListEntry.objects.filter(price_list__in=price_lists)
+    if menu_item_ids is not None:
+        items = items.filter(pk__in=menu_item_ids)
+        effective = effective.filter(menu_item_id__in=menu_item_ids)
+        entries = entries.filter(menu_item_id__in=menu_item_ids)
+
+    list_prices = {}
+    for price_list_id, menu_item_id, price in entries.values_list('price_list_id', 'menu_item_id', 'price'):
+        list_prices[(price_list_id, menu_item_id)] = price
+
+    wanted = {}
+    for menu_item_id, price, discount_percentage in items.values_list('id', 'price', 'discount_percentage'):
+        base = apply_discount(price, discount_percentage)
+        for mode in DINING_MODES:
+            wanted[(menu_item_id, mode)] = (base, None)
+            for price_list in price_lists:
+                if price_list.dining_mode not in ('', mode):
+                    continue
+                listed = list_prices.get((price_list.pk, menu_item_id))
+                if listed is not None:
+                    wanted[(menu_item_id, mode)] = (listed.quantize(CENT), price_list.pk)
+                    break
+
+    now = timezone.now()
+    to_update, stale = [], []
+    for row in effective:
+        key = (row.menu_item_id, row.dining_mode)
+        if key not in wanted:
+            stale.append(row.pk)
+            continue
+        price, price_list_id = wanted.pop(key)
+        if row.price != price or row.price_list_id != price_list_id:
+            row.price, row.price_list_id, row.updated_at = price, price_list_id, now
+            to_update.append(row)
+    to_create = [
+        EffectivePrice(menu_item_id=menu_item_id, dining_mode=mode, price=price, price_list_id=price_list_id)
+        for (menu_item_id, mode), (price, price_list_id) in wanted.items()
+    ]
+
+    if stale:
+        EffectivePrice.objects.filter(pk__in=stale).delete()
+    if to_update:
+        EffectivePrice.objects.bulk_update(to_update, ['price', 'price_list_id', 'updated_at'], batch_size=BATCH_SIZE)
+    if to_create:
+        EffectivePrice.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    changed = len(stale) + len(to_update) + len(to_create)
+    if changed:
+        snapshot.invalidate()
+    return changed
+
+def _adjusted(value, mode, amount):
+    """Adjust a Decimal price by percent or an absolute amount, never below zero."""
+    if mode == 'percent':
+        value = value * (Decimal(100) + amount) / Decimal(100)
+    else:
+        value = value + amount
+    return max(value, Decimal(0)).quantize(CENT)
+
+def reprice(menu_items, mode, amount, price_list=None):
+    """
+    Raise or lower the prices of the menu_items queryset and return how many changed.
+
+    mode is 'percent' or 'absolute'; amount is a signed Decimal. Without
+    price_list, menu prices are adjusted in a single UPDATE. With one, the
+    list's entries for menu_items are set to the adjusted discounted menu
+    price, so applying "-20 percent" twice yields the same list.
+    """
+    now = timezone.now()
+    if price_list is None:
+        if mode == 'percent':
+            adjusted = F('price') * Value((Decimal(100) + amount) / Decimal(100))
+        else:
+            adjusted = F('price') + Value(amount)
+        zero = Value(Decimal(0), output_field=DecimalField(max_digits=10, decimal_places=2))
+        changed = menu_items.order_by().update(
+            price=Greatest(Round(adjusted, 2, output_field=DecimalField(max_digits=10, decimal_places=2)), zero),
+            updated_at=now
+        )
+        # update() sends no signals; resolve() publishes a new menu version when
+        # an effective price moved, which leaves only list-priced items to cover
+        if not resolve(menu_items.values_list('id', flat=True)) and changed:
+            snapshot.invalidate()
+        return changed
+
+    existing = {entry.menu_item_id: entry for entry in price_list.entries.filter(menu_item__in=menu_items)}
+    to_update, to_create = [], []
+    for menu_item_id, price, discount_percentage in menu_items.values_list('id', 'price', 'discount_percentage'):
+        price = _adjusted(apply_discount(price, discount_percentage), mode, amount)
+        entry = existing.get(menu_item_id)
+        if entry is None:
+            to_create.append(PriceListEntry(price_list=price_list, menu_item_id=menu_item_id, price=price))
+        elif entry.price != price:
+            entry.price, entry.updated_at = price, now
+            to_update.append(entry)
+    if to_update:
+        PriceListEntry.objects.bulk_update(to_update, ['price', 'updated_at'], batch_size=BATCH_SIZE)
+    if to_create:
+        PriceListEntry.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update or to_create:
+        resolve([entry.menu_item_id for entry in to_update + to_create])
+    return len(to_update) + len(to_create)
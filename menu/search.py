@@ -0,0 +1,223 @@
+"""
+In-process menu search.
+
+MenuSearchIndex keeps an inverted index of menu item names, descriptions,
+ingredients and allergens in memory, with a sorted vocabulary so that every
+query token also matches as a prefix for type-ahead. Ingredients and
+allergens get their own token indexes for the "contains" and "excludes
+allergen" predicates.
+
+The index follows the menu version (menu/snapshot.py). When the version
+moves, only items updated since the last refresh are re-tokenized and
+deleted items are dropped, so keeping it current costs two small queries
+per menu change rather than a rebuild.
+"""
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import timedelta
+from .models import Category, MenuItem
+from . import snapshot
+
+# Relative weight of a token found in each field
+FIELD_WEIGHTS = {'name': 4.0, 'ingredients': 2.0, 'description': 1.0, 'allergens': 1.0}
+# Score factor for a token matched only as a prefix of an indexed term
+PREFIX_FACTOR = 0.5
+# Re-read items this far before the last refresh to catch late commits
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+INDEXED_FIELDS = (
+    'id', 'category_id', 'name', 'description', 'ingredients', 'allergens', 'food_type',
+    'price', 'discount_percentage', 'is_available', 'is_featured', 'updated_at',
+)
+
+def normalize(text):
+    """Lowercase text and strip accents."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text))
+
+def split_terms(value):
+    """Split a query parameter or free-text list on commas and semicolons."""
+    if isinstance(value, (list, tuple)):
+        value = ','.join(value)
+    return [phrase.strip() for phrase in re.split(r'[,;\n]', value or '') if phrase.strip()]
+
+class _Entry:
+    __slots__ = (
+        'id', 'category_id', 'name', 'food_type', 'price', 'discounted_price',
+        'is_available', 'is_featured', 'terms', 'ingredients', 'allergens',
+    )
+
+    def __init__(self, item):
+        self.id = item.id
+        self.category_id = item.category_id
+        self.name = item.name
+        self.food_type = item.food_type
+        self.price = item.price
+        self.discounted_price = item.discounted_price
+        self.is_available = item.is_available
+        self.is_featured = item.is_featured
+
+        terms = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in set(tokenize(getattr(item, field))):
+                terms[token] += weight
+        self.terms = dict(terms)
+        self.ingredients = frozenset(tokenize(item.ingredients))
+        self.allergens = frozenset(tokenize(item.allergens))
+
+class MenuSearchIndex:
+    def __init__(self):
+        self.version = None
+        self.synced_at = None
+        self.entries = {}
+        self.categories = {}
+        self.postings = {}
+        self.vocabulary = []
+        self.ingredients = defaultdict(set)
+        self.allergens = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def _add(self, entry):
+        self.entries[entry.id] = entry
+        for term, weight in entry.terms.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                bisect.insort(self.vocabulary, term)
+            self.postings[term][entry.id] = weight
+        for token in entry.ingredients:
+            self.ingredients[token].add(entry.id)
+        for token in entry.allergens:
+            self.allergens[token].add(entry.id)
+
+    def _remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return
+        for term in entry.terms:
+            postings = self.postings[term]
+            postings.pop(pk, None)
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+        for index, tokens in ((self.ingredients, entry.ingredients), (self.allergens, entry.allergens)):
+            for token in tokens:
+                index[token].discard(pk)
+                if not index[token]:
+                    del index[token]
+
+    def refresh(self):
+        """Bring the index up to the current menu version."""
+        version = snapshot.current_version()
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            changed = MenuItem.objects.only(*INDEXED_FIELDS)
+            if self.synced_at is not None:
+                changed = changed.filter(updated_at__gte=self.synced_at - REFRESH_OVERLAP)
+                existing = set(MenuItem.objects.values_list('id', flat=True))
+                for pk in set(self.entries) - existing:
+                    self._remove(pk)
+
+            for item in changed:
+                self._remove(item.id)
+                self._add(_Entry(item))
+                if self.synced_at is None or item.updated_at > self.synced_at:
+                    self.synced_at = item.updated_at
+
+            self.categories = dict(Category.objects.values_list('id', 'name'))
+            self.version = version
+
+    def _prefix_matches(self, token):
+        vocabulary = self.vocabulary
+        for position in range(bisect.bisect_left(vocabulary, token), len(vocabulary)):
+            if not vocabulary[position].startswith(token):
+                break
+            yield vocabulary[position]
+
+    def _with_tokens(self, index, phrase):
+        """Return the ids whose tokens in index cover every token of phrase, as prefixes."""
+        matched = None
+        for token in tokenize(phrase):
+            ids = set()
+            for term, term_ids in index.items():
+                if term.startswith(token):
+                    ids |= term_ids
+            matched = ids if matched is None else matched & ids
+        return matched or set()
+
+    def search(self, query='', contains=(), excludes=(), category=None, food_type=None,
+               available_only=True, limit=20):
+        """
+        Return ranked compact results for query.
+
+        Every query token must match a term exactly or as a prefix. Items
+        must contain every ingredient in contains and none of the allergens
+        in excludes; allergen matching is by prefix, so excluding "nut"
+        also excludes "nuts".
+        """
+        self.refresh()
+        with self._lock:
+            scores = None
+            for token in tokenize(query):
+                token_scores = {}
+                for term in self._prefix_matches(token):
+                    factor = 1.0 if term == token else PREFIX_FACTOR
+                    for pk, weight in self.postings[term].items():
+                        token_scores[pk] = max(token_scores.get(pk, 0.0), weight * factor)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pk: score + token_scores[pk] for pk, score in scores.items() if pk in token_scores}
+            if scores is None:
+                scores = dict.fromkeys(self.entries, 0.0)
+
+            for phrase in contains:
+                included = self._with_tokens(self.ingredients, phrase)
+                scores = {pk: score for pk, score in scores.items() if pk in included}
+            for phrase in excludes:
+                excluded = self._with_tokens(self.allergens, phrase)
+                scores = {pk: score for pk, score in scores.items() if pk not in excluded}
+
+            results = []
+            for pk, score in scores.items():
+                entry = self.entries[pk]
+                if available_only and not entry.is_available:
+                    continue
+                if category is not None and entry.category_id != category:
+                    continue
+                if food_type and entry.food_type != food_type:
+                    continue
+                results.append((score, entry))
+
+            ranked = heapq.nsmallest(
+                limit, results, key=lambda result: (-result[0], not result[1].is_featured, result[1].name)
+            )
+            return [self._result(entry, score) for score, entry in ranked]
+
+    def _result(self, entry, score):
+        return {
+            'id': entry.id,
+            'name': entry.name,
+            'category': entry.category_id,
+            'category_name': self.categories.get(entry.category_id),
+            'food_type': entry.food_type,
+            'price': str(entry.price),
+            'discounted_price': str(entry.discounted_price),
+            'is_available': entry.is_available,
+            'score': round(score, 2),
+        }
+
+index = MenuSearchIndex()
+
+def search(**kwargs):
+    """Search the menu with the process-wide index."""
+    return index.search(**kwargs)
@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Category, MenuItem, Modifier, ModifierOption
+from .images import derivative_sources
+from .models import Category, EffectivePrice, MenuItem, Modifier, ModifierOption, PriceList, PriceListEntry
+from .options import sync_options
 
 class ModifierOptionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,25 +17,37 @@ class ModifierSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'is_required', 'min_selections', 
                   'max_selections', 'options']
 
+class EffectivePriceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EffectivePrice
+        fields = ['dining_mode', 'price', 'price_list']
+
 class MenuItemSerializer(serializers.ModelSerializer):
     category_name = serializers.ReadOnlyField(source='category.name')
     discounted_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     modifiers = ModifierSerializer(many=True, read_only=True)
+    effective_prices = EffectivePriceSerializer(many=True, read_only=True)
+    image_set = serializers.SerializerMethodField()
     
     class Meta:
         model = MenuItem
         fields = ['id', 'category', 'category_name', 'name', 'slug', 'description', 
-                  'price', 'discount_percentage', 'discounted_price', 'food_type', 
-                  'image', 'ingredients', 'allergens', 'preparation_time', 
+                  'price', 'discount_percentage', 'discounted_price', 'effective_prices', 'food_type', 
+                  'image', 'image_set', 'ingredients', 'allergens', 'preparation_time', 
                   'is_available', 'is_featured', 'modifiers', 'created_at', 'updated_at']
         read_only_fields = ['slug', 'created_at', 'updated_at']
+    
+    def get_image_set(self, obj):
+        # Resized WebP and JPEG copies with srcset strings, once rendered
+        request = self.context.get('request')
+        return derivative_sources(obj.image_derivatives, request.build_absolute_uri if request else None)
 
 class CategorySerializer(serializers.ModelSerializer):
     item_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'icon', 'description', 'is_active', 
+        fields = ['id', 'name', 'slug', 'icon', 'description', 'station', 'is_active', 
                   'item_count', 'created_at', 'updated_at']
         read_only_fields = ['slug', 'created_at', 'updated_at']
 
@@ -43,6 +58,9 @@ class CategoryWithItemsSerializer(CategorySerializer):
         fields = CategorySerializer.Meta.fields + ['menu_items']
 
 class ModifierOptionCreateSerializer(serializers.ModelSerializer):
+    # Writable so updates can match existing options by id
+    id = serializers.IntegerField(required=False)
+    
     class Meta:
         model = ModifierOption
         fields = ['id', 'name', 'price', 'is_default', 'is_available']
@@ -55,6 +73,7 @@ class ModifierCreateSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'is_required', 'min_selections', 
                   'max_selections', 'menu_items', 'options']
     
+    @transaction.atomic
     def create(self, validated_data):
         options_data = validated_data.pop('options', [])
         menu_items = validated_data.pop('menu_items', [])
@@ -64,11 +83,14 @@ class ModifierCreateSerializer(serializers.ModelSerializer):
         if menu_items:
             modifier.menu_items.set(menu_items)
         
+        # A new group has no options to match ids against
         for option_data in options_data:
-            ModifierOption.objects.create(modifier=modifier, **option_data)
+            option_data.pop('id', None)
+        sync_options(modifier, options_data, existing=[])
         
         return modifier
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         options_data = validated_data.pop('options', None)
         menu_items = validated_data.pop('menu_items', None)
@@ -82,11 +104,63 @@ class ModifierCreateSerializer(serializers.ModelSerializer):
         if menu_items is not None:
             instance.menu_items.set(menu_items)
         
-        # Update options if provided
+        # Update options in place if provided; left-out options are retired, not deleted
         if options_data is not None:
-            instance.options.all().delete()
-            for option_data in options_data:
-                ModifierOption.objects.create(modifier=instance, **option_data)
+            sync_options(instance, options_data)
         
         return instance
 
+
+class AvailabilityUpdateSerializer(serializers.Serializer):
+    """Rows to mark available or sold out, selected by ids or the subclass's filters."""
+    is_available = serializers.BooleanField()
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    
+    def validate(self, attrs):
+        selectors = [field for field in self.fields if field != 'is_available']
+        if not any(field in attrs for field in selectors):
+            raise serializers.ValidationError(f"Select rows with at least one of: {', '.join(selectors)}.")
+        return attrs
+
+class MenuItemAvailabilitySerializer(AvailabilityUpdateSerializer):
+    category = serializers.IntegerField(required=False)
+    ingredient = serializers.CharField(required=False)
+
+class ModifierOptionAvailabilitySerializer(AvailabilityUpdateSerializer):
+    modifier = serializers.IntegerField(required=False)
+    name = serializers.CharField(required=False)
+
+class PriceListEntrySerializer(serializers.ModelSerializer):
+    menu_item_name = serializers.ReadOnlyField(source='menu_item.name')
+    
+    class Meta:
+        model = PriceListEntry
+        fields = ['id', 'price_list', 'menu_item', 'menu_item_name', 'price', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+class PriceListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceList
+        fields = ['id', 'name', 'dining_mode', 'starts_at', 'ends_at', 'start_time', 'end_time', 
+                  'weekdays', 'priority', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+    
+    def validate_weekdays(self, value):
+        if any(day not in '0123456' for day in value):
+            raise serializers.ValidationError("Use the digits 0 (Monday) to 6 (Sunday).")
+        return ''.join(sorted(set(value)))
+
+class RepriceSerializer(serializers.Serializer):
+    """A price change for the items selected by ids or category."""
+    mode = serializers.ChoiceField(choices=['percent', 'absolute'])
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    category = serializers.IntegerField(required=False)
+    price_list = serializers.PrimaryKeyRelatedField(queryset=PriceList.objects.all(), required=False)
+    
+    def validate(self, attrs):
+        if 'ids' not in attrs and 'category' not in attrs:
+            raise serializers.ValidationError("Select items with ids or category.")
+        if attrs['mode'] == 'percent' and attrs['amount'] < -100:
+            raise serializers.ValidationError({'amount': ["A price cannot drop by more than 100 percent."]})
+        return attrs
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .models import Category, MenuItem, Modifier, ModifierOption, PriceList, PriceListEntry
+from . import pricing, snapshot
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Modifier)
+@receiver(post_delete, sender=Modifier)
+@receiver(post_save, sender=ModifierOption)
+@receiver(post_delete, sender=ModifierOption)
+@receiver(m2m_changed, sender=Modifier.menu_items.through)
+def menu_changed(sender, **kwargs):
+    """Publish a new menu version when anything on the menu changes."""
+    # m2m_changed fires before and after every change; only act once it happened
+    if kwargs.get('action', 'post_').startswith('post_'):
+        snapshot.invalidate()
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, **kwargs):
+    """Keep the item's effective prices in step with its price and discount."""
+    pricing.resolve([instance.pk])
+
+@receiver(post_save, sender=PriceList)
+@receiver(post_delete, sender=PriceList)
+def price_list_changed(sender, instance, **kwargs):
+    """Re-resolve every effective price in the background when a price list or its window changes."""
+    from .tasks import resolve_effective_prices
+    transaction.on_commit(resolve_effective_prices.delay)
+
+@receiver(post_save, sender=PriceListEntry)
+@receiver(post_delete, sender=PriceListEntry)
+def price_list_entry_changed(sender, instance, **kwargs):
+    """Re-resolve the effective prices of the entry's menu item."""
+    pricing.resolve([instance.menu_item_id])
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_image_changed(sender, instance, **kwargs):
+    """Render resized copies of a new image in the background."""
+    if (instance.image.name or '') != (instance.image_derivatives or {}).get('source', ''):
+        from .tasks import generate_image_derivatives
+        transaction.on_commit(lambda: generate_image_derivatives.delay(instance.pk))
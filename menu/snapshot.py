@@ -0,0 +1,68 @@
+"""
+Precompiled full-menu snapshot.
+
+The by_category document (every active category with its items, modifiers
+and options) is rendered once per menu version, gzip-compressed and kept in
+the cache, so menu reads cost a cache hit and no queries. Any change to a
+category, menu item, modifier or option bumps the menu version once its
+transaction commits (see menu/signals.py), and the next read renders the
+snapshot for the new version. Clients revalidate with the "menu-<version>"
+ETag.
+"""
+import gzip
+import time
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from restaurant_pos.prefetch import plan_queryset
+from .models import Category
+from .serializers import CategoryWithItemsSerializer
+
+VERSION_KEY = 'menu:version'
+SNAPSHOT_KEY = 'menu:snapshot:{}'
+# Snapshots of superseded versions simply expire
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+def current_version():
+    """Return the current menu version."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so versions keep increasing if the cache is flushed
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+        return cache.incr(VERSION_KEY)
+
+def invalidate(then=None):
+    """
+    Move the menu to a new version once the current transaction commits.
+
+    then, if given, is called with the new version.
+    """
+    def bump():
+        version = _bump_version()
+        if then is not None:
+            then(version)
+    transaction.on_commit(bump)
+
+def render_menu():
+    """Render the full menu document as JSON bytes."""
+    categories = Category.objects.filter(is_active=True).with_item_counts()
+    categories = plan_queryset(categories, CategoryWithItemsSerializer)
+    return JSONRenderer().render(CategoryWithItemsSerializer(categories, many=True).data)
+
+def get_snapshot():
+    """Return (version, gzip-compressed menu JSON), rendering it if needed."""
+    version = current_version()
+    key = SNAPSHOT_KEY.format(version)
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = gzip.compress(render_menu())
+        cache.set(key, compressed, timeout=SNAPSHOT_TIMEOUT)
+    return version, compressed
@@ -0,0 +1,39 @@
+import logging
+from restaurant_pos.celery import app
+from .images import delete_derivatives, generate_derivatives
+from .models import MenuItem
+from . import pricing, snapshot
+
+logger = logging.getLogger(__name__)
+
+@app.task(ignore_result=True)
+def generate_image_derivatives(menu_item_id):
+    """Render the resized image derivatives of a menu item's current image."""
+    item = MenuItem.objects.only('id', 'image', 'image_derivatives').filter(pk=menu_item_id).first()
+    if item is None:
+        return
+    source = item.image.name or ''
+    previous = item.image_derivatives or {}
+    if previous.get('source', '') == source:
+        return
+
+    metadata = {}
+    if source:
+        try:
+            metadata = generate_derivatives(source)
+        except Exception:
+            # Record the attempt so an unreadable upload is not retried on every save
+            logger.exception("Could not render derivatives of %s for menu item %s", source, menu_item_id)
+            metadata = {'source': source, 'variants': {}}
+
+    # Only record them if the image was not replaced in the meantime
+    if MenuItem.objects.filter(pk=menu_item_id, image=source).update(image_derivatives=metadata):
+        delete_derivatives(previous)
+        snapshot.invalidate()
+    else:
+        delete_derivatives(metadata)
+
+@app.task(ignore_result=True)
+def resolve_effective_prices():
+    """Open and close price list windows by re-resolving every effective price."""
+    return pricing.resolve()
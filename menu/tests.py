@@ -0,0 +1,152 @@
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from PIL import Image
+from menu.images import generate_derivatives
+from menu.models import Category, MenuItem, Modifier, ModifierOption, PriceList, PriceListEntry
+from menu.pricing import reprice
+from users.models import User
+
+class CategoryQueryCountTests(TestCase):
+    """Category reads cost the same number of queries however many categories and items there are."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(email='server@example.com', password='x', name='Server', role='server')
+        )
+        self.modifier = Modifier.objects.create(name='Extras')
+        ModifierOption.objects.create(modifier=self.modifier, name='Cheese', price=Decimal('1.00'))
+
+    def create_categories(self, categories, items):
+        created = []
+        for index in range(categories):
+            category = Category.objects.create(name=f'Category {Category.objects.count()} {index}')
+            menu_items = [
+                MenuItem.objects.create(
+                    category=category, name=f'{category.name} dish {number}', price=Decimal('10.00'),
+                    # Unavailable items are left out of item_count
+                    is_available=number % 2 == 0
+                )
+                for number in range(items)
+            ]
+            self.modifier.menu_items.add(*menu_items)
+            created.append(category)
+        return created
+
+    def count_queries(self, url):
+        # Menu reads are validated against the cached menu version; read cold every time
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list(self):
+        self.create_categories(1, 1)
+        single = self.count_queries('/api/menu/categories/')
+        self.create_categories(8, 4)
+        cache.clear()
+        with self.assertNumQueries(single):
+            response = self.client.get('/api/menu/categories/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if 'results' in response.data else response.data
+        self.assertEqual(len(results), 9)
+        self.assertEqual(sorted(category['item_count'] for category in results), [1] + [2] * 8)
+
+    def test_items(self):
+        small, = self.create_categories(1, 1)
+        single = self.count_queries(f'/api/menu/categories/{small.pk}/items/')
+        large, = self.create_categories(1, 10)
+        cache.clear()
+        with self.assertNumQueries(single):
+            response = self.client.get(f'/api/menu/categories/{large.pk}/items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['menu_items']), 10)
+        self.assertEqual(response.data['item_count'], 5)
+
+class RepricingTests(TestCase):
+    """Repricing publishes one menu version, and price list changes resolve in the background."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Mains')
+        self.menu_items = [
+            MenuItem.objects.create(category=self.category, name=f'Dish {index}', price=Decimal('10.00'))
+            for index in range(3)
+        ]
+
+    def test_reprice_invalidates_once(self):
+        with mock.patch('menu.snapshot.invalidate') as invalidate:
+            self.assertEqual(reprice(MenuItem.objects.all(), 'percent', Decimal('10')), 3)
+        self.assertEqual(invalidate.call_count, 1)
+        self.assertEqual(MenuItem.objects.get(pk=self.menu_items[0].pk).price, Decimal('11.00'))
+
+    def test_reprice_of_list_priced_items_still_invalidates(self):
+        price_list = PriceList.objects.create(name='Always')
+        for menu_item in self.menu_items:
+            PriceListEntry.objects.create(price_list=price_list, menu_item=menu_item, price=Decimal('8.00'))
+        with mock.patch('menu.snapshot.invalidate') as invalidate:
+            reprice(MenuItem.objects.all(), 'absolute', Decimal('1.00'))
+        self.assertEqual(invalidate.call_count, 1)
+
+    def test_price_list_change_queues_resolution(self):
+        with mock.patch('menu.tasks.resolve_effective_prices.delay') as delay, \
+                mock.patch('menu.pricing.resolve') as resolve:
+            with self.captureOnCommitCallbacks(execute=True):
+                PriceList.objects.create(name='Happy hour')
+        resolve.assert_not_called()
+        delay.assert_called_once_with()
+
+class MenuSnapshotTests(TestCase):
+    """Clients holding the current menu version are answered without the snapshot."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(email='server@example.com', password='x', name='Server', role='server')
+        )
+        MenuItem.objects.create(category=Category.objects.create(name='Mains'), name='Dish', price=Decimal('10.00'))
+
+    def test_current_etag_skips_the_snapshot(self):
+        response = self.client.get('/api/menu/items/by_category/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with mock.patch('menu.snapshot.get_snapshot') as get_snapshot, self.assertNumQueries(0):
+            response = self.client.get('/api/menu/items/by_category/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        get_snapshot.assert_not_called()
+
+    def test_stale_etag_gets_the_menu(self):
+        stale = self.client.get('/api/menu/items/by_category/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(category=Category.objects.get(), name='Other', price=Decimal('5.00'))
+        response = self.client.get('/api/menu/items/by_category/', HTTP_IF_NONE_MATCH=stale)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], stale)
+
+class ImageDerivativeTests(SimpleTestCase):
+    """Derivatives are rendered at every configured width up to the original's."""
+
+    def widths(self, width):
+        storage = InMemoryStorage()
+        buffer = BytesIO()
+        Image.new('RGB', (width, width // 2)).save(buffer, 'JPEG')
+        source = storage.save('menu_items/dish.jpg', ContentFile(buffer.getvalue()))
+        metadata = generate_derivatives(source, storage=storage)
+        return [variant['width'] for variant in metadata['variants']['webp']]
+
+    def test_width_equal_to_the_original_is_kept(self):
+        self.assertEqual(self.widths(640), [160, 320, 640])
+
+    def test_larger_widths_are_skipped(self):
+        self.assertEqual(self.widths(700), [160, 320, 640])
+        self.assertEqual(self.widths(100), [100])
@@ -1,14 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, MenuItemViewSet, ModifierViewSet, ModifierOptionViewSet
+from .views import (
+    CategoryViewSet, MenuItemViewSet, ModifierViewSet, ModifierOptionViewSet,
+    PriceListViewSet, PriceListEntryViewSet, MenuImportView, MenuExportView
+)
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
 router.register(r'items', MenuItemViewSet)
 router.register(r'modifiers', ModifierViewSet)
 router.register(r'modifier-options', ModifierOptionViewSet)
+router.register(r'price-lists', PriceListViewSet)
+router.register(r'price-list-entries', PriceListEntryViewSet)
 
 urlpatterns = [
+    path('import/', MenuImportView.as_view(), name='menu-import'),
+    path('export/', MenuExportView.as_view(), name='menu-export'),
     path('', include(router.urls)),
 ]
 
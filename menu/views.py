@@ -1,50 +1,171 @@
+import csv
+import gzip
+import io
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, MenuItem, Modifier, ModifierOption
+from .models import Category, MenuItem, Modifier, ModifierOption, PriceList, PriceListEntry
 from .serializers import (
     CategorySerializer, CategoryWithItemsSerializer, MenuItemSerializer,
-    ModifierSerializer, ModifierOptionSerializer, ModifierCreateSerializer
+    ModifierSerializer, ModifierOptionSerializer, ModifierCreateSerializer,
+    MenuItemAvailabilitySerializer, ModifierOptionAvailabilitySerializer,
+    PriceListSerializer, PriceListEntrySerializer, RepriceSerializer
 )
-from users.permissions import IsAdminOrManagerOrReadOnly
+from users.permissions import IsAdminOrManager, IsAdminOrManagerOrReadOnly
+from restaurant_pos.conditional import ConditionalGetMixin, make_etag
+from restaurant_pos.prefetch import plan_queryset
+from .availability import set_availability
+from .pricing import reprice
+from .importer import FORMATS, export_lines, guess_format, import_menu
+from .search import search as search_menu, split_terms
+from . import snapshot
 
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+class MenuConditionalGetMixin(ConditionalGetMixin):
+    """Validate menu reads against the menu version, which costs no query."""
+    
+    def get_validators(self):
+        return make_etag(type(self).__name__, self.action, snapshot.current_version()), None
+
+class CategoryViewSet(MenuConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Category.objects.with_item_counts()
+    conditional_actions = ('list', 'retrieve', 'items')
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrManagerOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['is_active']
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'items':
+            # Load the nested items with a fixed number of queries
+            queryset = plan_queryset(queryset, CategoryWithItemsSerializer)
+        return queryset
+    
     @action(detail=True, methods=['get'])
     def items(self, request, pk=None):
         category = self.get_object()
         serializer = CategoryWithItemsSerializer(category)
         return Response(serializer.data)
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(MenuConditionalGetMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [IsAdminOrManagerOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category', 'food_type', 'is_available', 'is_featured']
+    conditional_actions = ('list', 'retrieve', 'search')
+    
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), MenuItemSerializer)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Search menu items by name, description and ingredients.
+        
+        Every word of ?q= matches whole words or word prefixes, for
+        type-ahead. ?contains= and ?excludes= take comma-separated
+        ingredients and allergens.
+        """
+        params = request.query_params
+        try:
+            category = int(params['category']) if params.get('category') else None
+            limit = min(int(params.get('limit', 20)), 100)
+        except ValueError:
+            return Response({"error": "category and limit must be integers"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        results = search_menu(
+            query=params.get('q', ''),
+            contains=split_terms(params.getlist('contains')),
+            excludes=split_terms(params.getlist('excludes')),
+            category=category,
+            food_type=params.get('food_type'),
+            available_only=params.get('include_unavailable') not in ('1', 'true'),
+            limit=limit,
+        )
+        return Response(results)
     
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        categories = Category.objects.filter(is_active=True)
-        serializer = CategoryWithItemsSerializer(categories, many=True)
-        return Response(serializer.data)
+        # Clients holding the current version are answered without loading the snapshot
+        version = snapshot.current_version()
+        if request.headers.get('If-None-Match') == f'"menu-{version}"':
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            # Served from the precompiled snapshot of the current menu version
+            version, compressed = snapshot.get_snapshot()
+            if 'gzip' in request.headers.get('Accept-Encoding', ''):
+                response = HttpResponse(compressed, content_type='application/json')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(gzip.decompress(compressed), content_type='application/json')
+        response['ETag'] = f'"menu-{version}"'
+        response['X-Menu-Version'] = str(version)
+        response['Vary'] = 'Accept-Encoding'
+        return response
     
     @action(detail=True, methods=['post'])
     def toggle_availability(self, request, pk=None):
         menu_item = self.get_object()
-        menu_item.is_available = not menu_item.is_available
-        menu_item.save()
-        return Response({'status': 'success', 'is_available': menu_item.is_available})
+        set_availability(MenuItem.objects.filter(pk=menu_item.pk), not menu_item.is_available)
+        return Response({'status': 'success', 'is_available': not menu_item.is_available})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_availability(self, request):
+        """
+        Mark menu items available or sold out and notify every terminal.
+        
+        Items are selected by ids, category or an ingredient they list, e.g.
+        {'is_available': false, 'ingredient': 'shrimp'}.
+        """
+        serializer = MenuItemAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        menu_items = MenuItem.objects.all()
+        if 'ids' in data:
+            menu_items = menu_items.filter(pk__in=data['ids'])
+        if 'category' in data:
+            menu_items = menu_items.filter(category_id=data['category'])
+        if 'ingredient' in data:
+            menu_items = menu_items.filter(ingredients__icontains=data['ingredient'])
+        
+        changed = set_availability(menu_items, data['is_available'])
+        return Response({'status': 'success', 'is_available': data['is_available'], 'changed': changed})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_reprice(self, request):
+        """
+        Change the prices of many items at once.
+        
+        {'mode': 'percent', 'amount': '5', 'category': 3} raises the menu
+        prices of a category by 5%; with 'price_list' the list's entries are
+        set from the discounted menu prices instead.
+        """
+        serializer = RepriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        menu_items = MenuItem.objects.all()
+        if 'ids' in data:
+            menu_items = menu_items.filter(pk__in=data['ids'])
+        if 'category' in data:
+            menu_items = menu_items.filter(category_id=data['category'])
+        
+        with transaction.atomic():
+            changed = reprice(menu_items, data['mode'], data['amount'], data.get('price_list'))
+        return Response({'status': 'success', 'changed': changed})
 
-class ModifierViewSet(viewsets.ModelViewSet):
+class ModifierViewSet(MenuConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Modifier.objects.all()
+    conditional_actions = ('list', 'retrieve', 'options')
     permission_classes = [IsAdminOrManagerOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['menu_items']
@@ -61,10 +182,80 @@ class ModifierViewSet(viewsets.ModelViewSet):
         serializer = ModifierOptionSerializer(options, many=True)
         return Response(serializer.data)
 
-class ModifierOptionViewSet(viewsets.ModelViewSet):
+class ModifierOptionViewSet(MenuConditionalGetMixin, viewsets.ModelViewSet):
     queryset = ModifierOption.objects.all()
     serializer_class = ModifierOptionSerializer
     permission_classes = [IsAdminOrManagerOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['modifier', 'is_available']
+    
+    @action(detail=False, methods=['post'])
+    def bulk_availability(self, request):
+        """Mark modifier options available or sold out by ids, modifier group or name."""
+        serializer = ModifierOptionAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        options = ModifierOption.objects.all()
+        if 'ids' in data:
+            options = options.filter(pk__in=data['ids'])
+        if 'modifier' in data:
+            options = options.filter(modifier_id=data['modifier'])
+        if 'name' in data:
+            options = options.filter(name__icontains=data['name'])
+        
+        changed = set_availability(options, data['is_available'])
+        return Response({'status': 'success', 'is_available': data['is_available'], 'changed': changed})
 
+class PriceListViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = PriceList.objects.all()
+    serializer_class = PriceListSerializer
+    permission_classes = [IsAdminOrManagerOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['dining_mode', 'is_active']
+
+class PriceListEntryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = PriceListEntry.objects.select_related('menu_item')
+    serializer_class = PriceListEntrySerializer
+    permission_classes = [IsAdminOrManagerOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['price_list', 'menu_item']
+
+class MenuImportView(APIView):
+    """Import a menu file uploaded as 'file'; with dry_run set, only report the changes."""
+    permission_classes = [IsAdminOrManager]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "A menu file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        
+        stream = io.TextIOWrapper(upload.open('rb'), encoding='utf-8-sig', newline='')
+        try:
+            report = import_menu(stream, file_format, dry_run=dry_run)
+        except (UnicodeDecodeError, ValueError, csv.Error) as exc:
+            return Response({"error": f"Could not read the menu file: {exc}"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(report, status=status.HTTP_400_BAD_REQUEST if report['errors'] else status.HTTP_200_OK)
+
+class MenuExportView(APIView):
+    """Stream the whole menu as CSV or JSON Lines, in the format MenuImportView reads."""
+    permission_classes = [IsAdminOrManager]
+    
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ('csv', 'jsonl'):
+            return Response({"error": "file_format must be csv or jsonl"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_lines(file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="menu.{file_format}"'
+        return response
@@ -1,71 +1,173 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from asgiref.sync import async_to_sync
 from django.core.serializers.json import DjangoJSONEncoder
-from .models import Order
 from .serializers import OrderSerializer
+from .queries import order_queryset
+from .topics import TOPICS, order_groups, register_subscription, subscribed_groups, subscription_groups
+from . import events, kitchen
 
 class OrderConsumer(AsyncWebsocketConsumer):
+    """
+    Order updates over WebSocket.
+    
+    Clients receive full order payloads by default. Sending
+    {'type': 'sync', 'revision': <last seen revision>} switches the socket to
+    the patch protocol described in orders/protocol.py and replays the
+    patches missed since that revision, or the whole board when the replay
+    window no longer covers it.
+    
+    Sockets receive every order unless they subscribe to topics, either in
+    the query string (ws/orders/?station=bar&dining_mode=delivery) or with
+    {'type': 'subscribe', 'topics': {'station': ['bar']}}. A socket then
+    receives orders matching any of its topics.
+    
+    Each socket joins the one channel group shared by sockets with the same
+    subscription and mode (see orders/topics.py).
+    """
+    
     async def connect(self):
-        self.room_group_name = 'orders'
+        self.use_patches = False
+        self.groups_joined = set()
+        self.channel_group = None
         
-        # Join room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        subscription = {
+            topic: [value for values in query[topic] for value in values.split(',')]
+            for topic in TOPICS if topic in query
+        }
+        
+        await self.join_groups(subscription_groups(subscription))
         
         await self.accept()
     
     async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        if self.channel_group is not None:
+            await self.channel_layer.group_discard(self.channel_group, self.channel_name)
+    
+    async def join_groups(self, groups):
+        """Subscribe to the topic groups, in the socket's current mode."""
+        self.groups_joined = groups
+        mode = 'patch' if self.use_patches else 'full'
+        channel_group = await database_sync_to_async(register_subscription)(groups, mode)
+        if channel_group != self.channel_group:
+            # The old group only delivers the other mode or other topics, so overlap sends no duplicates
+            await self.channel_layer.group_add(channel_group, self.channel_name)
+            if self.channel_group is not None:
+                await self.channel_layer.group_discard(self.channel_group, self.channel_name)
+            self.channel_group = channel_group
+    
+    def is_subscribed(self, order):
+        return bool(self.groups_joined & order_groups(order))
+    
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content, cls=DjangoJSONEncoder))
+    
+    async def send_orders_list(self):
+        version, orders = await self.get_orders()
+        await self.send_json({
+            'type': 'orders_list',
+            'version': version,
+            'orders': [order for order in orders if self.is_subscribed(order)]
+        })
     
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
         message_type = text_data_json.get('type')
         
         if message_type == 'get_orders':
-            orders = await self.get_orders()
-            await self.send(text_data=json.dumps({
-                'type': 'orders_list',
-                'orders': orders
-            }, cls=DjangoJSONEncoder))
+            await self.send_orders_list()
+        
+        elif message_type == 'subscribe':
+            await self.join_groups(subscription_groups(text_data_json.get('topics')))
+            await self.send_json({
+                'type': 'subscribed',
+                'groups': sorted(self.groups_joined)
+            })
+        
+        elif message_type == 'sync':
+            if not self.use_patches:
+                self.use_patches = True
+                await self.join_groups(self.groups_joined)
+            revision = text_data_json.get('revision')
+            
+            patches = None
+            if isinstance(revision, int):
+                version, patches = await self.get_patches(revision)
+            
+            if patches is None:
+                await self.send_orders_list()
+            else:
+                await self.send_json({
+                    'type': 'order_patches',
+                    'version': version,
+                    'patches': patches
+                })
     
     async def order_update(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'order_update',
-            'order': event['order']
-        }, cls=DjangoJSONEncoder))
+        # Groups of the other mode may still deliver while the socket switches
+        if self.use_patches:
+            if 'patch' in event:
+                await self.send_json({'type': 'order_patch', **event['patch']})
+        elif event.get('order') is not None:
+            await self.send_json({
+                'type': 'order_update',
+                'version': event.get('version'),
+                'order': event['order']
+            })
     
     @database_sync_to_async
     def get_orders(self):
-        orders = Order.objects.filter(
-            status__in=['pending', 'processing']
-        ).order_by('created_at')
+        return kitchen.get_board()
+    
+    @database_sync_to_async
+    def get_patches(self, revision):
+        return kitchen.patches_since(revision, self.groups_joined)
+    
+    @classmethod
+    def broadcast(cls, groups, version, order_data, patch):
+        """Send an update once to every subscription group matching the topic groups, in its mode."""
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+        
+        messages = {}
+        for group, mode in subscribed_groups(groups).items():
+            if mode == 'patch':
+                messages[group] = {'type': 'order_update', 'version': version, 'patch': patch}
+            elif order_data is not None:
+                # Full-order sockets are not told about deletions
+                messages[group] = {'type': 'order_update', 'version': version, 'order': order_data}
+        
+        async def send_to_groups():
+            for group in sorted(messages):
+                await channel_layer.group_send(group, messages[group])
         
-        serializer = OrderSerializer(orders, many=True)
-        return serializer.data
+        async_to_sync(send_to_groups)()
     
     @classmethod
     def notify_order_update(cls, order):
-        """Notify all clients about order update."""
-        serializer = OrderSerializer(order)
-        order_data = serializer.data
+        """Notify all clients about order update once it is committed."""
+        events.order_changed(order.pk)
+    
+    @classmethod
+    def notify_order_removed(cls, order_id):
+        """Notify all clients that an order was deleted once it is committed."""
+        events.order_removed(order_id)
+    
+    @classmethod
+    def publish_order_update(cls, order_id):
+        """Serialize an order, update the kitchen board and broadcast the change."""
+        order = order_queryset().get(pk=order_id)
         
-        # Use channel layer to send to group
-        from channels.layers import get_channel_layer
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            'orders',
-            {
-                'type': 'order_update',
-                'order': order_data
-            }
-        )
-
+        # Keep the shared kitchen board in step and get the patch for this revision
+        version, order_data, patch, groups = kitchen.store_order(order, OrderSerializer(order).data)
+        
+        cls.broadcast(groups, version, order_data, patch)
+    
+    @classmethod
+    def publish_order_removed(cls, order_id):
+        """Drop a deleted order from the kitchen board and broadcast its removal."""
+        version, patch, groups = kitchen.remove_order(order_id)
+        cls.broadcast(groups, version, None, patch)
@@ -0,0 +1,49 @@
+"""
+Deferred, coalesced order events.
+
+Writes only record that an order changed. Once the surrounding transaction
+commits, a Celery task serializes the order, updates the kitchen board and
+broadcasts it, so request latency no longer includes the broadcast and no
+client can see an order before it is committed. Changes to the same order
+within COALESCE_WINDOW seconds are folded into a single broadcast of its
+latest state.
+"""
+import logging
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW = 0.5
+PENDING_KEY = 'orders:event:pending:{}'
+# Upper bound on how long a lost task can hold back events for an order
+PENDING_TIMEOUT = 30
+
+def _dispatch(task, order_id, **options):
+    try:
+        task.apply_async(args=[order_id], **options)
+    except Exception:
+        # Without a broker the event is still delivered, just inline
+        logger.exception("Could not queue %s for order %s, publishing inline", task.name, order_id)
+        task(order_id)
+
+def _schedule_update(order_id):
+    from .tasks import publish_order_update
+    if cache.add(PENDING_KEY.format(order_id), True, timeout=PENDING_TIMEOUT):
+        _dispatch(publish_order_update, order_id, countdown=COALESCE_WINDOW)
+
+def _schedule_removal(order_id):
+    from .tasks import publish_order_removed
+    _dispatch(publish_order_removed, order_id)
+
+def order_changed(order_id):
+    """Publish the order once the current transaction commits."""
+    transaction.on_commit(lambda: _schedule_update(order_id))
+
+def order_removed(order_id):
+    """Publish the order's removal once the current transaction commits."""
+    transaction.on_commit(lambda: _schedule_removal(order_id))
+
+def clear_pending(order_id):
+    """Let the next change to order_id schedule a new broadcast."""
+    cache.delete(PENDING_KEY.format(order_id))
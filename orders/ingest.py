@@ -0,0 +1,347 @@
+"""
+Batched order ingest.
+
+The whole payload is validated before anything is written, menu item and
+modifier option prices come from the menu lookup cache (menu/lookups.py), and
+items and modifiers are written with bulk inserts. Totals are computed once
+from the resolved prices, so creating an order costs the same number of
+queries whatever its number of lines.
+
+ingest_batch() applies the same pipeline to a whole batch of orders synced
+by an offline terminal, deduplicated by the terminal's client_key.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+from accounting.models import Transaction
+from menu import lookups, snapshot
+from tables.models import Table
+from tables import floor
+from .models import ZERO, DeliveryInfo, Order, OrderItem, OrderItemModifier
+from .serializers import OrderCreateSerializer, DeliveryInfoCreateSerializer
+
+DOES_NOT_EXIST = 'Invalid pk "{pk_value}" - object does not exist.'
+NOT_AVAILABLE = '"{pk_value}" is currently unavailable.'
+
+class ModifierIngestSerializer(serializers.Serializer):
+    modifier_option = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+class OrderItemIngestSerializer(serializers.Serializer):
+    menu_item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    modifiers = ModifierIngestSerializer(many=True, required=False)
+
+class TransactionIngestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Transaction
+        fields = ['type', 'amount', 'method', 'description', 'category']
+
+class OrderSyncSerializer(serializers.Serializer):
+    """
+    One order queued by an offline terminal.
+
+    Related rows are given by id and resolved for the whole batch at once,
+    instead of one lookup per order as OrderCreateSerializer would do.
+    """
+    client_key = serializers.CharField(max_length=64)
+    table = serializers.IntegerField(required=False, allow_null=True)
+    server = serializers.IntegerField(required=False, allow_null=True)
+    dining_mode = serializers.ChoiceField(choices=Order.DINING_MODE_CHOICES, default='dine_in')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = OrderItemIngestSerializer(many=True, required=False)
+    delivery_info = DeliveryInfoCreateSerializer(required=False, allow_null=True)
+    transactions = TransactionIngestSerializer(many=True, required=False)
+
+def _bulk_create_with_pks(model, objs, saved_queryset):
+    """
+    Bulk insert objs and make sure each of them carries its primary key.
+
+    Backends that cannot return rows from a bulk insert (MySQL) leave pk unset,
+    so the keys are read back in insertion order from saved_queryset.
+    """
+    model.objects.bulk_create(objs)
+    if objs and objs[0].pk is None:
+        pks = saved_queryset.order_by('id').values_list('id', flat=True)
+        for obj, pk in zip(objs, pks):
+            obj.pk = pk
+    return objs
+
+def validate_order_payload(data):
+    """
+    Validate an order payload including its items and delivery info.
+
+    Returns (order_data, items_data, delivery_serializer) and raises a single
+    ValidationError describing every problem found in the payload.
+    """
+    errors = {}
+
+    order_serializer = OrderCreateSerializer(data=data)
+    if not order_serializer.is_valid():
+        errors.update(order_serializer.errors)
+
+    items_serializer = OrderItemIngestSerializer(data=data.get('items') or [], many=True)
+    if not items_serializer.is_valid():
+        errors['items'] = items_serializer.errors
+
+    delivery_serializer = None
+    dining_mode = data.get('dining_mode') or 'dine_in'
+    if dining_mode == 'delivery' and data.get('delivery_info'):
+        delivery_serializer = DeliveryInfoCreateSerializer(data=data.get('delivery_info'))
+        if not delivery_serializer.is_valid():
+            errors['delivery_info'] = delivery_serializer.errors
+
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    return order_serializer.validated_data, items_serializer.validated_data, delivery_serializer
+
+def load_prices(items_data):
+    """Look up the menu items and modifier options referenced by items_data."""
+    menu_item_ids = {item['menu_item'] for item in items_data}
+    option_ids = {
+        modifier['modifier_option']
+        for item in items_data for modifier in item.get('modifiers', [])
+    }
+
+    # Served from the menu lookup cache; the menu tables are only read on a miss
+    version = snapshot.current_version()
+    return lookups.menu_items(menu_item_ids, version), lookups.modifier_options(option_ids, version)
+
+def resolve_prices(items_data, prices=None, require_available=False, dining_mode=None):
+    """
+    Resolve menu item and modifier option prices for validated items.
+
+    Uses prices already looked up with load_prices() when given, and fills
+    in unit_price (the item's effective price in dining_mode) and modifier
+    price where the client did not send one. Unknown ids raise a
+    ValidationError laid out like the items payload, as do sold-out items
+    and options with require_available.
+    """
+    menu_items, options = prices or load_prices(items_data)
+
+    errors = []
+    for item in items_data:
+        item_errors = {}
+        menu_item = menu_items.get(item['menu_item'])
+        if menu_item is None:
+            item_errors['menu_item'] = [DOES_NOT_EXIST.format(pk_value=item['menu_item'])]
+        elif require_available and not menu_item.is_available:
+            item_errors['menu_item'] = [NOT_AVAILABLE.format(pk_value=item['menu_item'])]
+        elif not item.get('unit_price'):
+            item['unit_price'] = menu_item.price_for(dining_mode)
+
+        modifier_errors = []
+        for modifier in item.get('modifiers', []):
+            option = options.get(modifier['modifier_option'])
+            if option is None:
+                modifier_errors.append({
+                    'modifier_option': [DOES_NOT_EXIST.format(pk_value=modifier['modifier_option'])]
+                })
+                continue
+            if require_available and not option.is_available:
+                modifier_errors.append({
+                    'modifier_option': [NOT_AVAILABLE.format(pk_value=modifier['modifier_option'])]
+                })
+                continue
+            if not modifier.get('price'):
+                modifier['price'] = option.price
+            modifier_errors.append({})
+        if any(modifier_errors):
+            item_errors['modifiers'] = modifier_errors
+        errors.append(item_errors)
+
+    if any(errors):
+        raise serializers.ValidationError({'items': errors})
+
+    return items_data
+
+def _build_order(order_data, items_data, **extra):
+    subtotal = sum((item['unit_price'] * item['quantity'] for item in items_data), ZERO)
+    subtotal += sum(
+        (modifier['price'] * modifier['quantity'] for item in items_data for modifier in item.get('modifiers', [])),
+        ZERO
+    )
+
+    order = Order(**order_data, **extra)
+    order.set_totals(subtotal)
+    return order
+
+def _create_lines(entries, staff=None):
+    """
+    Bulk insert the rows that belong to already saved orders.
+
+    entries holds (order, items_data, delivery_data, transactions_data)
+    tuples. Items, modifiers, delivery info and transactions each take one
+    insert for the whole list.
+    """
+    order_items, item_lines = [], []
+    for order, items_data, _, _ in entries:
+        for item in items_data:
+            order_items.append(OrderItem(
+                order=order,
+                menu_item_id=item['menu_item'],
+                quantity=item['quantity'],
+                unit_price=item['unit_price'],
+                notes=item['notes'],
+            ))
+            item_lines.append(item)
+    orders = [order for order, _, _, _ in entries]
+    _bulk_create_with_pks(OrderItem, order_items, OrderItem.objects.filter(order__in=orders))
+
+    modifiers = [
+        OrderItemModifier(
+            order_item=order_item,
+            modifier_option_id=modifier['modifier_option'],
+            quantity=modifier['quantity'],
+            price=modifier['price'],
+        )
+        for order_item, item in zip(order_items, item_lines)
+        for modifier in item.get('modifiers', [])
+    ]
+    if modifiers:
+        OrderItemModifier.objects.bulk_create(modifiers)
+
+    deliveries = [
+        DeliveryInfo(order=order, **delivery_data)
+        for order, _, delivery_data, _ in entries if delivery_data
+    ]
+    if deliveries:
+        DeliveryInfo.objects.bulk_create(deliveries)
+
+    payments = [
+        Transaction(order=order, staff=staff, **transaction_data)
+        for order, _, _, transactions_data in entries for transaction_data in transactions_data
+    ]
+    if payments:
+        Transaction.objects.bulk_create(payments)
+
+@transaction.atomic
+def ingest_order(data, **extra):
+    """Validate and create an order with all of its items in a single pass."""
+    order_data, items_data, delivery_serializer = validate_order_payload(data)
+    # Orders synced from offline terminals were already taken, so only live entry checks availability
+    items_data = resolve_prices(items_data, require_available=True, dining_mode=order_data.get('dining_mode'))
+
+    order = _build_order(order_data, items_data, **extra)
+    order.save()
+
+    delivery_data = delivery_serializer.validated_data if delivery_serializer is not None else None
+    _create_lines([(order, items_data, delivery_data, [])])
+    return order
+
+def _validate_sync_entry(data, prices, tables, servers):
+    order_data = dict(data)
+    items_data = order_data.pop('items', [])
+    delivery_data = order_data.pop('delivery_info', None)
+    transactions_data = order_data.pop('transactions', [])
+    if order_data['dining_mode'] != 'delivery':
+        delivery_data = None
+
+    errors = {}
+    for field, known in (('table', tables), ('server', servers)):
+        pk = order_data.pop(field, None)
+        if pk is not None and pk not in known:
+            errors[field] = [DOES_NOT_EXIST.format(pk_value=pk)]
+        order_data[f'{field}_id'] = pk
+    try:
+        resolve_prices(items_data, prices, dining_mode=order_data['dining_mode'])
+    except serializers.ValidationError as exc:
+        errors.update(exc.detail)
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    # A sale recorded offline means the order was settled at the terminal
+    sales = [payment for payment in transactions_data if payment['type'] == 'sale']
+    if sales:
+        order_data['payment_status'] = 'paid'
+        order_data['payment_method'] = sales[-1]['method']
+    return order_data, items_data, delivery_data, transactions_data
+
+def ingest_batch(payloads, staff=None, retry=True):
+    """
+    Create a batch of client-keyed orders, as queued by an offline terminal.
+
+    Orders whose client_key was already synced are not created again, and of
+    the entries in the batch sharing a key only the first valid one is
+    created. Invalid orders are reported without holding back the rest. Every valid order is written in one transaction
+    with one bulk insert per table.
+
+    Returns (results, created) where results maps each client_key, or
+    '#<index>' for entries without a usable key, to {'status', 'id'} or
+    {'status': 'invalid', 'errors'}, and created lists the new orders.
+    """
+    # Entries a terminal queued again under the same key are copies of one
+    # order; the first copy that is valid is created
+    candidates, invalid = {}, []
+    for index, data in enumerate(payloads):
+        serializer = OrderSyncSerializer(data=data)
+        if serializer.is_valid():
+            candidates.setdefault(serializer.validated_data['client_key'], []).append((index, serializer.validated_data))
+        else:
+            key = data.get('client_key') if isinstance(data, dict) else None
+            invalid.append((index, key, serializer.errors))
+
+    # Keys synced by an earlier, possibly interrupted, attempt
+    results = {}
+    synced = dict(Order.objects.filter(client_key__in=list(candidates)).values_list('client_key', 'id'))
+    for key, order_id in synced.items():
+        results[key] = {'status': 'duplicate', 'id': order_id}
+    pending = {key: copies for key, copies in candidates.items() if key not in synced}
+
+    all_items = [item for copies in pending.values() for _, data in copies for item in data.get('items', [])]
+    prices = load_prices(all_items)
+    table_ids = {data['table'] for copies in pending.values() for _, data in copies if data.get('table') is not None}
+    server_ids = {data['server'] for copies in pending.values() for _, data in copies if data.get('server') is not None}
+    tables = Table.objects.only('id').in_bulk(table_ids) if table_ids else {}
+    servers = get_user_model().objects.only('id').in_bulk(server_ids) if server_ids else {}
+
+    entries = []
+    for key, copies in pending.items():
+        for index, data in copies:
+            try:
+                order_data, items_data, delivery_data, transactions_data = _validate_sync_entry(
+                    data, prices, tables, servers
+                )
+            except serializers.ValidationError as exc:
+                invalid.append((index, key, exc.detail))
+                continue
+            entries.append((_build_order(order_data, items_data), items_data, delivery_data, transactions_data))
+            results[key] = None
+            break
+
+    # An invalid entry is reported under its key unless a copy of the order
+    # holds the key, and under its position otherwise
+    for index, key, errors in sorted(invalid, key=lambda entry: entry[0]):
+        if not isinstance(key, str) or not key or key in results:
+            key = f'#{index}'
+        results[key] = {'status': 'invalid', 'errors': errors}
+
+    try:
+        with transaction.atomic():
+            orders = [order for order, _, _, _ in entries]
+            Order.objects.bulk_create(orders)
+            if orders and orders[0].pk is None:
+                pks = dict(Order.objects.filter(
+                    client_key__in=[order.client_key for order in orders]
+                ).values_list('client_key', 'id'))
+                for order in orders:
+                    order.pk = pks[order.client_key]
+            _create_lines(entries, staff=staff)
+            # bulk_create() sends no post_save, which would seat the tables
+            seated = {order.table_id for order in orders if order.table_id is not None}
+            if seated:
+                transaction.on_commit(lambda: floor.materialize(Table.objects.filter(pk__in=seated)))
+    except IntegrityError:
+        if not retry or not entries:
+            raise
+        # Another terminal synced one of these keys concurrently; those orders
+        # now exist and the retry reports them as duplicates
+        return ingest_batch(payloads, staff=staff, retry=False)
+
+    for order in orders:
+        results[order.client_key] = {'status': 'created', 'id': order.pk}
+    return results, orders
@@ -0,0 +1,161 @@
+"""
+Shared snapshot of the kitchen display board.
+
+The active orders board is kept in the cache as one serialized fragment per
+order plus an ordered index. Writers update it in place whenever an order
+changes, so every KDS screen and terminal reads the board from the cache
+instead of rebuilding it from the database. Every change bumps the board
+version, which clients use to tell whether their copy is current.
+
+The board version doubles as the order revision of the patch protocol in
+orders/protocol.py. The patch for each revision is kept for a bounded window
+so reconnecting clients can replay just the changes they missed.
+"""
+import bisect
+import contextlib
+from django.core.cache import cache
+from .protocol import diff_order, removal_patch
+from .queries import ACTIVE_STATUSES, active_orders
+from .topics import ALL_ORDERS_GROUP, order_groups
+from .serializers import OrderSerializer
+
+INDEX_KEY = 'kitchen:board:index'
+VERSION_KEY = 'kitchen:board:version'
+LOCK_KEY = 'kitchen:board:lock'
+ORDER_KEY = 'kitchen:board:order:{}'
+PATCH_KEY = 'kitchen:board:patch:{}'
+
+# Number of revisions kept for replay and how long each is kept
+PATCH_BUFFER_SIZE = 500
+PATCH_TIMEOUT = 60 * 60
+
+def _lock():
+    # django-redis provides a distributed lock; other backends are single process
+    lock = getattr(cache, 'lock', None)
+    if lock is None:
+        return contextlib.nullcontext()
+    return lock(LOCK_KEY, timeout=10)
+
+def _next_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        return cache.incr(VERSION_KEY)
+
+def _sort_key(order):
+    return (order.created_at.timestamp(), order.id)
+
+def current_version():
+    """Return the current board version without loading the board."""
+    return cache.get(VERSION_KEY, 0)
+
+def _cached_board():
+    """Return (version, orders) from the cache, or None when any part is missing."""
+    index = cache.get(INDEX_KEY)
+    if index is None:
+        return None
+    keys = [ORDER_KEY.format(order_id) for _, order_id in index['entries']]
+    fragments = cache.get_many(keys)
+    if len(fragments) != len(keys):
+        return None
+    return index['version'], [fragments[key] for key in keys]
+
+def rebuild_board():
+    """Rebuild the whole board from the database and return (version, orders)."""
+    with _lock():
+        # Workers that missed together queue on the lock; only the first rebuilds
+        board = _cached_board()
+        if board is not None:
+            return board
+        orders = list(active_orders())
+        # The snapshot includes every change published so far, so it is valid
+        # at the current version and replay can continue from there
+        version = current_version() or _next_version()
+        data = [
+            {**order, 'revision': version}
+            for order in OrderSerializer(orders, many=True).data
+        ]
+        cache.set_many({ORDER_KEY.format(order['id']): order for order in data}, timeout=None)
+        cache.set(INDEX_KEY, {
+            'version': version,
+            'entries': [_sort_key(order) for order in orders],
+        }, timeout=None)
+    return version, data
+
+def get_board():
+    """Return (version, orders) for the active board, rebuilding it on a cache miss."""
+    board = _cached_board()
+    if board is not None:
+        return board
+    return rebuild_board()
+
+def store_order(order, data):
+    """
+    Update the board in place after an order changed.
+
+    data is the order serialized with OrderSerializer. Orders that are no
+    longer pending or processing are dropped from the board. Returns
+    (version, data, patch, groups) where data carries the new revision, patch
+    is the delta from the previously published revision of the order and
+    groups are the topic groups matching the order before or after the change.
+    """
+    key = ORDER_KEY.format(order.id)
+    with _lock():
+        version = _next_version()
+        data = {**data, 'revision': version}
+        previous = cache.get(key)
+        patch = diff_order(previous, data)
+        groups = order_groups(previous) | order_groups(data)
+        cache.set(PATCH_KEY.format(version), (sorted(groups), patch), timeout=PATCH_TIMEOUT)
+
+        if order.status in ACTIVE_STATUSES:
+            cache.set(key, data, timeout=None)
+        else:
+            cache.delete(key)
+
+        index = cache.get(INDEX_KEY)
+        if index is not None:
+            entries = [entry for entry in index['entries'] if entry[1] != order.id]
+            if order.status in ACTIVE_STATUSES:
+                bisect.insort(entries, _sort_key(order))
+            cache.set(INDEX_KEY, {'version': version, 'entries': entries}, timeout=None)
+        # Without an index nothing is cached yet and the next read rebuilds the board
+    return version, data, patch, groups
+
+def remove_order(order_id):
+    """Drop a deleted order from the board and return (version, patch, groups)."""
+    key = ORDER_KEY.format(order_id)
+    with _lock():
+        version = _next_version()
+        patch = removal_patch(order_id, version)
+        groups = order_groups(cache.get(key)) or {ALL_ORDERS_GROUP}
+        cache.set(PATCH_KEY.format(version), (sorted(groups), patch), timeout=PATCH_TIMEOUT)
+        cache.delete(key)
+
+        index = cache.get(INDEX_KEY)
+        if index is not None:
+            entries = [entry for entry in index['entries'] if entry[1] != order_id]
+            cache.set(INDEX_KEY, {'version': version, 'entries': entries}, timeout=None)
+    return version, patch, groups
+
+def patches_since(revision, groups=None):
+    """
+    Return (version, patches) for every change after revision.
+
+    Only patches for orders matching one of groups are returned when groups
+    is given. patches is None when the replay window no longer covers
+    revision and the client has to reload the whole board instead.
+    """
+    version = current_version()
+    if revision > version or version - revision > PATCH_BUFFER_SIZE:
+        return version, None
+
+    keys = [PATCH_KEY.format(number) for number in range(revision + 1, version + 1)]
+    patches = cache.get_many(keys)
+    if len(patches) != len(keys):
+        return version, None
+    return version, [
+        patch for patch_groups, patch in (patches[key] for key in keys)
+        if groups is None or groups.intersection(patch_groups)
+    ]
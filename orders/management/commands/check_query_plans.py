@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from restaurant_pos.query_plans import HOT_QUERIES, PLANNERS, explain
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the registered hot queries and fail if any of them uses a full table scan.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help=f"Only check these queries ({', '.join(HOT_QUERIES)}).")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to run EXPLAIN against.')
+    
+    def handle(self, *args, **options):
+        names = options['names'] or list(HOT_QUERIES)
+        unknown = set(names) - set(HOT_QUERIES)
+        if unknown:
+            raise CommandError(f"Unknown hot queries: {', '.join(sorted(unknown))}")
+        vendor = connections[options['database']].vendor
+        if vendor not in PLANNERS:
+            raise CommandError(f"Unsupported database vendor: {vendor} (supported: {', '.join(PLANNERS)})")
+        
+        regressed = []
+        for name in names:
+            plan, full_scan = explain(HOT_QUERIES[name]().using(options['database']))
+            if full_scan:
+                regressed.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full table scan"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if full_scan or options['verbosity'] > 1:
+                for line in plan:
+                    self.stdout.write(f"    {line}")
+        
+        if regressed:
+            raise CommandError(f"{len(regressed)} hot query(s) regressed to a full scan: {', '.join(regressed)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(names)} hot query plan(s) use an index."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from orders.models import Order
+
+class Command(BaseCommand):
+    help = 'Verify stored order totals against a database aggregate and repair drift.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('order_ids', nargs='*', type=int,
+                            help='Only reconcile these orders.')
+        parser.add_argument('--all', action='store_true',
+                            help='Include completed and cancelled orders.')
+    
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['order_ids']:
+            orders = orders.filter(pk__in=options['order_ids'])
+        elif not options['all']:
+            orders = orders.filter(status__in=['pending', 'processing'])
+        
+        repaired = orders.reconcile_totals()
+        for order in repaired:
+            self.stdout.write(f"Order #{order.id}: subtotal={order.subtotal} tax={order.tax} total={order.total}")
+        self.stdout.write(self.style.SUCCESS(f"{len(repaired)} order(s) repaired."))
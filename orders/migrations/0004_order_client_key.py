@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='client_key',
+            field=models.CharField(blank=True, editable=False, help_text='Idempotency key assigned by the terminal that took the order', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -1,7 +1,86 @@
+from decimal import Decimal, ROUND_HALF_UP
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
 from django.conf import settings
+from django.utils import timezone
+from menu import lookups
 from menu.models import MenuItem, ModifierOption
 
+TAX_RATE = Decimal('0.05')  # 5% tax
+CENTS = Decimal('0.01')
+ZERO = Decimal('0')
+
+def _line_sum(expression):
+    return Sum(expression, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+def _shifted_totals(delta):
+    """
+    UPDATE assignments that move subtotal by delta and derive tax and total from the new subtotal.
+    
+    Tax is rounded once from the whole subtotal, as set_totals() does, never
+    from the delta. MySQL assigns single-table UPDATE columns left to right,
+    each seeing the ones before it, so subtotal is written last and nothing
+    reads a column already written.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    subtotal = F('subtotal') + Value(delta, output_field=money)
+    tax = Round(subtotal * Value(TAX_RATE, output_field=money), 2, output_field=money)
+    return {
+        'tax': tax,
+        'total': subtotal + tax - F('discount'),
+        'updated_at': timezone.now(),
+        'subtotal': subtotal,
+    }
+
+class OrderQuerySet(models.QuerySet):
+    def apply_total_delta(self, order_id, delta):
+        """
+        Shift an order's subtotal by delta with a single atomic UPDATE.
+        
+        Tax and total are derived from the new subtotal in the same statement,
+        so concurrent edits to the same order never overwrite each other and
+        rounding never accumulates. Returns the applied delta.
+        """
+        delta = Decimal(delta).quantize(CENTS)
+        if delta:
+            self.filter(pk=order_id).update(**_shifted_totals(delta))
+        return delta
+    
+    def with_computed_subtotal(self):
+        """Annotate each order with its subtotal as aggregated by the database."""
+        items = OrderItem.objects.filter(order=OuterRef('pk')).values('order').annotate(
+            line_total=_line_sum(F('unit_price') * F('quantity'))
+        ).values('line_total')
+        modifiers = OrderItemModifier.objects.filter(order_item__order=OuterRef('pk')).values(
+            'order_item__order'
+        ).annotate(
+            line_total=_line_sum(F('price') * F('quantity'))
+        ).values('line_total')
+        zero = Value(ZERO, output_field=DecimalField(max_digits=12, decimal_places=2))
+        return self.annotate(
+            computed_subtotal=Coalesce(Subquery(items), zero) + Coalesce(Subquery(modifiers), zero)
+        )
+    
+    def reconcile_totals(self):
+        """
+        Verify stored totals against a single aggregate query and repair drift.
+        
+        Corrections are written as subtotal deltas through the same UPDATE as
+        apply_total_delta(), never as absolute values, so an edit committed
+        after the aggregate was read is kept rather than overwritten.
+        Returns the orders whose stored totals had to be corrected.
+        """
+        repaired = []
+        orders = self.with_computed_subtotal().only('id', 'subtotal', 'tax', 'discount', 'total')
+        for order in orders.iterator(chunk_size=2000):
+            stored = (order.subtotal, order.tax, order.total)
+            order.set_totals(order.computed_subtotal)
+            if (order.subtotal, order.tax, order.total) != stored:
+                Order.objects.filter(pk=order.pk).update(**_shifted_totals(order.subtotal - stored[0]))
+                repaired.append(order)
+        return repaired
+
 class Order(models.Model):
     """Order model."""
     
@@ -45,11 +124,23 @@ class Order(models.Model):
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     notes = models.TextField(blank=True)
+    client_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False,
+                                  help_text="Idempotency key assigned by the terminal that took the order")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Active order boards and status filters, newest or oldest first
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Open orders for a table
+            models.Index(fields=['table', 'status'], name='order_table_status_idx'),
+            # Keyset pages of ?pagination=cursor, read backwards for newest first
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.get_status_display()}"
@@ -58,13 +149,25 @@ class Order(models.Model):
     def item_count(self):
         return sum(item.quantity for item in self.items.all())
     
-    def calculate_totals(self):
-        """Calculate order totals."""
-        items = self.items.all()
-        self.subtotal = sum(item.total_price for item in items)
-        self.tax = self.subtotal * 0.05  # 5% tax
+    def set_totals(self, subtotal):
+        """Set the subtotal and derive tax and total from it."""
+        self.subtotal = Decimal(subtotal).quantize(CENTS)
+        # Half up, as the database rounds in apply_total_delta()
+        self.tax = (self.subtotal * TAX_RATE).quantize(CENTS, rounding=ROUND_HALF_UP)
         self.total = self.subtotal + self.tax - self.discount
-        self.save()
+    
+    def apply_total_delta(self, delta):
+        """Apply a subtotal delta in the database and reload the totals it produced."""
+        if Order.objects.apply_total_delta(self.pk, delta):
+            self.refresh_from_db(fields=['subtotal', 'tax', 'total'])
+    
+    def calculate_totals(self):
+        """Recalculate order totals from items and modifiers in one aggregate query."""
+        subtotal = Order.objects.with_computed_subtotal().filter(pk=self.pk).values_list(
+            'computed_subtotal', flat=True
+        ).get()
+        self.set_totals(subtotal)
+        self.save(update_fields=['subtotal', 'tax', 'total', 'updated_at'])
 
 class OrderItem(models.Model):
     """Order item model."""
@@ -78,17 +181,59 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.menu_item.name}"
     
+    # (order_id, total_price) as last read from or written to the database
+    _saved_line = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'order_id', 'unit_price', 'quantity'} <= set(field_names):
+            instance._saved_line = (instance.order_id, instance.total_price)
+        return instance
+    
     @property
     def total_price(self):
         return self.unit_price * self.quantity
     
+    def _stored_line(self):
+        if self._state.adding:
+            return None
+        if self._saved_line is None:
+            stored = OrderItem.objects.filter(pk=self.pk).values_list('order_id', 'unit_price', 'quantity').first()
+            if stored is not None:
+                self._saved_line = (stored[0], stored[1] * stored[2])
+        return self._saved_line
+    
+    def _modifiers_total(self):
+        return self.modifiers.aggregate(line_total=_line_sum(F('price') * F('quantity')))['line_total'] or ZERO
+    
     def save(self, *args, **kwargs):
         # Set unit price from menu item if not provided
         if not self.unit_price:
-            self.unit_price = self.menu_item.discounted_price
+            record = lookups.menu_items([self.menu_item_id]).get(self.menu_item_id)
+            self.unit_price = record.price_for(self.order.dining_mode) if record else self.menu_item.discounted_price
+        stored = self._stored_line()
         super().save(*args, **kwargs)
-        # Recalculate order totals
-        self.order.calculate_totals()
+        
+        # Apply the change to the order totals as a delta
+        modifiers_total = ZERO
+        if stored is not None and stored[0] != self.order_id:
+            # Moved to another order: the line and its modifiers leave the old one
+            modifiers_total = self._modifiers_total()
+            Order.objects.apply_total_delta(stored[0], -(stored[1] + modifiers_total))
+            stored = None
+        self.order.apply_total_delta(self.total_price + modifiers_total - (stored[1] if stored else ZERO))
+        self._saved_line = (self.order_id, self.total_price)
+    
+    def delete(self, *args, **kwargs):
+        stored = self._stored_line() or (self.order_id, self.total_price)
+        modifiers_total = self._modifiers_total()
+        order = self.order
+        result = super().delete(*args, **kwargs)
+        
+        # Take the line and its cascaded modifiers off the order totals
+        order.apply_total_delta(-(stored[1] + modifiers_total))
+        return result
 
 class OrderItemModifier(models.Model):
     """Order item modifier model."""
@@ -101,17 +246,46 @@ class OrderItemModifier(models.Model):
     def __str__(self):
         return f"{self.order_item} - {self.modifier_option.name}"
     
+    # total_price as last read from or written to the database
+    _saved_total = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'price', 'quantity'} <= set(field_names):
+            instance._saved_total = instance.total_price
+        return instance
+    
     @property
     def total_price(self):
         return self.price * self.quantity
     
+    def _stored_total(self):
+        if self._state.adding:
+            return ZERO
+        if self._saved_total is None:
+            stored = OrderItemModifier.objects.filter(pk=self.pk).values_list('price', 'quantity').first()
+            self._saved_total = stored[0] * stored[1] if stored else ZERO
+        return self._saved_total
+    
     def save(self, *args, **kwargs):
         # Set price from modifier option if not provided
         if not self.price:
-            self.price = self.modifier_option.price
+            record = lookups.modifier_options([self.modifier_option_id]).get(self.modifier_option_id)
+            self.price = record.price if record else self.modifier_option.price
+        stored = self._stored_total()
         super().save(*args, **kwargs)
-        # Recalculate order totals
-        self.order_item.order.calculate_totals()
+        
+        # Apply the change to the order totals as a delta
+        self.order_item.order.apply_total_delta(self.total_price - stored)
+        self._saved_total = self.total_price
+    
+    def delete(self, *args, **kwargs):
+        stored = self._stored_total() or self.total_price
+        order = self.order_item.order
+        result = super().delete(*args, **kwargs)
+        order.apply_total_delta(-stored)
+        return result
 
 class DeliveryInfo(models.Model):
     """Delivery information for delivery orders."""
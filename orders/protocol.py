@@ -0,0 +1,49 @@
+"""
+Versioned patch protocol for order updates.
+
+Every change to an order gets a revision from the kitchen board version
+counter. Instead of the full OrderSerializer payload, delta clients receive
+a patch carrying only the top-level fields and items that changed since the
+previous revision:
+
+    {'order_id': 7, 'revision': 42, 'base_revision': 40,
+     'changes': {'status': 'processing', 'updated_at': '...'},
+     'items': {'upsert': [{'id': 3, 'quantity': 2}], 'remove': [5]}}
+
+A patch without a known base carries the whole order under 'order', and a
+deleted order is sent as {'order_id': 7, 'revision': 43, 'removed': True}.
+"""
+
+def _diff_items(previous, current):
+    previous_items = {item['id']: item for item in previous}
+    upsert = []
+    for item in current:
+        before = previous_items.pop(item['id'], None)
+        if before is None:
+            upsert.append(item)
+            continue
+        changed = {key: value for key, value in item.items() if before.get(key) != value}
+        if changed:
+            upsert.append({'id': item['id'], **changed})
+    return {'upsert': upsert, 'remove': list(previous_items)}
+
+def diff_order(previous, current):
+    """Build the patch that turns the previous order payload into the current one."""
+    patch = {'order_id': current['id'], 'revision': current['revision']}
+    if previous is None:
+        patch['order'] = current
+        return patch
+
+    patch['base_revision'] = previous.get('revision')
+    patch['changes'] = {
+        key: value for key, value in current.items()
+        if key not in ('items', 'revision') and previous.get(key) != value
+    }
+    items = _diff_items(previous.get('items', []), current.get('items', []))
+    if items['upsert'] or items['remove']:
+        patch['items'] = items
+    return patch
+
+def removal_patch(order_id, revision):
+    """Build the patch announcing that an order was deleted."""
+    return {'order_id': order_id, 'revision': revision, 'removed': True}
@@ -0,0 +1,15 @@
+from restaurant_pos.prefetch import plan_queryset
+from .models import Order
+from .serializers import OrderSerializer
+
+ACTIVE_STATUSES = ['pending', 'processing']
+
+def order_queryset(queryset=None):
+    """Return orders with everything OrderSerializer reads eager-loaded."""
+    if queryset is None:
+        queryset = Order.objects.all()
+    return plan_queryset(queryset, OrderSerializer)
+
+def active_orders():
+    """Return pending and processing orders, oldest first, ready to serialize."""
+    return order_queryset(Order.objects.filter(status__in=ACTIVE_STATUSES).order_by('created_at'))
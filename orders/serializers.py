@@ -16,10 +16,11 @@ class OrderItemSerializer(serializers.ModelSerializer):
     menu_item_details = MenuItemSerializer(source='menu_item', read_only=True)
     modifiers = OrderItemModifierSerializer(many=True, read_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    station = serializers.ReadOnlyField(source='menu_item.category.station')
     
     class Meta:
         model = OrderItem
-        fields = ['id', 'menu_item', 'menu_item_details', 'quantity', 'unit_price', 
+        fields = ['id', 'menu_item', 'menu_item_details', 'station', 'quantity', 'unit_price', 
                   'total_price', 'notes', 'modifiers', 'created_at']
         read_only_fields = ['created_at']
 
@@ -44,7 +45,7 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'table', 'table_details', 'server', 'server_name', 'dining_mode', 
                   'status', 'payment_status', 'payment_method', 'subtotal', 'tax', 
                   'discount', 'total', 'notes', 'items', 'item_count', 'delivery_info', 
-                  'created_at', 'updated_at']
+                  'client_key', 'created_at', 'updated_at']
         read_only_fields = ['subtotal', 'tax', 'total', 'created_at', 'updated_at']
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -61,7 +62,7 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = OrderItem
-        fields = ['menu_item', 'quantity', 'unit_price', 'notes', 'modifiers']
+        fields = ['order', 'menu_item', 'quantity', 'unit_price', 'notes', 'modifiers']
         extra_kwargs = {
             'unit_price': {'required': False}
         }
@@ -0,0 +1,28 @@
+from restaurant_pos.celery import app
+from .consumers import OrderConsumer
+from .events import clear_pending
+from .models import Order
+
+@app.task(ignore_result=True)
+def reconcile_order_totals(open_only=True):
+    """Verify stored order totals against the database and repair any drift."""
+    orders = Order.objects.all()
+    if open_only:
+        orders = orders.filter(status__in=['pending', 'processing'])
+    repaired = orders.reconcile_totals()
+    return [order.id for order in repaired]
+
+@app.task(ignore_result=True)
+def publish_order_update(order_id):
+    """Broadcast the latest state of an order after its changes were committed."""
+    # Changes made from here on schedule their own broadcast
+    clear_pending(order_id)
+    try:
+        OrderConsumer.publish_order_update(order_id)
+    except Order.DoesNotExist:
+        pass
+
+@app.task(ignore_result=True)
+def publish_order_removed(order_id):
+    """Broadcast that an order was deleted."""
+    OrderConsumer.publish_order_removed(order_id)
@@ -0,0 +1,312 @@
+import json
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from menu.models import Category, MenuItem, Modifier, ModifierOption
+from tables.models import Section, Table
+from users.models import User
+from orders import kitchen
+from orders.consumers import OrderConsumer
+from orders.ingest import ingest_batch
+from orders.models import DeliveryInfo, Order, OrderItem, OrderItemModifier
+
+class OrderReadQueryCountTests(TestCase):
+    """The order read paths cost the same number of queries for one order as for many."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='staff@example.com', password='x', name='Staff', role='admin')
+        category = Category.objects.create(name='Mains')
+        cls.menu_items = [
+            MenuItem.objects.create(category=category, name=f'Dish {index}', price=Decimal('10.00'))
+            for index in range(3)
+        ]
+        modifier = Modifier.objects.create(name='Extras')
+        modifier.menu_items.set(cls.menu_items)
+        cls.options = [
+            ModifierOption.objects.create(modifier=modifier, name=f'Extra {index}', price=Decimal('1.50'))
+            for index in range(2)
+        ]
+        section = Section.objects.create(name='Main')
+        cls.table = Table.objects.create(number='1', section=section, capacity=4)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_orders(self, orders, lines):
+        for _ in range(orders):
+            order = Order.objects.create(table=self.table, server=self.user, dining_mode='dine_in')
+            DeliveryInfo.objects.create(order=order, address='1 Main St', contact_name='Guest', contact_phone='1')
+            for index in range(lines):
+                item = OrderItem.objects.create(
+                    order=order, menu_item=self.menu_items[index % len(self.menu_items)],
+                    quantity=2, unit_price=Decimal('10.00')
+                )
+                for option in self.options:
+                    OrderItemModifier.objects.create(order_item=item, modifier_option=option, price=option.price)
+
+    def count_queries(self, url, params=None):
+        # The kitchen board and menu lookups are cached; read them cold every time
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, params=None):
+        self.create_orders(1, 1)
+        single = self.count_queries(url, params)
+        self.create_orders(5, 3)
+        cache.clear()
+        with self.assertNumQueries(single):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list(self):
+        self.assertConstantQueries('/api/orders/orders/')
+
+    def test_list_with_cursor_pagination(self):
+        self.assertConstantQueries('/api/orders/orders/', {'pagination': 'cursor'})
+
+    def test_kitchen_display(self):
+        self.assertConstantQueries('/api/orders/orders/kitchen_display/')
+
+    def test_by_table(self):
+        self.assertConstantQueries('/api/orders/orders/by_table/', {'table_id': self.table.id})
+
+    def test_by_table_all_tables(self):
+        self.assertConstantQueries('/api/orders/orders/by_table/')
+
+class OrderTotalsTests(TestCase):
+    """Line edits keep the stored totals equal to calculate_totals(), and reconcile_totals() repairs drift."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Mains')
+        self.menu_item = MenuItem.objects.create(category=category, name='Dish', price=Decimal('10.00'))
+        modifier = Modifier.objects.create(name='Extras')
+        self.option = ModifierOption.objects.create(modifier=modifier, name='Cheese', price=Decimal('0.30'))
+        self.orders = [Order.objects.create(dining_mode='take_away') for _ in range(2)]
+
+    def add(self, order, unit_price, quantity=1):
+        return OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=quantity, unit_price=Decimal(unit_price))
+
+    def add_modifier(self, item, price, quantity=1):
+        return OrderItemModifier.objects.create(
+            order_item=item, modifier_option=self.option, price=Decimal(price), quantity=quantity
+        )
+
+    def assertTotalsMatch(self, *orders):
+        for order in orders or self.orders:
+            stored = Order.objects.get(pk=order.pk)
+            expected = Order.objects.get(pk=order.pk)
+            expected.calculate_totals()
+            self.assertEqual((stored.subtotal, stored.tax, stored.total), (expected.subtotal, expected.tax, expected.total))
+
+    def test_item_edits(self):
+        order = self.orders[0]
+        item = self.add(order, '22.83')
+        other = self.add(order, '0.30', quantity=3)
+        self.assertTotalsMatch()
+        item.quantity = 2
+        item.save()
+        other.unit_price = Decimal('0.07')
+        other.save()
+        self.assertTotalsMatch()
+        # Edited through a fresh copy, as the API does
+        fresh = OrderItem.objects.get(pk=other.pk)
+        fresh.quantity = 5
+        fresh.save()
+        self.assertTotalsMatch()
+        order.refresh_from_db()
+        # 45.66 + 0.35 at 5% is 2.3005 tax
+        self.assertEqual((order.subtotal, order.tax, order.total), (Decimal('46.01'), Decimal('2.30'), Decimal('48.31')))
+
+    def test_tax_rounds_from_the_whole_subtotal(self):
+        order = self.orders[0]
+        for price in ['0.10', '0.07', '0.13', '0.01', '0.19']:
+            self.add(order, price)
+        self.assertTotalsMatch(order)
+        order.refresh_from_db()
+        self.assertEqual((order.subtotal, order.tax), (Decimal('0.50'), Decimal('0.03')))
+
+    def test_modifier_edits(self):
+        item = self.add(self.orders[0], '10.00')
+        modifier = self.add_modifier(item, '0.30', quantity=2)
+        self.assertTotalsMatch()
+        modifier.quantity = 3
+        modifier.save()
+        self.assertTotalsMatch()
+        OrderItemModifier.objects.get(pk=modifier.pk).delete()
+        self.assertTotalsMatch()
+
+    def test_deleting_an_item_takes_its_modifiers(self):
+        item = self.add(self.orders[0], '10.00')
+        self.add_modifier(item, '0.30', quantity=2)
+        self.add(self.orders[0], '4.10')
+        OrderItem.objects.get(pk=item.pk).delete()
+        self.assertTotalsMatch()
+
+    def test_moving_an_item_takes_its_modifiers(self):
+        item = self.add(self.orders[0], '10.00')
+        self.add_modifier(item, '0.30', quantity=2)
+        self.add(self.orders[0], '4.10')
+        moved = OrderItem.objects.get(pk=item.pk)
+        moved.order = self.orders[1]
+        moved.save()
+        self.assertTotalsMatch()
+        self.assertEqual(Order.objects.get(pk=self.orders[0].pk).subtotal, Decimal('4.10'))
+
+    def test_reconcile_repairs_drift(self):
+        for order in self.orders:
+            self.add_modifier(self.add(order, '3.33', quantity=3), '0.25')
+        self.assertEqual(Order.objects.reconcile_totals(), [])
+        Order.objects.filter(pk=self.orders[0].pk).update(tax=Decimal('9.99'), total=Decimal('1.00'))
+        Order.objects.filter(pk=self.orders[1].pk).update(subtotal=Decimal('5.00'))
+        repaired = Order.objects.reconcile_totals()
+        self.assertEqual(sorted(order.pk for order in repaired), sorted(order.pk for order in self.orders))
+        self.assertTotalsMatch()
+        self.assertEqual(Order.objects.reconcile_totals(), [])
+
+class OrderSyncTests(TestCase):
+    """A synced batch creates each client_key once, however often it is sent."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Mains')
+        self.menu_item = MenuItem.objects.create(category=category, name='Dish', price=Decimal('10.00'))
+
+    def entry(self, key, menu_item=None, quantity=1):
+        return {
+            'client_key': key, 'dining_mode': 'take_away',
+            'items': [{'menu_item': menu_item or self.menu_item.pk, 'quantity': quantity}],
+        }
+
+    def test_valid_copy_after_invalid_one_is_created(self):
+        payloads = [
+            self.entry('a', quantity=0),
+            self.entry('b', menu_item=self.menu_item.pk + 100),
+            self.entry('a', quantity=2),
+            self.entry('b'),
+            self.entry('c', quantity=0),
+        ]
+        results, created = ingest_batch(payloads)
+        created = {order.client_key: order for order in created}
+        self.assertEqual(set(created), {'a', 'b'})
+        for key in created:
+            self.assertEqual(results[key], {'status': 'created', 'id': created[key].pk})
+        self.assertEqual(created['a'].items.get().quantity, 2)
+        # The copies that lost their key are still reported
+        self.assertEqual({key: result['status'] for key, result in results.items() if key.startswith('#')}, {
+            '#0': 'invalid', '#1': 'invalid'
+        })
+        self.assertEqual(results['c']['status'], 'invalid')
+
+    def test_resending_a_batch_creates_nothing(self):
+        payloads = [self.entry('a'), self.entry('a'), self.entry('b', quantity=3)]
+        results, created = ingest_batch(payloads)
+        self.assertEqual(len(created), 2)
+        again, created_again = ingest_batch(payloads)
+        self.assertEqual(created_again, [])
+        self.assertEqual(again, {
+            key: {'status': 'duplicate', 'id': result['id']} for key, result in results.items()
+        })
+        self.assertEqual(Order.objects.count(), 2)
+
+class KitchenBoardTests(TestCase):
+    """A worker that waited on the rebuild lock reuses the board the first one built."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Mains')
+        menu_item = MenuItem.objects.create(category=category, name='Dish', price=Decimal('10.00'))
+        order = Order.objects.create(dining_mode='take_away')
+        OrderItem.objects.create(order=order, menu_item=menu_item, quantity=1, unit_price=Decimal('10.00'))
+
+    def test_rebuild_after_rebuild_reads_the_cache(self):
+        version, orders = kitchen.rebuild_board()
+        with self.assertNumQueries(0):
+            self.assertEqual(kitchen.rebuild_board(), (version, orders))
+
+    def test_rebuild_after_eviction_reads_the_database(self):
+        version, orders = kitchen.rebuild_board()
+        cache.delete(kitchen.ORDER_KEY.format(orders[0]['id']))
+        self.assertEqual(kitchen.rebuild_board(), (version, orders))
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class OrderBroadcastTests(TestCase):
+    """Every socket gets an update once, and every update is sent once per subscription and mode."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Drinks', station='bar')
+        menu_item = MenuItem.objects.create(category=category, name='Lemonade', price=Decimal('3.00'))
+        self.table = Table.objects.create(number='1', section=Section.objects.create(name='Main'))
+        self.order = Order.objects.create(table=self.table, dining_mode='dine_in')
+        OrderItem.objects.create(order=self.order, menu_item=menu_item, quantity=1, unit_price=Decimal('3.00'))
+
+    def connect(self, path, patches=False):
+        async def connect():
+            socket = WebsocketCommunicator(OrderConsumer.as_asgi(), path)
+            connected, _ = await socket.connect()
+            self.assertTrue(connected)
+            if patches:
+                await socket.send_to(text_data=json.dumps({'type': 'sync'}))
+                await socket.receive_from()
+            return socket
+        return connect()
+
+    async def receive_all(self, sockets):
+        received = []
+        for socket in sockets:
+            messages = []
+            while not await socket.receive_nothing(timeout=0.1):
+                messages.append(json.loads(await socket.receive_from()))
+            received.append(messages)
+            await socket.disconnect()
+        return received
+
+    def test_overlapping_topics_deliver_once(self):
+        async def scenario():
+            socket = await self.connect(f'/ws/orders/?station=bar&table={self.table.pk}&dining_mode=dine_in')
+            await database_sync_to_async(OrderConsumer.publish_order_update)(self.order.pk)
+            return await self.receive_all([socket])
+
+        [messages] = async_to_sync(scenario)()
+        self.assertEqual([message['type'] for message in messages], ['order_update'])
+
+    def test_one_send_per_subscription_and_mode(self):
+        layer = get_channel_layer()
+        sent = []
+        group_send = layer.group_send
+
+        async def record(group, message):
+            sent.append((group, message))
+            await group_send(group, message)
+
+        async def scenario():
+            sockets = [
+                await self.connect('/ws/orders/?station=bar'),
+                await self.connect('/ws/orders/?station=bar'),
+                await self.connect('/ws/orders/?station=bar', patches=True),
+                await self.connect('/ws/orders/?station=grill'),
+            ]
+            with mock.patch.object(layer, 'group_send', record):
+                await database_sync_to_async(OrderConsumer.publish_order_update)(self.order.pk)
+            return await self.receive_all(sockets)
+
+        received = async_to_sync(scenario)()
+        self.assertEqual(len(sent), 2)
+        for _, message in sent:
+            # Each mode gets only what it sends on
+            self.assertEqual(len({'order', 'patch'} & set(message)), 1)
+        self.assertEqual([[message['type'] for message in messages] for messages in received], [
+            ['order_update'], ['order_update'], ['order_patch'], []
+        ])
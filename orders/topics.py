@@ -0,0 +1,104 @@
+"""
+Topics and subscription groups for order updates.
+
+An order matches one topic group per topic value, e.g. 'orders.station.bar'
+or 'orders.table.12', plus the catch-all 'orders'. A subscription is the set
+of topic groups a socket wants orders from.
+
+Updates are not sent to topic groups, which overlap. Sockets with the same
+subscription and delivery mode ('full' orders or 'patch'es) share one
+channel group instead, listed in a registry in the cache. Every update is
+sent once to each registered group whose subscription it matches, carrying
+only what that mode needs. A socket sits in exactly one group, so it never
+receives an update twice. The registry only grows with distinct
+subscriptions, which a restaurant has few of.
+"""
+import contextlib
+import hashlib
+import re
+from django.core.cache import cache
+
+ALL_ORDERS_GROUP = 'orders'
+
+TOPICS = ('dining_mode', 'table', 'section', 'status', 'server', 'station')
+MODES = ('full', 'patch')
+
+SUBSCRIPTIONS_KEY = 'orders:subscriptions'
+SUBSCRIPTIONS_LOCK_KEY = 'orders:subscriptions:lock'
+
+def group_name(topic, value):
+    """Return the channel group for one topic value."""
+    # Group names are limited to ASCII alphanumerics, hyphens, underscores and periods
+    value = re.sub(r'[^0-9A-Za-z_\-]', '-', str(value).strip().lower())
+    return f'{ALL_ORDERS_GROUP}.{topic}.{value}'[:90]
+
+def order_topic_values(data):
+    """Return {topic: set of values} for an order serialized with OrderSerializer."""
+    table_details = data.get('table_details') or {}
+    values = {
+        'dining_mode': {data.get('dining_mode')},
+        'table': {data.get('table')},
+        'section': {table_details.get('section')},
+        'status': {data.get('status')},
+        'server': {data.get('server')},
+        'station': {item.get('station') for item in data.get('items', [])},
+    }
+    return {
+        topic: {value for value in topic_values if value not in (None, '')}
+        for topic, topic_values in values.items()
+    }
+
+def order_groups(data):
+    """Return every group that should receive updates for a serialized order."""
+    if not data:
+        return set()
+    groups = {ALL_ORDERS_GROUP}
+    for topic, values in order_topic_values(data).items():
+        groups.update(group_name(topic, value) for value in values)
+    return groups
+
+def subscription_groups(subscription):
+    """
+    Return the groups for a {topic: [values]} subscription.
+
+    Topics are combined as a union, and an empty subscription means every
+    order. Unknown topics are ignored.
+    """
+    groups = set()
+    for topic, values in (subscription or {}).items():
+        if topic not in TOPICS:
+            continue
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        groups.update(group_name(topic, value) for value in values if value not in (None, ''))
+    return groups or {ALL_ORDERS_GROUP}
+
+def _lock():
+    # django-redis provides a distributed lock; other backends are single process
+    lock = getattr(cache, 'lock', None)
+    if lock is None:
+        return contextlib.nullcontext()
+    return lock(SUBSCRIPTIONS_LOCK_KEY, timeout=10)
+
+def subscription_group(topic_groups, mode):
+    """Return the channel group shared by sockets subscribed to topic_groups in mode."""
+    digest = hashlib.md5(','.join(sorted(topic_groups)).encode()).hexdigest()[:20]
+    return f'{ALL_ORDERS_GROUP}.subscription.{mode}.{digest}'
+
+def register_subscription(topic_groups, mode):
+    """Make sure updates matching topic_groups are sent in mode, and return the group to join."""
+    group = subscription_group(topic_groups, mode)
+    if group not in (cache.get(SUBSCRIPTIONS_KEY) or {}):
+        with _lock():
+            registry = cache.get(SUBSCRIPTIONS_KEY) or {}
+            registry[group] = {'mode': mode, 'topics': sorted(topic_groups)}
+            cache.set(SUBSCRIPTIONS_KEY, registry, timeout=None)
+    return group
+
+def subscribed_groups(groups):
+    """Return {subscription group: mode} for the subscriptions an update to the topic groups matches."""
+    registry = cache.get(SUBSCRIPTIONS_KEY) or {}
+    return {
+        group: subscription['mode'] for group, subscription in registry.items()
+        if groups & set(subscription['topics'])
+    }
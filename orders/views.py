@@ -3,56 +3,79 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import transaction
 from .models import Order, OrderItem, DeliveryInfo
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderItemCreateSerializer,
     OrderStatusUpdateSerializer, OrderPaymentUpdateSerializer,
-    DeliveryInfoSerializer, DeliveryInfoCreateSerializer
+    DeliveryInfoSerializer
 )
 from users.permissions import IsAdminOrManagerOrStaff
 from .consumers import OrderConsumer
+from .ingest import ingest_batch, ingest_order
+from .queries import ACTIVE_STATUSES, order_queryset
+from . import kitchen
+from restaurant_pos.pagination import KeysetPaginationMixin
+from restaurant_pos.prefetch import plan_queryset
 
-class OrderViewSet(viewsets.ModelViewSet):
+# Largest number of orders accepted in one sync request
+SYNC_BATCH_LIMIT = 500
+
+class OrderViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all().order_by('-created_at')
     permission_classes = [IsAdminOrManagerOrStaff]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'payment_status', 'dining_mode', 'table']
     
+    def get_queryset(self):
+        return order_queryset(super().get_queryset())
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return OrderCreateSerializer
         return OrderSerializer
     
-    @transaction.atomic
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+    def perform_update(self, serializer):
         order = serializer.save()
         
-        # Create order items if provided
-        items_data = request.data.get('items', [])
-        for item_data in items_data:
-            item_serializer = OrderItemCreateSerializer(data={**item_data, 'order': order.id})
-            item_serializer.is_valid(raise_exception=True)
-            item_serializer.save(order=order)
-        
-        # Create delivery info if it's a delivery order
-        if order.dining_mode == 'delivery' and request.data.get('delivery_info'):
-            delivery_serializer = DeliveryInfoCreateSerializer(
-                data=request.data.get('delivery_info')
-            )
-            delivery_serializer.is_valid(raise_exception=True)
-            delivery_serializer.save(order=order)
+        # Notify via websocket
+        OrderConsumer.notify_order_update(order)
+    
+    def perform_destroy(self, instance):
+        order_id = instance.id
+        instance.delete()
         
-        # Recalculate order totals
-        order.calculate_totals()
+        # Notify via websocket
+        OrderConsumer.notify_order_removed(order_id)
+    
+    def create(self, request, *args, **kwargs):
+        # Validate the whole payload and create the order, its items and
+        # delivery info in a single batched pass
+        order = ingest_order(request.data)
         
         # Notify via websocket
         OrderConsumer.notify_order_update(order)
         
+        order = order_queryset().get(pk=order.pk)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Create a batch of orders queued by an offline terminal."""
+        orders = request.data.get('orders') if isinstance(request.data, dict) else request.data
+        if not isinstance(orders, list):
+            return Response({"error": "orders must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(orders) > SYNC_BATCH_LIMIT:
+            return Response({"error": f"At most {SYNC_BATCH_LIMIT} orders can be synced at once"}, 
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        results, created = ingest_batch(orders, staff=request.user)
+        
+        # Notify via websocket
+        for order in created:
+            OrderConsumer.notify_order_update(order)
+        
+        return Response({'results': results})
+    
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         order = self.get_object()
@@ -75,6 +98,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             updated_order = serializer.save()
+            
+            # Notify via websocket
+            OrderConsumer.notify_order_update(updated_order)
+            
             return Response(OrderSerializer(updated_order).data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -82,12 +109,17 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def kitchen_display(self, request):
         """Get orders for kitchen display system."""
-        orders = Order.objects.filter(
-            status__in=['pending', 'processing']
-        ).order_by('created_at')
+        version, orders = kitchen.get_board()
+        etag = f'"kitchen-{version}"'
         
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        # Clients holding the current board version get an empty response
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(orders)
+        response['ETag'] = etag
+        response['X-Board-Version'] = str(version)
+        return response
     
     @action(detail=False, methods=['get'])
     def by_table(self, request):
@@ -96,16 +128,15 @@ class OrderViewSet(viewsets.ModelViewSet):
         if table_id:
             orders = Order.objects.filter(
                 table_id=table_id,
-                status__in=['pending', 'processing']
+                status__in=ACTIVE_STATUSES
             ).order_by('-created_at')
         else:
             orders = Order.objects.filter(
-                status__in=['pending', 'processing'],
+                status__in=ACTIVE_STATUSES,
                 dining_mode='dine_in'
             ).order_by('-created_at')
         
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return self.keyset_response(order_queryset(orders), OrderSerializer)
 
 class OrderItemViewSet(viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
@@ -117,23 +148,24 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         order_item = serializer.save()
         
-        # Recalculate order totals
-        order_item.order.calculate_totals()
-        
         # Notify via websocket
         OrderConsumer.notify_order_update(order_item.order)
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    def perform_update(self, serializer):
+        order_item = serializer.save()
+        
+        # Notify via websocket
+        OrderConsumer.notify_order_update(order_item.order)
+    
     def destroy(self, request, *args, **kwargs):
         order_item = self.get_object()
         order = order_item.order
         
+        # Deleting the item applies its totals delta to the order
         response = super().destroy(request, *args, **kwargs)
         
-        # Recalculate order totals
-        order.calculate_totals()
-        
         # Notify via websocket
         OrderConsumer.notify_order_update(order)
         
@@ -145,4 +177,15 @@ class DeliveryInfoViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminOrManagerOrStaff]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['order', 'driver']
+    
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), DeliveryInfoSerializer)
+    
+    def perform_create(self, serializer):
+        delivery_info = serializer.save()
+        OrderConsumer.notify_order_update(delivery_info.order)
+    
+    def perform_update(self, serializer):
+        delivery_info = serializer.save()
+        OrderConsumer.notify_order_update(delivery_info.order)
 
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+class ReservationsConfig(AppConfig):
+    name = 'reservations'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,177 @@
+"""
+Table availability from a per-day interval index.
+
+DayIndex loads the active reservations of a date and of the days either
+side of it in one query and keeps every table's reserved time as sorted
+(start, end, reservation id) intervals in minutes since the date's midnight,
+so late bookings see early ones on the next day and vice versa. Overlap
+checks bisect into a table's intervals, so quoting free tables for a party
+costs no query per table.
+
+For the booking grid, busy_slots() packs a table's reserved time into a
+bitmap of SLOT_MINUTES slots and startable_slots() derives the slots a
+party can start in from it with shifts, so a whole day for every table
+costs a few bit operations per table.
+
+The index also knows which tables can be joined (Table.combinable_with) for
+seating larger parties (see reservations/seating.py).
+
+Indexes are cached per date. Reservation writes move the generation of the
+dates they touch and table writes move the generation of every date (see
+reservations/signals.py), so a cached index is never read after a change
+has committed.
+"""
+import bisect
+import time as clock
+from collections import namedtuple
+from datetime import time, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from tables.models import Table
+from .models import Reservation
+
+ACTIVE_STATUSES = ('confirmed', 'pending')
+DAY_MINUTES = 24 * 60
+INDEX_KEY = 'reservations:availability:index:{}:{}:{}'
+DATE_GENERATION_KEY = 'reservations:availability:generation:{}'
+TABLES_GENERATION_KEY = 'reservations:availability:generation:tables'
+INDEX_TIMEOUT = 60 * 60
+SLOT_MINUTES = 15
+DAY_SLOTS = DAY_MINUTES // SLOT_MINUTES
+
+TableInfo = namedtuple('TableInfo', ['number', 'section_id', 'section_name', 'capacity', 'status', 'is_active'])
+
+def to_minutes(value):
+    """Minutes since midnight of a time."""
+    return value.hour * 60 + value.minute
+
+def to_time(minutes):
+    """The time of day minutes since midnight fall on."""
+    minutes %= DAY_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+def slot_bits(start, end, days=1):
+    """Return the bitmap of the slots within days from midnight that [start, end) overlaps."""
+    first = max(start // SLOT_MINUTES, 0)
+    last = min(-(-end // SLOT_MINUTES), days * DAY_SLOTS)
+    return ((1 << (last - first)) - 1) << first if first < last else 0
+
+def startable(busy, duration):
+    """Return the bitmap of the first day's slots a duration-minute reservation can start in, given busy slots."""
+    blocked = 0
+    for offset in range(-(-duration // SLOT_MINUTES)):
+        blocked |= busy >> offset
+    return ~blocked & ((1 << DAY_SLOTS) - 1)
+
+class DayIndex:
+    """Reserved intervals of every table on one date."""
+
+    def __init__(self, date, tables, intervals, adjacent=None):
+        self.date = date
+        # {table id: TableInfo} in table order
+        self.tables = tables
+        # {table id: [(start, end, reservation id), ...]} sorted by start
+        self.intervals = intervals
+        # {table id: frozenset of table ids it can be joined with}
+        self.adjacent = adjacent or {}
+        self.starts = {pk: [interval[0] for interval in table_intervals] for pk, table_intervals in intervals.items()}
+
+    @classmethod
+    def build(cls, date):
+        tables = {
+            row[0]: TableInfo(*row[1:])
+            for row in Table.objects.values_list(
+                'id', 'number', 'section_id', 'section__name', 'capacity', 'status', 'is_active'
+            ).order_by('section', 'number')
+        }
+        offsets = {date + timedelta(days=days): days * DAY_MINUTES for days in (-1, 0, 1)}
+        intervals = {}
+        for pk, table_id, day, start_time, duration in Reservation.objects.filter(
+            date__in=list(offsets), status__in=ACTIVE_STATUSES
+        ).values_list('id', 'table_id', 'date', 'time', 'duration'):
+            start = to_minutes(start_time) + offsets[day]
+            intervals.setdefault(table_id, []).append((start, start + duration, pk))
+        for table_intervals in intervals.values():
+            table_intervals.sort()
+        adjacent = {}
+        for from_id, to_id in Table.combinable_with.through.objects.values_list('from_table_id', 'to_table_id'):
+            adjacent.setdefault(from_id, set()).add(to_id)
+        return cls(date, tables, intervals, {pk: frozenset(ids) for pk, ids in adjacent.items()})
+
+    def conflicts(self, table_id, start, end, exclude=None):
+        """Return the intervals of table_id that overlap [start, end), ignoring reservation exclude."""
+        table_intervals = self.intervals.get(table_id, ())
+        if not table_intervals:
+            return []
+        # Only intervals starting before end can overlap
+        candidates = table_intervals[:bisect.bisect_left(self.starts[table_id], end)]
+        return [interval for interval in candidates if interval[1] > start and interval[2] != exclude]
+
+    def is_bookable(self, table_id):
+        table = self.tables.get(table_id)
+        return table is not None and table.is_active and table.status != 'maintenance'
+
+    def bookable_tables(self, party_size=1):
+        """Return the ids of bookable tables seating party_size, in table order."""
+        return [pk for pk, table in self.tables.items() if table.capacity >= party_size and self.is_bookable(pk)]
+
+    def free_tables(self, start, duration, party_size=1, exclude=None):
+        """Return the ids of bookable tables seating party_size that are free for duration minutes from start."""
+        end = start + duration
+        return [pk for pk in self.bookable_tables(party_size) if not self.conflicts(pk, start, end, exclude)]
+
+    def busy_slots(self, table_id, days=1):
+        """
+        Return a bitmap of table_id's reserved slots over days from midnight.
+
+        Bit i is set when any reservation overlaps slot i, the SLOT_MINUTES
+        from i * SLOT_MINUTES on.
+        """
+        bitmap = 0
+        for start, end, _ in self.intervals.get(table_id, ()):
+            bitmap |= slot_bits(start, end, days)
+        return bitmap
+
+    def startable_slots(self, table_id, duration):
+        """
+        Return a bitmap of the date's slots a reservation of duration minutes can start in.
+
+        duration is rounded up to whole slots.
+        """
+        # Look into the next day for reservations late bookings would run into
+        return startable(self.busy_slots(table_id, days=2), duration)
+
+def _generations(keys):
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Seed from the clock so a lost generation never reuses an old index
+            cache.add(key, clock.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+def day_index(date):
+    """Return the DayIndex of date, built on a cache miss."""
+    date_generation, tables_generation = _generations([DATE_GENERATION_KEY.format(date), TABLES_GENERATION_KEY])
+    key = INDEX_KEY.format(date, date_generation, tables_generation)
+    index = cache.get(key)
+    if index is None:
+        index = DayIndex.build(date)
+        cache.set(key, index, timeout=INDEX_TIMEOUT)
+    return index
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        _generations([key])
+        cache.incr(key)
+
+def invalidate_date(date):
+    """Retire the cached indexes of date and of the days either side, which read it, on commit."""
+    for day in (date - timedelta(days=1), date, date + timedelta(days=1)):
+        transaction.on_commit(lambda key=DATE_GENERATION_KEY.format(day): _bump(key))
+
+def invalidate_tables():
+    """Retire every cached index on commit."""
+    transaction.on_commit(lambda: _bump(TABLES_GENERATION_KEY))
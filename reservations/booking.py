@@ -0,0 +1,166 @@
+"""
+Contention-safe reservation booking.
+
+book() serializes bookings per table and date rather than globally. It takes
+the ReservationSlotLock rows of every date the booking touches with
+SELECT ... FOR UPDATE, rechecks overlaps against the database while holding
+them and only then inserts the reservation. Two bookings racing for the same
+table can therefore not both succeed, while bookings of other tables or
+dates never wait on each other. Overlapping bookings always touch a common
+date, so they always contend for a common lock row.
+
+When the requested table is taken and the caller allows it, book() falls
+back to other free tables seating the party, smallest first, as found in
+the day's availability index (reservations/availability.py).
+
+reschedule() puts edits of existing reservations through the same locked
+recheck whenever they claim a table for a new time, or claim it again
+after a cancellation.
+"""
+from datetime import timedelta
+from django.db import OperationalError, transaction
+from .availability import ACTIVE_STATUSES, DAY_MINUTES, day_index, to_minutes, to_time
+from .models import Reservation, ReservationSlotLock
+
+# Alternative tables tried after the requested one
+MAX_ALTERNATIVES = 5
+# Retries after a deadlock or lock wait timeout
+LOCK_RETRIES = 2
+# Deadlock and lock wait timeout error codes of MySQL and PostgreSQL
+LOCK_CONTENTION_CODES = {1205, 1213, '40P01', '55P03'}
+
+class BookingConflict(Exception):
+    """The table is taken; alternatives lists tables that looked free for the same time."""
+    def __init__(self, message, alternatives):
+        super().__init__(message)
+        self.alternatives = alternatives
+
+def _touched_dates(date, start, end):
+    return [date + timedelta(days=days) for days in range(start // DAY_MINUTES, (end - 1) // DAY_MINUTES + 1)]
+
+def _conflict(table_id, date, start, end, exclude=None):
+    """Return the first (start, end) of the table's reservations overlapping [start, end), read from the database."""
+    offsets = {date + timedelta(days=days): days * DAY_MINUTES for days in (-1, 0, 1)}
+    reservations = Reservation.objects.filter(table_id=table_id, date__in=list(offsets), status__in=ACTIVE_STATUSES)
+    if exclude is not None:
+        reservations = reservations.exclude(pk=exclude)
+    for day, time, duration in reservations.values_list('date', 'time', 'duration'):
+        reserved_start = to_minutes(time) + offsets[day]
+        if reserved_start < end and reserved_start + duration > start:
+            return reserved_start, reserved_start + duration
+    return None
+
+def _lock_contention(error):
+    """Tell whether a database error is a deadlock or lock wait timeout, which a retry can get past."""
+    cause = error.__cause__ or error
+    code = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    if code is None and cause.args:
+        code = cause.args[0]
+    return code in LOCK_CONTENTION_CODES
+
+def _ensure_lock_rows(table_ids, dates):
+    """Create the tables' missing lock rows for dates in their own statement."""
+    existing = set(ReservationSlotLock.objects.filter(
+        table_id__in=table_ids, date__in=dates
+    ).values_list('table_id', 'date'))
+    missing = [(table_id, date) for table_id in table_ids for date in dates if (table_id, date) not in existing]
+    if missing:
+        ReservationSlotLock.objects.bulk_create(
+            [ReservationSlotLock(table_id=table_id, date=date) for table_id, date in missing], ignore_conflicts=True
+        )
+
+def _locked(table_id, dates, write):
+    """Return write() run in a transaction holding the table's lock rows for dates."""
+    # Inserting the rows in the locking transaction would take shared locks on
+    # the duplicate keys, which concurrent bookings of a new date deadlock on
+    _ensure_lock_rows([table_id], dates)
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            with transaction.atomic():
+                # Always lock in date order so bookings spanning midnight cannot deadlock
+                list(ReservationSlotLock.objects.select_for_update().filter(
+                    table_id=table_id, date__in=dates
+                ).order_by('date'))
+                return write()
+        except OperationalError as error:
+            # An outer transaction was rolled back with the statement; only its owner can retry
+            if attempt == LOCK_RETRIES or not _lock_contention(error) or transaction.get_connection().in_atomic_block:
+                raise
+
+def _conflict_message(conflict):
+    return f"Table is already reserved from {to_time(conflict[0])} for {conflict[1] - conflict[0]} minutes"
+
+def _try_table(table_id, data, start, end):
+    """Book table_id under its date locks; return (reservation, None) or (None, conflicting interval)."""
+    def write():
+        conflict = _conflict(table_id, data['date'], start, end)
+        if conflict is not None:
+            return None, conflict
+        values = {field: value for field, value in data.items() if field != 'table'}
+        return Reservation.objects.create(table_id=table_id, **values), None
+
+    return _locked(table_id, _touched_dates(data['date'], start, end), write)
+
+def book(data, allow_alternative=False):
+    """
+    Create a reservation from validated data.
+
+    Raises BookingConflict when the table is taken and no alternative was
+    allowed or could be booked.
+    """
+    data = dict(data)
+    data.setdefault('duration', Reservation._meta.get_field('duration').default)
+    table = data['table']
+    start = to_minutes(data['time'])
+    end = start + data['duration']
+
+    reservation, conflict = _try_table(table.pk, data, start, end)
+    if reservation is not None:
+        return reservation
+
+    index = day_index(data['date'])
+    alternatives = sorted(
+        (pk for pk in index.free_tables(start, data['duration'], data['party_size']) if pk != table.pk),
+        key=lambda pk: index.tables[pk].capacity
+    )
+    if allow_alternative:
+        for pk in alternatives[:MAX_ALTERNATIVES]:
+            reservation, _ = _try_table(pk, data, start, end)
+            if reservation is not None:
+                return reservation
+        alternatives = alternatives[MAX_ALTERNATIVES:]
+
+    raise BookingConflict(_conflict_message(conflict), alternatives)
+
+def reschedule(reservation, changes):
+    """
+    Apply validated changes to reservation and save it.
+
+    When the reservation ends up active at a new table, date, time or
+    length, or active again after it was not, the overlap is rechecked under
+    the booking locks, ignoring the reservation itself. Raises
+    BookingConflict, without alternatives, when it no longer fits.
+    """
+    claimed = (reservation.table_id, reservation.date, reservation.time, reservation.duration)
+    was_active = reservation.status in ACTIVE_STATUSES
+    for field, value in changes.items():
+        setattr(reservation, field, value)
+    if reservation.status not in ACTIVE_STATUSES or (
+        was_active and (reservation.table_id, reservation.date, reservation.time, reservation.duration) == claimed
+    ):
+        reservation.save()
+        return reservation
+
+    start = to_minutes(reservation.time)
+    end = start + reservation.duration
+
+    def write():
+        conflict = _conflict(reservation.table_id, reservation.date, start, end, exclude=reservation.pk)
+        if conflict is None:
+            reservation.save()
+        return conflict
+
+    conflict = _locked(reservation.table_id, _touched_dates(reservation.date, start, end), write)
+    if conflict is not None:
+        raise BookingConflict(_conflict_message(conflict), [])
+    return reservation
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0002_hot_path_indexes'),
+        ('reservations', '0003_reservation_date_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationSlotLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_locks', to='tables.table')),
+            ],
+            options={
+                'unique_together': {('table', 'date')},
+            },
+        ),
+    ]
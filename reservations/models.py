@@ -26,7 +26,30 @@ class Reservation(models.Model):
     
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            # Reservations of a table on a given day
+            models.Index(fields=['table', 'date', 'status'], name='reservation_table_date_idx'),
+            # A day's reservations for the availability index
+            models.Index(fields=['date', 'status'], name='reservation_date_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer_name} - {self.date} {self.time}"
 
+
+class ReservationSlotLock(models.Model):
+    """
+    Lock row for booking a table on a date.
+    
+    reservations/booking.py takes these with SELECT ... FOR UPDATE, so
+    bookings of the same table and date queue up while every other booking
+    goes ahead.
+    """
+    table = models.ForeignKey('tables.Table', related_name='reservation_locks', on_delete=models.CASCADE)
+    date = models.DateField()
+    
+    class Meta:
+        unique_together = ('table', 'date')
+    
+    def __str__(self):
+        return f"Table {self.table_id} on {self.date}"
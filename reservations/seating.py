@@ -0,0 +1,219 @@
+"""
+Seating parties at tables and joined tables.
+
+A party sits at one free table or, where tables of a section are marked
+combinable (Table.combinable_with), at up to MAX_COMBINED neighbouring free
+tables pushed together. Ways to seat a party are ranked by:
+
+1. wasted seats, counting every extra table joined as COMBINE_PENALTY
+   seats, so a single table wins unless joining saves real capacity;
+2. lost capacity: the seats times SLOT_MINUTES start slots, for a booking
+   of the same length, that the tables stop offering. A booking that
+   leaves a gap nobody can book into costs more than one that lines up
+   with its neighbours.
+
+suggest() ranks the ways to seat one party from a day index and makes no
+query, so the host stand can call it on every keystroke.
+
+optimize() re-seats the date's reservations starting in a time window at
+single tables, largest parties first, each at its best ranked free table,
+and keeps the plan only if it wastes no more seats than the current one.
+Reservations outside the window, or that already started, stay where they
+are. With apply=True the plan is made again from the database under the
+booking locks of every table on the dates involved (reservations/booking.py)
+and stored in one bulk update. A reservation holds a single table, so
+joined tables are suggested but never stored.
+"""
+from collections import namedtuple
+from django.db import transaction
+from django.utils import timezone
+from tables.models import Table
+from tables import floor
+from .availability import ACTIVE_STATUSES, DayIndex, day_index, invalidate_date, slot_bits, startable, to_minutes
+from .booking import _ensure_lock_rows, _touched_dates
+from .models import Reservation, ReservationSlotLock
+
+MAX_COMBINED = 3
+COMBINE_PENALTY = 2
+MAX_SUGGESTIONS = 5
+
+Option = namedtuple('Option', ['tables', 'capacity', 'wasted_seats', 'lost_capacity'])
+
+def _cost(option):
+    return option.wasted_seats + COMBINE_PENALTY * (len(option.tables) - 1), option.lost_capacity
+
+def _popcount(bitmap):
+    return bin(bitmap).count('1')
+
+def _combinations(index, free, party_size):
+    """Yield the connected groups of free tables, up to MAX_COMBINED, that seat party_size when joined."""
+    fits = {pk for pk in free if index.tables[pk].capacity >= party_size}
+    seen = set()
+    frontier = [frozenset([pk]) for pk in free - fits]
+    for _ in range(MAX_COMBINED - 1):
+        grown = []
+        for group in frontier:
+            section_id = index.tables[next(iter(group))].section_id
+            neighbours = set().union(*(index.adjacent.get(pk, ()) for pk in group)) - group
+            for neighbour in neighbours & (free - fits):
+                bigger = group | {neighbour}
+                if bigger in seen or index.tables[neighbour].section_id != section_id:
+                    continue
+                seen.add(bigger)
+                if sum(index.tables[pk].capacity for pk in bigger) >= party_size:
+                    yield bigger
+                else:
+                    grown.append(bigger)
+        frontier = grown
+
+def _options(index, free, busy, start, duration, party_size, combine=True):
+    """
+    Return every way to seat party_size at the free tables for duration minutes from start, best first.
+
+    busy(table id) returns the table's busy slots over two days from midnight.
+    """
+    booking = slot_bits(start, start + duration, days=2)
+    lost = {}
+
+    def lost_capacity(pk):
+        if pk not in lost:
+            before = startable(busy(pk), duration)
+            after = startable(busy(pk) | booking, duration)
+            lost[pk] = index.tables[pk].capacity * _popcount(before & ~after)
+        return lost[pk]
+
+    groups = [(pk,) for pk in free if index.tables[pk].capacity >= party_size]
+    if combine:
+        groups.extend(tuple(sorted(group)) for group in _combinations(index, free, party_size))
+    options = []
+    for tables in groups:
+        capacity = sum(index.tables[pk].capacity for pk in tables)
+        options.append(Option(tables, capacity, capacity - party_size, sum(lost_capacity(pk) for pk in tables)))
+    return sorted(options, key=lambda option: (_cost(option), option.tables))
+
+def suggest(index, start_time, duration, party_size, limit=MAX_SUGGESTIONS):
+    """Return the best ways to seat party_size at start_time on the index's date, joined tables included."""
+    start = to_minutes(start_time)
+    free = set(index.free_tables(start, duration))
+    return _options(index, free, lambda pk: index.busy_slots(pk, days=2), start, duration, party_size)[:limit]
+
+def _plan(index, movable):
+    """
+    Seat movable reservations at single tables around everything else in the index.
+
+    movable holds (reservation id, table id, start, duration, party size)
+    rows. Returns {reservation id: table id}, or None when a party fits at
+    no table.
+    """
+    moving = {row[0] for row in movable}
+    intervals = {
+        pk: [interval for interval in index.intervals.get(pk, ()) if interval[2] not in moving]
+        for pk in index.tables
+    }
+    busy = {pk: 0 for pk in index.tables}
+    for pk, table_intervals in intervals.items():
+        for start, end, _ in table_intervals:
+            busy[pk] |= slot_bits(start, end, days=2)
+    bookable = [pk for pk in index.tables if index.is_bookable(pk)]
+
+    plan = {}
+    for reservation_id, current, start, duration, party_size in sorted(movable, key=lambda row: (-row[4], row[2], row[0])):
+        end = start + duration
+        free = {pk for pk in bookable if not any(s < end and e > start for s, e, _ in intervals[pk])}
+        options = _options(index, free, busy.__getitem__, start, duration, party_size, combine=False)
+        if not options:
+            return None
+        # Between equally good tables, leave the party where it is
+        best = min(options, key=lambda option: (_cost(option), option.tables[0] != current, option.tables))
+        table_id = best.tables[0]
+        plan[reservation_id] = table_id
+        intervals[table_id].append((start, end, reservation_id))
+        busy[table_id] |= slot_bits(start, end, days=2)
+    return plan
+
+def _movable(date, start_time, end_time, moment):
+    local = timezone.localtime(moment)
+    if date < local.date():
+        return []
+    reservations = Reservation.objects.filter(date=date, status__in=ACTIVE_STATUSES)
+    if start_time is not None:
+        reservations = reservations.filter(time__gte=start_time)
+    if end_time is not None:
+        reservations = reservations.filter(time__lt=end_time)
+    if date == local.date():
+        reservations = reservations.filter(time__gt=local.time())
+    return [
+        (pk, table_id, to_minutes(start), duration, party_size)
+        for pk, table_id, start, duration, party_size in reservations.values_list(
+            'id', 'table_id', 'time', 'duration', 'party_size'
+        )
+    ]
+
+def _optimize(index, movable):
+    def capacity(pk):
+        return index.tables[pk].capacity if pk in index.tables else 0
+
+    before = sum(capacity(table_id) - party_size for _, table_id, _, _, party_size in movable)
+    result = {'moves': [], 'wasted_seats_before': before, 'wasted_seats_after': before, 'seated_all': True}
+    plan = _plan(index, movable)
+    if plan is None:
+        result['seated_all'] = False
+        return result
+    after = sum(capacity(plan[pk]) - party_size for pk, _, _, _, party_size in movable)
+    if after <= before:
+        result['wasted_seats_after'] = after
+        result['moves'] = [
+            {'reservation': pk, 'from_table': table_id, 'to_table': plan[pk]}
+            for pk, table_id, _, _, _ in movable if plan[pk] != table_id
+        ]
+    return result
+
+def _touched(date, movable):
+    return {day for _, _, start, duration, _ in movable for day in _touched_dates(date, start, start + duration)}
+
+def _apply(date, result):
+    """Store the moves of result; runs under the booking locks."""
+    if result['moves']:
+        now = timezone.now()
+        Reservation.objects.bulk_update(
+            [Reservation(pk=move['reservation'], table_id=move['to_table'], updated_at=now) for move in result['moves']],
+            ['table', 'updated_at']
+        )
+        # bulk_update() sends no signals
+        invalidate_date(date)
+        touched = {move[key] for move in result['moves'] for key in ('from_table', 'to_table')}
+        transaction.on_commit(lambda: floor.materialize(Table.objects.filter(pk__in=touched)))
+    result['applied'] = bool(result['moves'])
+    return result
+
+def optimize(date, start_time=None, end_time=None, apply=False, moment=None):
+    """
+    Re-seat the date's reservations starting in [start_time, end_time) at single tables.
+
+    Returns the moves with the wasted seats before and after them. Nothing
+    moves when some party would fit at no table or the plan wastes more.
+    """
+    moment = moment or timezone.now()
+    if not apply:
+        result = _optimize(day_index(date), _movable(date, start_time, end_time, moment))
+        result['applied'] = False
+        return result
+
+    table_ids = list(Table.objects.values_list('id', flat=True))
+    dates = _touched(date, _movable(date, start_time, end_time, moment))
+    while True:
+        # Lock rows are created outside the locking transaction, as bookings do
+        _ensure_lock_rows(table_ids, sorted(dates))
+        with transaction.atomic():
+            # Same order as bookings take them: by table, then by date
+            list(ReservationSlotLock.objects.select_for_update().filter(
+                table_id__in=table_ids, date__in=dates
+            ).order_by('table_id', 'date'))
+
+            # Bookings made before the locks were taken are in the database now
+            movable = _movable(date, start_time, end_time, moment)
+            touched = _touched(date, movable)
+            if touched <= dates:
+                return _apply(date, _optimize(DayIndex.build(date), movable))
+        # A booking made meanwhile runs into a day that was not locked
+        dates |= touched
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Reservation
+from .booking import book, reschedule
 from tables.serializers import TableSerializer
 
 class ReservationSerializer(serializers.ModelSerializer):
@@ -11,46 +12,52 @@ class ReservationSerializer(serializers.ModelSerializer):
                   'email', 'date', 'time', 'duration', 'party_size', 'status', 
                   'notes', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+    
+    def update(self, instance, validated_data):
+        # Moves are rechecked under the booking locks; raises BookingConflict
+        return reschedule(instance, validated_data)
 
 class ReservationCreateSerializer(serializers.ModelSerializer):
+    # Book another free table seating the party if the requested one is taken
+    allow_alternative = serializers.BooleanField(default=False, write_only=True)
+    
     class Meta:
         model = Reservation
         fields = ['table', 'customer_name', 'contact_phone', 'email', 'date', 
-                  'time', 'duration', 'party_size', 'notes']
+                  'time', 'duration', 'party_size', 'notes', 'allow_alternative']
     
-    def validate(self, attrs):
-        # Check if table is available for the requested time
-        table = attrs['table']
-        date = attrs['date']
-        time = attrs['time']
-        duration = attrs['duration']
-        
-        # Check for overlapping reservations
-        overlapping_reservations = Reservation.objects.filter(
-            table=table,
-            date=date,
-            status__in=['confirmed', 'pending'],
-        ).exclude(pk=self.instance.pk if self.instance else None)
-        
-        for reservation in overlapping_reservations:
-            # Convert reservation time to minutes since midnight
-            res_start_minutes = reservation.time.hour * 60 + reservation.time.minute
-            res_end_minutes = res_start_minutes + reservation.duration
-            
-            # Convert requested time to minutes since midnight
-            req_start_minutes = time.hour * 60 + time.minute
-            req_end_minutes = req_start_minutes + duration
-            
-            # Check for overlap
-            if (req_start_minutes < res_end_minutes and req_end_minutes > res_start_minutes):
-                raise serializers.ValidationError(
-                    f"Table is already reserved from {reservation.time} for {reservation.duration} minutes"
-                )
-        
-        return attrs
+    def create(self, validated_data):
+        # Overlaps are checked under per-table, per-date locks; raises BookingConflict
+        allow_alternative = validated_data.pop('allow_alternative', False)
+        return book(validated_data, allow_alternative=allow_alternative)
 
 class ReservationStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = ['status']
+    
+    def update(self, instance, validated_data):
+        # Reactivating a reservation claims its table again; raises BookingConflict
+        return reschedule(instance, validated_data)
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """Query parameters of an availability lookup."""
+    date = serializers.DateField()
+    time = serializers.TimeField()
+    duration = serializers.IntegerField(min_value=1, max_value=24 * 60, default=120)
+    party_size = serializers.IntegerField(min_value=1, default=2)
+
+class AvailabilityGridQuerySerializer(serializers.Serializer):
+    """Query parameters of the whole-day availability grid."""
+    date = serializers.DateField()
+    duration = serializers.IntegerField(min_value=1, max_value=24 * 60, default=120)
+    party_size = serializers.IntegerField(min_value=1, default=2)
+    group_by = serializers.ChoiceField(choices=['section'], required=False)
 
+class SeatingOptimizeSerializer(serializers.Serializer):
+    """Window of a date whose reservations are re-seated."""
+    date = serializers.DateField()
+    start_time = serializers.TimeField(required=False)
+    end_time = serializers.TimeField(required=False)
+    apply = serializers.BooleanField(default=False)
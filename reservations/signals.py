@@ -0,0 +1,59 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.db import transaction
+from tables.models import Section, Table
+from tables import floor
+from .models import Reservation
+from . import availability
+
+# Table fields the availability index holds; of status only "maintenance or not" counts
+INDEXED_TABLE_FIELDS = ('capacity', 'is_active', 'number', 'section_id', 'status')
+
+def _indexed(values):
+    *fields, status = values
+    return (*fields, status == 'maintenance')
+
+@receiver(pre_save, sender=Reservation)
+def reservation_moving(sender, instance, **kwargs):
+    # Remember the stored date and table so a moved reservation frees its old day and table
+    if instance.pk is not None:
+        instance._stored_date, instance._stored_table_id = Reservation.objects.filter(
+            pk=instance.pk
+        ).values_list('date', 'table_id').first() or (None, None)
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    """Drop the cached availability of the days the reservation is or was on."""
+    for date in {instance.date, getattr(instance, '_stored_date', None)} - {None}:
+        availability.invalidate_date(date)
+    # Registered after the invalidation so the floor reads the new reservation book
+    table_ids = {instance.table_id, getattr(instance, '_stored_table_id', None)} - {None}
+    transaction.on_commit(lambda: floor.materialize(Table.objects.filter(pk__in=table_ids)))
+
+@receiver(pre_save, sender=Table)
+def table_saving(sender, instance, **kwargs):
+    # Remember what the index holds so seating and clearing a table leave it alone
+    if instance.pk is not None:
+        instance._stored_indexed = Table.objects.filter(pk=instance.pk).values_list(*INDEXED_TABLE_FIELDS).first()
+
+@receiver(post_save, sender=Table)
+def table_saved(sender, instance, created, **kwargs):
+    """Drop every day's availability when the table changes in a way the index shows."""
+    stored = getattr(instance, '_stored_indexed', None)
+    current = tuple(getattr(instance, field) for field in INDEXED_TABLE_FIELDS)
+    if created or stored is None or _indexed(stored) != _indexed(current):
+        availability.invalidate_tables()
+
+@receiver(post_delete, sender=Table)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def table_changed(sender, instance, **kwargs):
+    """Tables carry capacity, status and section names into every day's availability."""
+    availability.invalidate_tables()
+
+@receiver(m2m_changed, sender=Table.combinable_with.through)
+def table_combinations_changed(sender, action, **kwargs):
+    """Which tables can be joined is part of every day's availability."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        availability.invalidate_tables()
@@ -0,0 +1,323 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from rest_framework.test import APIClient
+from tables.models import Section, Table
+from users.models import User
+from reservations.availability import DAY_MINUTES, SLOT_MINUTES, DayIndex, TableInfo, slot_bits, startable
+from reservations.booking import BookingConflict, _lock_contention, book
+from reservations import seating
+from reservations.models import Reservation
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Bookings racing for the same table never double-book it.
+
+    Needs a database with row locks (MySQL, PostgreSQL); SQLite ignores
+    SELECT ... FOR UPDATE, so the tests are skipped there.
+    """
+    THREADS = 8
+    DATE = date(2030, 6, 1)
+
+    def setUp(self):
+        section = Section.objects.create(name='Main')
+        self.tables = [Table.objects.create(number=str(number), section=section, capacity=4) for number in range(self.THREADS)]
+
+    def payload(self, table, start, index):
+        return {
+            'table': table,
+            'customer_name': f'Guest {index}',
+            'contact_phone': '0000000000',
+            'date': self.DATE,
+            'time': start,
+            'duration': 90,
+            'party_size': 2,
+        }
+
+    def book_concurrently(self, payloads):
+        """Start every booking at once from its own connection; return the reservations made."""
+        barrier = threading.Barrier(len(payloads))
+
+        def run(data):
+            try:
+                barrier.wait()
+                return book(data)
+            except BookingConflict:
+                return None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(payloads)) as pool:
+            return [reservation for reservation in pool.map(run, payloads) if reservation is not None]
+
+    def assertNoOverlaps(self):
+        by_table = {}
+        for table_id, start, duration in Reservation.objects.filter(date=self.DATE).values_list('table_id', 'time', 'duration'):
+            minutes = start.hour * 60 + start.minute
+            by_table.setdefault(table_id, []).append((minutes, minutes + duration))
+        for intervals in by_table.values():
+            intervals.sort()
+            for previous, current in zip(intervals, intervals[1:]):
+                self.assertGreaterEqual(current[0], previous[1])
+
+    def test_same_slot_books_once(self):
+        table = self.tables[0]
+        booked = self.book_concurrently([self.payload(table, time(19), index) for index in range(self.THREADS)])
+        self.assertEqual(len(booked), 1)
+        self.assertEqual(Reservation.objects.filter(table=table, date=self.DATE).count(), 1)
+
+    def test_overlapping_slots_never_overlap(self):
+        table = self.tables[0]
+        starts = [time(18 + index // 4, index % 4 * 15) for index in range(self.THREADS)]
+        booked = self.book_concurrently([self.payload(table, start, index) for index, start in enumerate(starts)])
+        self.assertGreaterEqual(len(booked), 1)
+        self.assertNoOverlaps()
+
+    def test_other_tables_all_book(self):
+        booked = self.book_concurrently([self.payload(table, time(19), index) for index, table in enumerate(self.tables)])
+        self.assertEqual(len(booked), self.THREADS)
+        self.assertNoOverlaps()
+
+class LockContentionTests(SimpleTestCase):
+    """Only deadlocks and lock wait timeouts are retried."""
+
+    def wrapped(self, cause):
+        error = OperationalError(*cause.args)
+        error.__cause__ = cause
+        return error
+
+    def test_mysql_codes(self):
+        self.assertTrue(_lock_contention(self.wrapped(Exception(1213, 'Deadlock found'))))
+        self.assertTrue(_lock_contention(self.wrapped(Exception(1205, 'Lock wait timeout exceeded'))))
+        self.assertFalse(_lock_contention(self.wrapped(Exception(2006, 'MySQL server has gone away'))))
+
+    def test_postgresql_codes(self):
+        cause = Exception('deadlock detected')
+        cause.pgcode = '40P01'
+        self.assertTrue(_lock_contention(self.wrapped(cause)))
+        cause.pgcode = '08006'
+        self.assertFalse(_lock_contention(self.wrapped(cause)))
+
+class ReservationUpdateTests(TestCase):
+    """Edits of existing reservations cannot double-book a table."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='host@example.com', password='x', name='Host', role='manager'))
+        section = Section.objects.create(name='Main')
+        self.tables = [Table.objects.create(number=str(number), section=section, capacity=4) for number in range(2)]
+        self.first = self.reserve(self.tables[0], time(18))
+        self.second = self.reserve(self.tables[0], time(20))
+
+    def reserve(self, table, start, **fields):
+        return Reservation.objects.create(
+            table=table, customer_name='Guest', contact_phone='1', date=date(2030, 6, 1), time=start,
+            duration=120, party_size=2, status=fields.pop('status', 'confirmed'), **fields
+        )
+
+    def url(self, reservation, suffix=''):
+        return f'/api/reservations/reservations/{reservation.pk}/{suffix}'
+
+    def test_move_into_another_reservation_conflicts(self):
+        response = self.client.patch(self.url(self.second), {'time': '19:00'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.time, time(20))
+
+    def test_move_to_another_table_conflicts(self):
+        other = self.reserve(self.tables[1], time(18, 30))
+        response = self.client.patch(self.url(other), {'table': self.tables[0].pk}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_full_update_checks_too(self):
+        data = {
+            'table': self.tables[0].pk, 'customer_name': 'Guest', 'contact_phone': '1', 'date': '2030-06-01',
+            'time': '21:00', 'duration': 120, 'party_size': 2, 'status': 'confirmed'
+        }
+        self.assertEqual(self.client.put(self.url(self.first), data, format='json').status_code, 409)
+        data['time'] = '16:00'
+        self.assertEqual(self.client.put(self.url(self.first), data, format='json').status_code, 200)
+
+    def test_change_overlapping_only_itself_is_allowed(self):
+        response = self.client.patch(self.url(self.second), {'time': '20:30', 'notes': 'Window'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.second.refresh_from_db()
+        self.assertEqual((self.second.time, self.second.notes), (time(20, 30), 'Window'))
+
+    def test_reactivating_into_a_taken_slot_conflicts(self):
+        cancelled = self.reserve(self.tables[0], time(19), status='cancelled')
+        response = self.client.patch(self.url(cancelled, 'update_status/'), {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'cancelled')
+
+    def test_cancelling_is_always_allowed(self):
+        response = self.client.patch(self.url(self.second, 'update_status/'), {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        freed = self.reserve(self.tables[0], time(20), status='cancelled')
+        response = self.client.patch(self.url(freed, 'update_status/'), {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+class TableInvalidationTests(TestCase):
+    """Only table changes the availability index shows drop it."""
+
+    def setUp(self):
+        self.section = Section.objects.create(name='Main')
+        self.table = Table.objects.create(number='1', section=self.section, capacity=4)
+
+    def assertInvalidates(self, expected, **fields):
+        for field, value in fields.items():
+            setattr(self.table, field, value)
+        with mock.patch('reservations.availability.invalidate_tables') as invalidate_tables:
+            self.table.save()
+        self.assertEqual(invalidate_tables.called, expected, fields)
+
+    def test_seating_and_clearing_keep_the_index(self):
+        self.assertInvalidates(False, status='occupied', customer_name='Walk-in')
+        self.assertInvalidates(False, status='reserved')
+        self.assertInvalidates(False, status='available', customer_name='')
+
+    def test_maintenance_drops_the_index(self):
+        self.assertInvalidates(True, status='maintenance')
+        self.assertInvalidates(True, status='available')
+
+    def test_indexed_fields_drop_the_index(self):
+        self.assertInvalidates(True, capacity=6)
+        self.assertInvalidates(True, is_active=False)
+        self.assertInvalidates(True, number='1A')
+        self.assertInvalidates(True, section=Section.objects.create(name='Patio'))
+
+class SeatingTests(SimpleTestCase):
+    """Joining tables, start slots and the optimizer, on indexes built in memory."""
+
+    def index(self, capacities, adjacent=(), intervals=None, sections=None):
+        tables = {
+            pk: TableInfo(str(pk), (sections or {}).get(pk, 1), 'Main', capacity, 'available', True)
+            for pk, capacity in capacities.items()
+        }
+        neighbours = {}
+        for first, second in adjacent:
+            neighbours.setdefault(first, set()).add(second)
+            neighbours.setdefault(second, set()).add(first)
+        return DayIndex(
+            date(2030, 6, 1), tables, intervals or {}, {pk: frozenset(ids) for pk, ids in neighbours.items()}
+        )
+
+    def combinations(self, index, party_size):
+        return {frozenset(group) for group in seating._combinations(index, set(index.tables), party_size)}
+
+    def test_combinations_join_neighbours_only(self):
+        index = self.index({1: 2, 2: 2, 3: 2, 4: 8}, adjacent=[(1, 2), (2, 3), (3, 4)])
+        self.assertEqual(self.combinations(index, 4), {frozenset({1, 2}), frozenset({2, 3})})
+        self.assertEqual(self.combinations(index, 6), {frozenset({1, 2, 3})})
+        # Table 4 seats either party alone and is never joined
+        self.assertEqual(self.combinations(index, 8), set())
+
+    def test_combinations_stay_in_one_section(self):
+        index = self.index({1: 2, 2: 2, 3: 2}, adjacent=[(1, 2), (2, 3)], sections={3: 2})
+        self.assertEqual(self.combinations(index, 4), {frozenset({1, 2})})
+        self.assertEqual(self.combinations(index, 6), set())
+
+    def test_startable_sees_the_next_day(self):
+        # Booked from 00:30 to 02:00 the next day
+        busy = slot_bits(DAY_MINUTES + 30, DAY_MINUTES + 120, days=2)
+        slots = startable(busy, 90)
+        last = DAY_MINUTES // SLOT_MINUTES - 1
+        self.assertTrue(slots >> (23 * 60 // SLOT_MINUTES) & 1)
+        self.assertFalse(slots >> (23 * 60 // SLOT_MINUTES + 1) & 1)
+        self.assertFalse(slots >> last & 1)
+        # Nothing past the first day is offered
+        self.assertEqual(slots >> (last + 1), 0)
+        # Without the next day every late slot looks free
+        self.assertTrue(startable(busy & ((1 << (last + 1)) - 1), 90) >> last & 1)
+
+    def test_optimize_keeps_current_table_on_ties(self):
+        index = self.index({1: 4, 2: 4}, intervals={2: [(18 * 60, 20 * 60, 7)]})
+        result = seating._optimize(index, [(7, 2, 18 * 60, 120, 4)])
+        self.assertEqual(result['moves'], [])
+        self.assertEqual((result['wasted_seats_before'], result['wasted_seats_after']), (0, 0))
+
+    def test_optimize_moves_to_a_tighter_table(self):
+        index = self.index({1: 2, 2: 6}, intervals={2: [(18 * 60, 20 * 60, 7)]})
+        result = seating._optimize(index, [(7, 2, 18 * 60, 120, 2)])
+        self.assertEqual(result['moves'], [{'reservation': 7, 'from_table': 2, 'to_table': 1}])
+        self.assertEqual((result['wasted_seats_before'], result['wasted_seats_after']), (4, 0))
+
+    def test_optimize_refuses_plans_wasting_more(self):
+        index = self.index({1: 2, 2: 6}, intervals={1: [(18 * 60, 20 * 60, 7)]})
+        with mock.patch.object(seating, '_plan', return_value={7: 2}):
+            result = seating._optimize(index, [(7, 1, 18 * 60, 120, 2)])
+        self.assertEqual(result['moves'], [])
+        self.assertEqual((result['wasted_seats_before'], result['wasted_seats_after']), (0, 0))
+        self.assertTrue(result['seated_all'])
+
+class DayIndexTests(TestCase):
+    """Reservations of the days either side spill into the date's index and grid."""
+    DATE = date(2030, 6, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='host@example.com', password='x', name='Host', role='manager'))
+        section = Section.objects.create(name='Main')
+        self.tables = [Table.objects.create(number=str(number), section=section, capacity=4) for number in range(2)]
+        # 23:00 the day before until 01:00, 18:00 until 20:00, and 00:30 the day after until 02:00
+        self.reserve(self.DATE - timedelta(days=1), time(23), 120)
+        self.reserve(self.DATE, time(18), 120)
+        self.reserve(self.DATE + timedelta(days=1), time(0, 30), 90)
+        # Two days away, out of reach
+        self.reserve(self.DATE + timedelta(days=2), time(0), 120)
+        self.index = DayIndex.build(self.DATE)
+
+    def reserve(self, day, start, duration):
+        return Reservation.objects.create(
+            table=self.tables[0], customer_name='Guest', contact_phone='1', date=day, time=start,
+            duration=duration, party_size=2, status='confirmed'
+        )
+
+    def test_intervals_are_minutes_from_the_dates_midnight(self):
+        pk = self.tables[0].pk
+        self.assertEqual([interval[:2] for interval in self.index.intervals[pk]], [
+            (-60, 60), (18 * 60, 20 * 60), (DAY_MINUTES + 30, DAY_MINUTES + 120)
+        ])
+        self.assertNotIn(self.tables[1].pk, self.index.intervals)
+
+    def test_conflicts_across_midnight(self):
+        pk = self.tables[0].pk
+        self.assertEqual(len(self.index.conflicts(pk, 0, 30)), 1)
+        self.assertEqual(self.index.conflicts(pk, 60, 18 * 60), [])
+        self.assertEqual(len(self.index.conflicts(pk, 23 * 60 + 15, 23 * 60 + 105)), 1)
+        self.assertEqual(self.index.conflicts(pk, 23 * 60, 23 * 60 + 90), [])
+        self.assertEqual(self.index.free_tables(0, 30), [self.tables[1].pk])
+
+    def test_busy_slots_across_midnight(self):
+        pk = self.tables[0].pk
+        today = slot_bits(0, 60) | slot_bits(18 * 60, 20 * 60)
+        self.assertEqual(self.index.busy_slots(pk), today)
+        self.assertEqual(self.index.busy_slots(pk, days=2), today | slot_bits(DAY_MINUTES + 30, DAY_MINUTES + 120, days=2))
+
+    def test_grid_bitmaps(self):
+        response = self.client.get('/api/reservations/reservations/availability_grid/', {
+            'date': self.DATE.isoformat(), 'duration': 60, 'party_size': 2
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['slots'], DAY_MINUTES // SLOT_MINUTES)
+        rows = {row['id']: row for row in response.data['tables']}
+        busy, free = rows[self.tables[0].pk], rows[self.tables[1].pk]
+        width = DAY_MINUTES // SLOT_MINUTES // 4
+        self.assertEqual({len(row[key]) for row in (busy, free) for key in ('busy', 'startable')}, {width})
+
+        self.assertEqual(int(busy['busy'], 16), slot_bits(0, 60) | slot_bits(18 * 60, 20 * 60))
+        startable_slots = int(busy['startable'], 16)
+        slot = lambda minutes: startable_slots >> (minutes // SLOT_MINUTES) & 1
+        self.assertEqual([slot(45), slot(60), slot(17 * 60), slot(17 * 60 + 15), slot(20 * 60)], [0, 1, 1, 0, 1])
+        # An hour from 23:45 runs into the next day's 00:30
+        self.assertEqual([slot(23 * 60 + 30), slot(23 * 60 + 45)], [1, 0])
+
+        self.assertEqual(int(free['busy'], 16), 0)
+        self.assertEqual(free['startable'], 'f' * width)
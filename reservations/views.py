@@ -4,18 +4,32 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Reservation
+from .availability import DAY_SLOTS, SLOT_MINUTES, day_index, to_minutes
+from .booking import BookingConflict
+from . import seating
 from .serializers import (
     ReservationSerializer, ReservationCreateSerializer, 
-    ReservationStatusUpdateSerializer
+    ReservationStatusUpdateSerializer, AvailabilityQuerySerializer, AvailabilityGridQuerySerializer,
+    SeatingOptimizeSerializer
 )
-from users.permissions import IsAdminOrManagerOrStaff
+from users.permissions import IsAdminOrManager, IsAdminOrManagerOrStaff
 from tables.models import Table
+from restaurant_pos.conditional import ConditionalGetMixin
+from restaurant_pos.pagination import KeysetPaginationMixin
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ConditionalGetMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Reservation.objects.all().order_by('date', 'time')
+    keyset_ordering = ('date', 'time', 'id')
     permission_classes = [IsAdminOrManagerOrStaff]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['date', 'status', 'table']
+    conditional_actions = ('list', 'retrieve', 'by_date')
+    conditional_timestamps = ('updated_at', 'table__updated_at', 'table__section__updated_at')
+    
+    def get_conditional_queryset(self):
+        if self.action == 'by_date':
+            return Reservation.objects.filter(date=self.request.query_params.get('date'))
+        return super().get_conditional_queryset()
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -25,35 +39,33 @@ class ReservationViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        reservation = serializer.save()
-        
-        # Update table status to reserved
-        table = reservation.table
-        table.status = 'reserved'
-        table.customer_name = reservation.customer_name
-        table.save()
+        try:
+            reservation = serializer.save()
+        except BookingConflict as conflict:
+            return Response({"error": str(conflict), "alternatives": conflict.alternatives}, 
+                            status=status.HTTP_409_CONFLICT)
         
+        # The table's status follows from the reservation book (tables/floor.py)
         return Response(ReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
     
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except BookingConflict as conflict:
+            return Response({"error": str(conflict), "alternatives": conflict.alternatives}, 
+                            status=status.HTTP_409_CONFLICT)
+    
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         reservation = self.get_object()
         serializer = ReservationStatusUpdateSerializer(reservation, data=request.data, partial=True)
         
         if serializer.is_valid():
-            updated_reservation = serializer.save()
-            
-            # Update table status based on reservation status
-            table = updated_reservation.table
-            if updated_reservation.status == 'cancelled':
-                table.status = 'available'
-                table.customer_name = ''
-                table.save()
-            elif updated_reservation.status == 'confirmed':
-                table.status = 'reserved'
-                table.customer_name = updated_reservation.customer_name
-                table.save()
-            
+            try:
+                updated_reservation = serializer.save()
+            except BookingConflict as conflict:
+                return Response({"error": str(conflict), "alternatives": conflict.alternatives}, 
+                                status=status.HTTP_409_CONFLICT)
             return Response(ReservationSerializer(updated_reservation).data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -65,57 +77,119 @@ class ReservationViewSet(viewsets.ModelViewSet):
             return Response({"error": "Date parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
         
         reservations = Reservation.objects.filter(date=date).order_by('time')
-        serializer = ReservationSerializer(reservations, many=True)
-        return Response(serializer.data)
+        return self.keyset_response(reservations, ReservationSerializer)
     
     @action(detail=False, methods=['get'])
     def available_tables(self, request):
-        date = request.query_params.get('date')
-        time = request.query_params.get('time')
-        duration = request.query_params.get('duration', 120)
-        party_size = request.query_params.get('party_size', 2)
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            if 'date' in params.errors or 'time' in params.errors:
+                return Response({"error": "Date and time parameters are required"}, 
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = params.validated_data
         
-        if not date or not time:
-            return Response({"error": "Date and time parameters are required"}, 
-                            status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get all tables with sufficient capacity
-        tables = Table.objects.filter(
-            capacity__gte=party_size,
-            is_active=True
-        )
-        
-        # Get all reservations for the given date
-        reservations = Reservation.objects.filter(
-            date=date,
-            status__in=['confirmed', 'pending']
+        # Answered from the cached interval index of the day, tightest fit first
+        index = day_index(query['date'])
+        table_ids = sorted(
+            index.free_tables(to_minutes(query['time']), query['duration'], query['party_size']),
+            key=lambda pk: index.tables[pk].capacity
         )
-        
-        # Convert time to minutes since midnight
-        hours, minutes = map(int, time.split(':'))
-        req_start_minutes = hours * 60 + minutes
-        req_end_minutes = req_start_minutes + int(duration)
-        
-        # Filter out tables with overlapping reservations
-        available_tables = []
-        for table in tables:
-            is_available = True
-            table_reservations = reservations.filter(table=table)
-            
-            for reservation in table_reservations:
-                res_hours, res_minutes = reservation.time.hour, reservation.time.minute
-                res_start_minutes = res_hours * 60 + res_minutes
-                res_end_minutes = res_start_minutes + reservation.duration
-                
-                # Check for overlap
-                if (req_start_minutes < res_end_minutes and req_end_minutes > res_start_minutes):
-                    is_available = False
-                    break
-            
-            if is_available and table.status != 'maintenance':
-                available_tables.append(table)
+        tables = Table.objects.select_related('section').in_bulk(table_ids)
+        available_tables = [tables[pk] for pk in table_ids if pk in tables]
         
         from tables.serializers import TableSerializer
         serializer = TableSerializer(available_tables, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def availability_grid(self, request):
+        """
+        Whole-day booking grid for a party.
+        
+        Every bookable table seating ?party_size= gets two bitmaps of the
+        day's SLOT_MINUTES slots as hex strings, where bit i (counting from
+        the least significant bit) stands for the slot starting i * SLOT_MINUTES
+        minutes after midnight: 'busy' marks slots overlapped by a reservation
+        and 'startable' marks slots a reservation of ?duration= minutes can
+        start in. ?group_by=section nests the tables under their sections.
+        """
+        params = AvailabilityGridQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = params.validated_data
+        
+        index = day_index(query['date'])
+        width = DAY_SLOTS // 4
+        rows = []
+        for pk in index.bookable_tables(query['party_size']):
+            table = index.tables[pk]
+            rows.append({
+                'id': pk,
+                'number': table.number,
+                'section': table.section_id,
+                'capacity': table.capacity,
+                'busy': format(index.busy_slots(pk), f'0{width}x'),
+                'startable': format(index.startable_slots(pk, query['duration']), f'0{width}x'),
+            })
+        
+        grid = {
+            'date': query['date'],
+            'party_size': query['party_size'],
+            'duration': query['duration'],
+            'slot_minutes': SLOT_MINUTES,
+            'slots': DAY_SLOTS,
+        }
+        if query.get('group_by') == 'section':
+            sections = {}
+            for row in rows:
+                table = index.tables[row['id']]
+                sections.setdefault(table.section_id, {
+                    'id': table.section_id, 'name': table.section_name, 'tables': []
+                })['tables'].append(row)
+            grid['sections'] = list(sections.values())
+        else:
+            grid['tables'] = rows
+        return Response(grid)
+    
+    @action(detail=False, methods=['get'])
+    def seating(self, request):
+        """
+        Best ways to seat a party at ?date= and ?time=, joined tables included.
+        
+        Options come best first, see reservations/seating.py for the ranking.
+        """
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = params.validated_data
+        
+        index = day_index(query['date'])
+        options = []
+        for option in seating.suggest(index, query['time'], query['duration'], query['party_size']):
+            section_id = index.tables[option.tables[0]].section_id
+            options.append({
+                'tables': [{'id': pk, 'number': index.tables[pk].number} for pk in option.tables],
+                'section': section_id,
+                'section_name': index.tables[option.tables[0]].section_name,
+                'capacity': option.capacity,
+                'wasted_seats': option.wasted_seats,
+                'lost_capacity': option.lost_capacity,
+                'combined': len(option.tables) > 1,
+            })
+        return Response({
+            'date': query['date'],
+            'time': query['time'],
+            'party_size': query['party_size'],
+            'duration': query['duration'],
+            'options': options,
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminOrManager])
+    def optimize_seating(self, request):
+        """Re-seat a date's reservations at better fitting tables; only a preview unless apply is set."""
+        serializer = SeatingOptimizeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(seating.optimize(**serializer.validated_data))
 
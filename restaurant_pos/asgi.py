@@ -2,6 +2,7 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+import menu.routing
 import orders.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_pos.settings')
@@ -10,7 +11,8 @@ application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            orders.routing.websocket_urlpatterns
+            orders.routing.websocket_urlpatterns +
+            menu.routing.websocket_urlpatterns
         )
     ),
 })
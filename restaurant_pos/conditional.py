@@ -0,0 +1,95 @@
+"""
+Conditional GET for read-only viewset actions.
+
+ConditionalGetMixin computes cheap validators for a read action before
+anything is serialized: the row count and latest updated_at of the rows the
+action returns, in a single aggregate query. Requests whose If-None-Match
+(or, for single objects, If-Modified-Since) still matches are answered with
+an empty 304, so polling clients only download data that changed.
+
+List validators are sent as an ETag only. A deleted row changes the count
+but not the latest timestamp, so Last-Modified could not be trusted to
+notice it.
+"""
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+class NotModified(Exception):
+    """Raised to short-circuit a request with a conditional response."""
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+def conditional_state(queryset, timestamps=('updated_at',)):
+    """Return (row count, latest timestamp) for queryset in one aggregate query."""
+    aggregates = {f'latest_{index}': Max(field) for index, field in enumerate(timestamps)}
+    state = queryset.order_by().aggregate(count=Count('pk'), **aggregates)
+    latest = [state[key] for key in aggregates if state[key] is not None]
+    return state['count'], max(latest) if latest else None
+
+def make_etag(*parts):
+    """Build a weak ETag from the parts that identify a representation."""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+class ConditionalGetMixin:
+    """
+    Answer unchanged reads with 304 Not Modified.
+
+    conditional_actions lists the actions to validate. Custom actions also
+    override get_conditional_queryset() to return the rows they serialize,
+    and conditional_timestamps names every updated_at the output depends
+    on, including those of related rows such as 'section__updated_at'.
+    """
+    conditional_actions = ('list', 'retrieve')
+    conditional_timestamps = ('updated_at',)
+
+    def get_conditional_queryset(self):
+        """Return the rows the current action serializes."""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.detail:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_conditional_timestamps(self):
+        return self.conditional_timestamps
+
+    def get_validators(self):
+        """Return (etag, last_modified) for the current action."""
+        count, last_modified = conditional_state(
+            self.get_conditional_queryset(), self.get_conditional_timestamps()
+        )
+        etag = make_etag(type(self).__name__, self.action, count, last_modified)
+        return etag, last_modified if self.detail else None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions:
+            return
+
+        etag, last_modified = self.get_validators()
+        self.conditional_headers = {'ETag': etag}
+        if last_modified is not None:
+            self.conditional_headers['Last-Modified'] = http_date(last_modified.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified is not None else None
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code in (200, 304):
+            for header, value in getattr(self, 'conditional_headers', {}).items():
+                response[header] = value
+        return response
@@ -0,0 +1,141 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the sort key of the last row seen instead of an
+OFFSET, and no COUNT(*) is issued, so every page costs one indexed range
+query however deep a client browses. Viewsets opt in with
+KeysetPaginationMixin and clients select the mode with ?pagination=cursor,
+then follow the next/previous links.
+"""
+import base64
+import binascii
+import datetime
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+class KeysetPagination(BasePagination):
+    """Paginate on a unique ordering such as ('-created_at', '-id')."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=('-created_at', '-id')):
+        self.ordering = tuple(ordering)
+        self.page_size = api_settings.PAGE_SIZE
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (binascii.Error, ValueError, KeyError, TypeError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, row, reverse):
+        position = [_encode_value(getattr(row, field.lstrip('-'))) for field in self.ordering]
+        encoded = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': reverse}).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def filter_after(self, position, ordering):
+        """Build the lexicographic "comes after position" filter for ordering."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        # Previous pages are read backwards from the first row shown and flipped
+        ordering = tuple(_invert(field) for field in self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.filter_after(position, ordering))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+class KeysetPaginationMixin:
+    """
+    Let clients switch a viewset to keyset pagination with ?pagination=cursor.
+
+    Page-number pagination stays the default for the viewset's list.
+    keyset_response() paginates custom list actions in cursor mode and
+    leaves them unpaginated otherwise.
+    """
+    keyset_ordering = ('-created_at', '-id')
+
+    def keyset_requested(self):
+        params = self.request.query_params
+        return params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.keyset_requested():
+            self._paginator = KeysetPagination(self.keyset_ordering)
+        return super().paginator
+
+    def keyset_response(self, queryset, serializer_class):
+        """Serialize a custom list action, one keyset page at a time in cursor mode."""
+        if self.keyset_requested():
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(serializer_class(page, many=True).data)
+        return Response(serializer_class(queryset, many=True).data)
@@ -0,0 +1,70 @@
+"""
+Eager-loading plans derived from serializers.
+
+plan_queryset() walks a serializer's fields and works out which relations it
+will read: single-valued relations become select_related() joins and
+multi-valued ones become Prefetch() lookups whose querysets are planned the
+same way. Serializing the planned queryset then costs a fixed number of
+queries no matter how many rows or nested rows are returned.
+"""
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+def _nested_serializer(field):
+    """Return (serializer, many) for a nested serializer field, else (None, many)."""
+    if isinstance(field, serializers.ListSerializer):
+        return field.child, True
+    if isinstance(field, serializers.BaseSerializer):
+        return field, False
+    return None, isinstance(field, serializers.ManyRelatedField)
+
+def _walk(model, serializer, prefix, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        nested, many = _nested_serializer(field)
+        attrs = field.source.split('.')
+        current, path = model, []
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                break
+
+            is_last = index == len(attrs) - 1
+            if is_last and nested is None and not many:
+                # Plain primary key fields read the local column only
+                break
+
+            lookup = prefix + '__'.join(path + [attr])
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.append((lookup, model_field.related_model, type(nested) if nested else None))
+                break
+
+            path.append(attr)
+            current = model_field.related_model
+            select.add(lookup)
+            if is_last and nested is not None:
+                _walk(current, nested, lookup + '__', select, prefetch)
+
+@lru_cache(maxsize=None)
+def _plan(model, serializer_class):
+    select, prefetch = set(), []
+    if serializer_class is not None:
+        _walk(model, serializer_class(), '', select, prefetch)
+    return tuple(sorted(select)), tuple(prefetch)
+
+def plan_queryset(queryset, serializer_class):
+    """Eager-load every relation serializer_class reads from queryset's model."""
+    select, prefetch = _plan(queryset.model, serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    for lookup, related_model, nested_class in prefetch:
+        related = plan_queryset(related_model._default_manager.all(), nested_class)
+        queryset = queryset.prefetch_related(Prefetch(lookup, queryset=related))
+    return queryset
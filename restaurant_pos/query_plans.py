@@ -0,0 +1,129 @@
+"""
+Hot query registry and EXPLAIN checks.
+
+Each registered function builds the queryset behind a hot endpoint. The
+check_query_plans command runs EXPLAIN on every one of them and reports the
+queries whose filtered table is read with a full scan instead of one of the
+composite indexes from the *_hot_path_indexes migrations. Plans only mean
+something against production-sized, analyzed tables: on a near-empty
+database most planners prefer a scan.
+"""
+import re
+from datetime import timedelta
+from django.db import connections
+from django.utils import timezone
+from accounting.models import Transaction
+from delivery.models import Driver
+from orders.models import Order
+from orders.queries import ACTIVE_STATUSES
+from reservations.models import Reservation
+from restaurant_pos.pagination import KeysetPagination
+from tables.models import Table
+
+HOT_QUERIES = {}
+
+def hot_query(name):
+    """Register a function returning a representative queryset for a hot path."""
+    def register(build):
+        HOT_QUERIES[name] = build
+        return build
+    return register
+
+@hot_query('kitchen_display')
+def _kitchen_display():
+    return Order.objects.filter(status__in=ACTIVE_STATUSES).order_by('created_at')
+
+@hot_query('orders_by_table')
+def _orders_by_table():
+    return Order.objects.filter(table_id=1, status__in=ACTIVE_STATUSES).order_by('-created_at')
+
+@hot_query('reservations_for_table')
+def _reservations_for_table():
+    return Reservation.objects.filter(
+        table_id=1, date=timezone.localdate(), status__in=['confirmed', 'pending']
+    )
+
+@hot_query('reservations_for_day')
+def _reservations_for_day():
+    today = timezone.localdate()
+    return Reservation.objects.filter(
+        date__in=[today - timedelta(days=1), today], status__in=['confirmed', 'pending']
+    )
+
+def _keyset_page(queryset):
+    # The page after the newest row, as KeysetPagination queries it
+    paginator = KeysetPagination()
+    position = [timezone.now(), 1]
+    return queryset.filter(paginator.filter_after(position, paginator.ordering)).order_by(*paginator.ordering)
+
+@hot_query('orders_keyset_page')
+def _orders_keyset_page():
+    return _keyset_page(Order.objects.all())
+
+@hot_query('transactions_keyset_page')
+def _transactions_keyset_page():
+    return _keyset_page(Transaction.objects.all())
+
+@hot_query('sales_report')
+def _sales_report():
+    end = timezone.now()
+    return Transaction.objects.filter(type='sale', created_at__gte=end - timedelta(days=30), created_at__lt=end)
+
+@hot_query('available_tables')
+def _available_tables():
+    return Table.objects.filter(status='available', is_active=True)
+
+@hot_query('available_drivers')
+def _available_drivers():
+    return Driver.objects.filter(status='available', is_active=True)
+
+def _mysql_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    columns = [column[0] for column in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    plan = [
+        f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}"
+        for row in rows
+    ]
+    return plan, {row['table'] for row in rows if row['type'] == 'ALL'}
+
+def _sqlite_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    plan = [row[-1] for row in cursor.fetchall()]
+    scans = set()
+    for detail in plan:
+        # "SCAN orders_order" (or "SCAN TABLE ..." on older versions), without "USING ... INDEX"
+        match = re.match(r'SCAN (?:TABLE )?(\S+)', detail)
+        if match and 'USING' not in detail:
+            scans.add(match.group(1))
+    return plan, scans
+
+def _postgresql_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    plan = [row[0] for row in cursor.fetchall()]
+    scans = {match.group(1) for line in plan for match in re.finditer(r'Seq Scan on (\S+)', line)}
+    return plan, scans
+
+PLANNERS = {
+    'mysql': _mysql_plan,
+    'sqlite': _sqlite_plan,
+    'postgresql': _postgresql_plan,
+}
+
+def explain(queryset, using=None):
+    """
+    Return (plan lines, full_scan) for queryset.
+
+    full_scan is True when the queryset's own table is read with a full
+    table scan. Raises ValueError for a database vendor without a planner
+    in PLANNERS.
+    """
+    connection = connections[using or queryset.db]
+    planner = PLANNERS.get(connection.vendor)
+    if planner is None:
+        raise ValueError(f"Unsupported database vendor: {connection.vendor}")
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        plan, scanned = planner(cursor, sql, params)
+    return plan, queryset.model._meta.db_table in scanned
@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from celery.schedules import crontab
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -131,6 +132,21 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-order-totals': {
+        'task': 'orders.tasks.reconcile_order_totals',
+        'schedule': timedelta(minutes=15),
+    },
+    'resolve-effective-prices': {
+        'task': 'menu.tasks.resolve_effective_prices',
+        'schedule': timedelta(minutes=1),
+    },
+    'materialize-table-status': {
+        'task': 'tables.tasks.materialize_table_status',
+        # Reservation slot boundaries
+        'schedule': crontab(minute='*/15'),
+    },
+}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -231,5 +247,14 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
+    'if-modified-since',
+]
+# Validators and versions that clients read for conditional requests
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'last-modified',
+    'x-board-version',
+    'x-menu-version',
 ]
 
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+class TablesConfig(AppConfig):
+    name = 'tables'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,114 @@
+"""
+Table status materialized from the reservation book and open orders.
+
+materialize() works out what every table in scope should show and writes
+only the tables that differ, with one UPDATE per target status:
+
+- occupied: the table has an open order; current_order is its latest one.
+- reserved: an active reservation covers the table now or starts within
+  RESERVE_AHEAD minutes; customer_name is the party's name.
+- available: neither.
+
+Tables under maintenance are never touched, and neither is a table seated
+by hand (occupied without a current order) until an order or reservation
+takes it over. A table whose order was deleted or moved away is not seated
+by hand: callers pass it as vacated, and a table that loses its order to
+another table is freed along with it.
+
+It runs from Celery beat at every reservation slot boundary, when orders
+(tables/signals.py) and reservations (reservations/signals.py) of a table
+change and on demand for a section, so the floor plan is a plain read of
+the tables.
+"""
+from django.db.models import Case, CharField, IntegerField, Value, When
+from django.utils import timezone
+from orders.models import Order
+from orders.queries import ACTIVE_STATUSES as OPEN_ORDER_STATUSES
+from reservations.availability import day_index, to_minutes
+from reservations.models import Reservation
+from .models import Table
+
+# How long before a reservation starts its table is held
+RESERVE_AHEAD = 30
+
+def _reserved_by(table_ids, moment):
+    """Return {table id: reservation id} for the reservations holding tables at moment."""
+    local = timezone.localtime(moment)
+    index = day_index(local.date())
+    now = to_minutes(local)
+    held = {}
+    for table_id in table_ids:
+        conflicts = index.conflicts(table_id, now, now + RESERVE_AHEAD + 1)
+        if conflicts:
+            # The earliest reservation still running or about to start
+            held[table_id] = conflicts[0][2]
+    return held
+
+def materialize(tables=None, moment=None, vacated=()):
+    """
+    Bring the status of the tables queryset, or every table, in line with orders and reservations.
+
+    vacated holds the ids of tables that just lost their current order, so
+    are freed even though they look seated by hand.
+
+    Returns {status: [table ids]} for the tables that changed.
+    """
+    moment = moment or timezone.now()
+    tables = (tables if tables is not None else Table.objects.all()).exclude(status='maintenance')
+    current = {
+        pk: (status, customer_name, current_order_id)
+        for pk, status, customer_name, current_order_id in tables.values_list(
+            'id', 'status', 'customer_name', 'current_order_id'
+        )
+    }
+    if not current:
+        return {}
+
+    open_orders = {}
+    for table_id, order_id in Order.objects.filter(
+        table_id__in=current, status__in=OPEN_ORDER_STATUSES
+    ).order_by('created_at').values_list('table_id', 'id'):
+        open_orders[table_id] = order_id
+
+    reservations = _reserved_by(set(current) - set(open_orders), moment)
+    names = dict(Reservation.objects.filter(pk__in=reservations.values()).values_list('id', 'customer_name'))
+
+    # Tables give up their orders before others take them; current_order is unique
+    targets = {'available': {}, 'reserved': {}, 'occupied': {}}
+    for pk, (status, customer_name, current_order_id) in current.items():
+        if pk in open_orders:
+            target = ('occupied', customer_name, open_orders[pk])
+        elif pk in reservations:
+            target = ('reserved', names.get(reservations[pk], ''), None)
+        elif status == 'occupied' and current_order_id is None and pk not in vacated:
+            # Seated by hand; left for staff to clear
+            continue
+        else:
+            target = ('available', '', None)
+        if target != (status, customer_name, current_order_id):
+            targets[target[0]][pk] = target
+
+    now = timezone.now()
+    changed = {}
+    for status, rows in targets.items():
+        if not rows:
+            continue
+        if status == 'occupied':
+            # Orders moved here from tables outside the scope, which they no longer occupy
+            Table.objects.filter(
+                current_order_id__in=[order_id for _, _, order_id in rows.values()]
+            ).exclude(pk__in=rows).update(status='available', customer_name='', current_order=None, updated_at=now)
+        Table.objects.filter(pk__in=rows).update(
+            status=status,
+            customer_name=Case(
+                *[When(pk=pk, then=Value(name)) for pk, (_, name, _) in rows.items()],
+                output_field=CharField()
+            ),
+            current_order_id=Case(
+                *[When(pk=pk, then=Value(order_id)) for pk, (_, _, order_id) in rows.items()],
+                output_field=IntegerField()
+            ),
+            updated_at=now,
+        )
+        changed[status] = sorted(rows)
+    return changed
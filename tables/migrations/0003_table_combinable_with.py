@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='combinable_with',
+            field=models.ManyToManyField(blank=True, to='tables.table'),
+        ),
+    ]
@@ -28,6 +28,8 @@ class Table(models.Model):
     customer_name = models.CharField(max_length=100, blank=True)
     current_order = models.OneToOneField('orders.Order', related_name='table_order', 
                                          on_delete=models.SET_NULL, null=True, blank=True)
+    # Neighbouring tables in the same section that can be pushed together for one party
+    combinable_with = models.ManyToManyField('self', blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -35,6 +37,10 @@ class Table(models.Model):
     class Meta:
         unique_together = ('number', 'section')
         ordering = ['section', 'number']
+        indexes = [
+            # Available table lookups
+            models.Index(fields=['status', 'is_active'], name='table_status_active_idx'),
+        ]
     
     def __str__(self):
         return f"Table {self.number} ({self.section.name})"
@@ -16,6 +16,19 @@ class TableSerializer(serializers.ModelSerializer):
                   'customer_name', 'current_order', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
+class TableCombinationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Table
+        fields = ['combinable_with']
+    
+    def validate_combinable_with(self, tables):
+        for table in tables:
+            if table.pk == self.instance.pk:
+                raise serializers.ValidationError("A table cannot be combined with itself")
+            if table.section_id != self.instance.section_id:
+                raise serializers.ValidationError(f"Table {table.number} is in another section")
+        return tables
+
 class TableStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Table
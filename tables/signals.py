@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from orders.models import Order
+from .models import Table
+from . import floor
+
+@receiver(pre_save, sender=Order)
+def order_moving(sender, instance, **kwargs):
+    # Remember the stored table so a moved order frees it
+    if instance.pk is not None:
+        instance._stored_table_id = Order.objects.filter(pk=instance.pk).values_list('table_id', flat=True).first()
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    # current_order is SET_NULL before post_delete, which then cannot tell these tables from ones seated by hand
+    instance._held_table_ids = set(Table.objects.filter(current_order=instance).values_list('id', flat=True))
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    """Seat or free the order's tables, current and former, once the change commits."""
+    vacated = getattr(instance, '_held_table_ids', set())
+    table_ids = ({instance.table_id, getattr(instance, '_stored_table_id', None)} | vacated) - {None}
+    if table_ids:
+        transaction.on_commit(lambda: floor.materialize(Table.objects.filter(pk__in=table_ids), vacated=vacated))
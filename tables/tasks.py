@@ -0,0 +1,7 @@
+from restaurant_pos.celery import app
+from .floor import materialize
+
+@app.task(ignore_result=True)
+def materialize_table_status():
+    """Bring every table's status in line with the reservation book and open orders."""
+    return materialize()
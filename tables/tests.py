@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from menu.models import Category, MenuItem
+from orders.ingest import ingest_batch
+from orders.models import Order, OrderItem
+from reservations.models import Reservation
+from tables.floor import materialize
+from tables.models import Section, Table
+
+class MaterializeTests(TestCase):
+    """Table status follows open orders and the reservation book."""
+
+    def setUp(self):
+        cache.clear()
+        section = Section.objects.create(name='Main')
+        self.tables = [Table.objects.create(number=str(number), section=section, capacity=4) for number in range(3)]
+        category = Category.objects.create(name='Mains')
+        self.menu_item = MenuItem.objects.create(category=category, name='Dish', price=Decimal('10.00'))
+        # Noon today, clear of midnight on either side
+        self.moment = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time())) + timedelta(hours=12)
+
+    def status(self, table):
+        table.refresh_from_db()
+        return table.status, table.customer_name, table.current_order_id
+
+    def reserve(self, table, minutes_from_now, name='Ann'):
+        start = timezone.localtime(self.moment + timedelta(minutes=minutes_from_now))
+        # The on-commit recompute would run at the real time; the tests pass moment instead
+        return Reservation.objects.create(
+            table=table, customer_name=name, contact_phone='1', date=start.date(), time=start.time(),
+            duration=90, party_size=2, status='confirmed'
+        )
+
+    def open_order(self, table):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(table=table, dining_mode='dine_in')
+            OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=1, unit_price=Decimal('10.00'))
+        return order
+
+    def test_reservation_holds_table_shortly_before_it_starts(self):
+        self.reserve(self.tables[0], 20, name='Ann')
+        self.reserve(self.tables[1], 120, name='Bob')
+        self.assertEqual(materialize(moment=self.moment), {'reserved': [self.tables[0].pk]})
+        self.assertEqual(self.status(self.tables[0]), ('reserved', 'Ann', None))
+        self.assertEqual(self.status(self.tables[1]), ('available', '', None))
+        self.assertEqual(materialize(moment=self.moment), {})
+
+    def test_reservation_ending_frees_table(self):
+        self.reserve(self.tables[0], -60)
+        materialize(moment=self.moment)
+        self.assertEqual(self.status(self.tables[0])[0], 'reserved')
+        materialize(moment=self.moment + timedelta(minutes=31))
+        self.assertEqual(self.status(self.tables[0]), ('available', '', None))
+
+    def test_open_order_occupies_table_until_closed(self):
+        order = self.open_order(self.tables[0])
+        self.assertEqual(self.status(self.tables[0]), ('occupied', '', order.pk))
+        order.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(self.status(self.tables[0]), ('available', '', None))
+
+    def test_manual_seating_and_maintenance_are_kept(self):
+        Table.objects.filter(pk=self.tables[0].pk).update(status='occupied', customer_name='Walk-in')
+        Table.objects.filter(pk=self.tables[1].pk).update(status='maintenance')
+        self.reserve(self.tables[1], 10)
+        self.assertEqual(materialize(moment=self.moment), {})
+        self.assertEqual(self.status(self.tables[0]), ('occupied', 'Walk-in', None))
+        self.assertEqual(self.status(self.tables[1])[0], 'maintenance')
+
+    def test_moved_order_frees_its_old_table(self):
+        order = self.open_order(self.tables[0])
+        order.table = self.tables[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(self.status(self.tables[0]), ('available', '', None))
+        self.assertEqual(self.status(self.tables[1]), ('occupied', '', order.pk))
+        self.assertEqual(materialize(), {})
+
+    def test_order_moved_from_table_outside_scope(self):
+        order = self.open_order(self.tables[0])
+        Order.objects.filter(pk=order.pk).update(table=self.tables[1])
+        materialize(Table.objects.filter(pk=self.tables[1].pk))
+        self.assertEqual(self.status(self.tables[0]), ('available', '', None))
+        self.assertEqual(self.status(self.tables[1]), ('occupied', '', order.pk))
+
+    def test_deleted_order_frees_its_table(self):
+        order = self.open_order(self.tables[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.status(self.tables[0]), ('available', '', None))
+        self.assertEqual(materialize(), {})
+
+    def test_synced_orders_seat_their_tables(self):
+        payloads = [
+            {'client_key': f'k{index}', 'table': table.pk, 'items': [{'menu_item': self.menu_item.pk, 'quantity': 1}]}
+            for index, table in enumerate(self.tables[:2])
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            results, created = ingest_batch(payloads)
+        self.assertEqual(len(created), 2)
+        for table, order in zip(self.tables, created):
+            self.assertEqual(self.status(table), ('occupied', '', order.pk))
+        self.assertEqual(self.status(self.tables[2])[0], 'available')
@@ -4,10 +4,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Section, Table
-from .serializers import SectionSerializer, TableSerializer, TableStatusUpdateSerializer
+from .serializers import SectionSerializer, TableSerializer, TableCombinationSerializer, TableStatusUpdateSerializer
 from users.permissions import IsAdminOrManagerOrStaff
+from . import floor
+from restaurant_pos.conditional import ConditionalGetMixin
 
-class SectionViewSet(viewsets.ModelViewSet):
+class SectionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Section.objects.all()
     serializer_class = SectionSerializer
     permission_classes = [IsAdminOrManagerOrStaff]
@@ -20,13 +22,38 @@ class SectionViewSet(viewsets.ModelViewSet):
         tables = section.tables.all()
         serializer = TableSerializer(tables, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['post'])
+    def recompute_status(self, request, pk=None):
+        """Re-derive the status of the section's tables from orders and reservations now."""
+        section = self.get_object()
+        changed = floor.materialize(section.tables.all())
+        tables = section.tables.all()
+        return Response({
+            'changed': changed,
+            'tables': TableSerializer(tables, many=True).data
+        })
 
-class TableViewSet(viewsets.ModelViewSet):
+class TableViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Table.objects.all()
     serializer_class = TableSerializer
     permission_classes = [IsAdminOrManagerOrStaff]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['section', 'status', 'is_active']
+    conditional_actions = ('list', 'retrieve', 'available', 'by_section')
+    conditional_timestamps = ('updated_at', 'section__updated_at')
+    
+    def get_conditional_queryset(self):
+        if self.action == 'available':
+            return Table.objects.filter(status='available', is_active=True)
+        if self.action == 'by_section':
+            return Section.objects.filter(is_active=True)
+        return super().get_conditional_queryset()
+    
+    def get_conditional_timestamps(self):
+        if self.action == 'by_section':
+            return ('updated_at', 'tables__updated_at')
+        return super().get_conditional_timestamps()
     
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -39,6 +66,17 @@ class TableViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get', 'put'])
+    def combinations(self, request, pk=None):
+        """The neighbouring tables this table can be joined with for larger parties."""
+        table = self.get_object()
+        if request.method == 'PUT':
+            serializer = TableCombinationSerializer(table, data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save()
+        return Response(TableCombinationSerializer(table).data)
+    
     @action(detail=False, methods=['get'])
     def available(self, request):
         tables = Table.objects.filter(status='available', is_active=True)